@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus 指标",
+    description="以 Prometheus 文本格式输出接口耗时、处理阶段耗时、上游状态码、图片下载和缓存命中等指标"
+)
+async def get_metrics() -> PlainTextResponse:
+    """输出当前进程的监控指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
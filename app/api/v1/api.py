@@ -1,8 +1,20 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import wechat
+from app.api.v1.endpoints import admin, debug, jobs, tracking, wechat
 
 api_router = APIRouter()
 
 # 注册微信公众号相关路由
-api_router.include_router(wechat.router, tags=["wechat"]) 
\ No newline at end of file
+api_router.include_router(wechat.router, tags=["wechat"]) 
+
+# 注册后台转换任务路由
+api_router.include_router(jobs.router, tags=["jobs"])
+
+# 注册文章跟踪路由
+api_router.include_router(tracking.router, tags=["tracking"])
+
+# 注册管理路由
+api_router.include_router(admin.router, tags=["admin"])
+
+# 注册调试路由（仅调试模式可用）
+api_router.include_router(debug.router, tags=["debug"])
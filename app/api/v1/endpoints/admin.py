@@ -0,0 +1,52 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.core.config import settings
+from app.schemas.admin import ImageStorageResponse
+from app.services.image_storage import ImageStorageManager, image_storage
+
+router = APIRouter()
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """依赖注入：未配置 ADMIN_TOKEN 时视为不存在，否则须携带 `Authorization: Bearer <ADMIN_TOKEN>`"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=401, detail="管理令牌无效", headers={"WWW-Authenticate": "Bearer"})
+
+
+def get_image_storage():
+    """依赖注入：获取图片存储管理实例"""
+    return image_storage
+
+
+@router.get(
+    "/admin/storage",
+    response_model=ImageStorageResponse,
+    dependencies=[Depends(require_admin)],
+    summary="图片存储占用",
+    description="返回图片存储的文件数、字节数、预算和累计淘汰情况"
+)
+async def get_image_storage_usage(
+    storage: ImageStorageManager = Depends(get_image_storage)
+) -> ImageStorageResponse:
+    """获取图片存储占用"""
+    return ImageStorageResponse(**await storage.usage())
+
+
+@router.post(
+    "/admin/storage/evict",
+    response_model=ImageStorageResponse,
+    dependencies=[Depends(require_admin)],
+    summary="立即执行图片淘汰",
+    description="写入访问时间并按预算淘汰，不等待下一次定期检查"
+)
+async def evict_image_storage(
+    storage: ImageStorageManager = Depends(get_image_storage)
+) -> ImageStorageResponse:
+    """立即按预算淘汰图片"""
+    return ImageStorageResponse(**await storage.run_once())
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal
+
+from app.core.config import settings
+from app.schemas.debug import ProfileResponse
+from app.schemas.wechat import ErrorResponse
+from app.services.wechat_service import AsyncWeChatService, async_wechat_service
+from app.core.exceptions import WeChatScraperException
+from app.utils.logger import request_id_var
+from app.utils.tracing import new_request_id, profiler, trace_summary, traced
+
+router = APIRouter()
+
+
+def require_debug() -> None:
+    """依赖注入：仅在调试模式（DEBUG=true）下开放，否则视为不存在"""
+    if not settings.debug:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def get_wechat_service():
+    """依赖注入：获取微信服务实例"""
+    return async_wechat_service
+
+
+@router.get(
+    "/debug/profile",
+    response_model=ProfileResponse,
+    responses={
+        400: {"model": ErrorResponse}
+    },
+    dependencies=[Depends(require_debug)],
+    summary="分析单篇文章处理",
+    description="仅调试模式可用：跳过缓存和归档完整处理一次文章，返回各阶段耗时和采样调用栈"
+)
+async def profile_wechat_article(
+    url: str = Query(..., description="微信公众号文章链接"),
+    format: Literal["html", "markdown"] = Query("markdown", description="转换格式"),
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> ProfileResponse:
+    """
+    分析单篇文章处理
+    
+    - **url**: 微信公众号文章链接
+    - **format**: html 或 markdown
+    
+    上游抓取失败或图片下载失败时仍返回已记录的阶段，error 为错误信息；
+    采样覆盖整个进程，分析期间应避免其他请求干扰。
+    """
+    error = None
+    with traced(request_id_var.get() or new_request_id()) as trace:
+        session = profiler.start()
+        try:
+            await service.render_article(url, format)
+        except WeChatScraperException as e:
+            if not trace.spans:
+                # 链接无效等未开始处理的错误直接返回
+                raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+            error = e.detail
+        finally:
+            # 任何异常（含客户端断开时的取消）都要结束采样，否则采样线程会一直运行
+            profile = profiler.stop(session, settings.profile_top_stacks)
+        duration = trace.elapsed()
+    return ProfileResponse(
+        request_id=trace.request_id,
+        url=url,
+        format=format,
+        duration_ms=round(duration * 1000, 3),
+        error=error,
+        summary=trace_summary(trace),
+        spans=trace.to_list(),
+        dropped_spans=trace.dropped,
+        profile=profile
+    )
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from app.schemas.wechat import WeChatJobRequest, WeChatJobResponse, ErrorResponse
+from app.services.jobs import JobQueue, job_queue
+from app.core.exceptions import WeChatScraperException
+
+router = APIRouter()
+
+
+def get_job_queue():
+    """依赖注入：获取后台任务队列"""
+    return job_queue
+
+
+@router.post(
+    "/wechat/jobs",
+    response_model=WeChatJobResponse,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse}
+    },
+    summary="提交后台转换任务",
+    description="立即返回任务ID，文章在后台转换；可轮询任务状态，或提供回调地址在完成时接收结果"
+)
+async def submit_wechat_job(
+    job_request: WeChatJobRequest,
+    request: Request,
+    response: Response,
+    queue: JobQueue = Depends(get_job_queue)
+) -> WeChatJobResponse:
+    """
+    提交后台转换任务
+    
+    - **url**: 微信公众号文章链接
+    - **format**: 输出格式，html 或 markdown
+    - **callback_url**: 任务结束后以POST方式接收任务结果的地址（可选）
+    """
+    try:
+        job = await queue.submit(
+            job_request.url,
+            job_request.format,
+            str(job_request.callback_url) if job_request.callback_url else None
+        )
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    response.headers["Location"] = str(request.url_for("get_wechat_job", job_id=job["id"]))
+    return WeChatJobResponse(**job)
+
+
+@router.get(
+    "/wechat/jobs/{job_id}",
+    response_model=WeChatJobResponse,
+    responses={
+        404: {"model": ErrorResponse}
+    },
+    summary="查询后台转换任务",
+    description="返回任务状态；任务成功时 data 为转换结果，失败时 error 为错误信息"
+)
+async def get_wechat_job(
+    job_id: str,
+    queue: JobQueue = Depends(get_job_queue)
+) -> WeChatJobResponse:
+    """查询后台转换任务状态和结果"""
+    job = await queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return WeChatJobResponse(**job)
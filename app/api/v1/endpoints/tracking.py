@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.schemas.wechat import (
+    TrackArticleRequest,
+    TrackedArticleResponse,
+    TrackedArticleListResponse,
+    ErrorResponse
+)
+from app.services.tracker import ArticleTracker, article_tracker
+from app.core.exceptions import WeChatScraperException
+
+router = APIRouter()
+
+
+def get_article_tracker():
+    """依赖注入：获取文章跟踪实例"""
+    return article_tracker
+
+
+@router.post(
+    "/wechat/tracked",
+    response_model=TrackedArticleResponse,
+    status_code=201,
+    responses={
+        400: {"model": ErrorResponse}
+    },
+    summary="跟踪文章",
+    description="加入定期刷新列表，后台按刷新间隔重新获取；内容未变化时不重新处理图片和转换"
+)
+async def track_wechat_article(
+    track_request: TrackArticleRequest,
+    tracker: ArticleTracker = Depends(get_article_tracker)
+) -> TrackedArticleResponse:
+    """
+    跟踪文章
+    
+    - **url**: 微信公众号文章链接
+    - **format**: 刷新生成的格式，html 或 markdown
+    - **interval**: 刷新间隔（秒，可选）
+    
+    新加入的文章立即刷新一次；已跟踪时更新格式和刷新间隔
+    """
+    try:
+        item = await tracker.track(track_request.url, track_request.format, track_request.interval)
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    return TrackedArticleResponse(**item)
+
+
+@router.get(
+    "/wechat/tracked",
+    response_model=TrackedArticleListResponse,
+    summary="已跟踪的文章",
+    description="按加入时间列出已跟踪的文章及其刷新状态"
+)
+async def list_tracked_wechat_articles(
+    limit: int = Query(50, ge=1, le=500, description="每页结果数"),
+    offset: int = Query(0, ge=0, description="跳过的结果数"),
+    tracker: ArticleTracker = Depends(get_article_tracker)
+) -> TrackedArticleListResponse:
+    """列出已跟踪的文章：刷新间隔、下次刷新时间、刷新和内容变化次数、最近一次错误"""
+    total, items = await tracker.list(limit, offset)
+    return TrackedArticleListResponse(total=total, items=items)
+
+
+@router.delete(
+    "/wechat/tracked",
+    status_code=204,
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse}
+    },
+    summary="取消跟踪文章",
+    description="从定期刷新列表中移除，已缓存和归档的结果不受影响"
+)
+async def untrack_wechat_article(
+    url: str = Query(..., description="微信公众号文章链接"),
+    tracker: ArticleTracker = Depends(get_article_tracker)
+) -> Response:
+    """取消跟踪文章，文章未被跟踪时返回 404"""
+    try:
+        removed = await tracker.untrack(url)
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    if not removed:
+        raise HTTPException(status_code=404, detail="文章未被跟踪")
+    return Response(status_code=204)
+
+
+@router.post(
+    "/wechat/tracked/refresh",
+    response_model=TrackedArticleResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse}
+    },
+    summary="立即刷新已跟踪的文章",
+    description="不等待刷新间隔，立即重新获取文章并返回刷新状态"
+)
+async def refresh_tracked_wechat_article(
+    url: str = Query(..., description="微信公众号文章链接"),
+    tracker: ArticleTracker = Depends(get_article_tracker)
+) -> TrackedArticleResponse:
+    """立即刷新已跟踪的文章；刷新失败时 last_error 为错误信息"""
+    try:
+        item = await tracker.refresh_now(url)
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    if item is None:
+        raise HTTPException(status_code=404, detail="文章未被跟踪")
+    return TrackedArticleResponse(**item)
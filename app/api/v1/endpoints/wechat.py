@@ -1,23 +1,43 @@
-from fastapi import APIRouter, Query, Depends, HTTPException
-from fastapi.responses import Response
-from typing import Optional
+from fastapi import APIRouter, Query, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Any, Optional
 
-from app.schemas.wechat import WeChatArticleResponse, ErrorResponse
-from app.services.wechat_service import wechat_service
+from app.schemas.wechat import (
+    WeChatArticleResponse,
+    WeChatMetadataResponse,
+    WeChatBatchRequest,
+    WeChatBatchItem,
+    CacheStatsResponse,
+    ArchivedArticleResponse,
+    ArchiveSearchResponse,
+    ErrorResponse
+)
+from app.services.cache import ArticleEntry
+from app.services.wechat_service import AsyncWeChatService, async_wechat_service
 from app.core.exceptions import WeChatScraperException
+from app.utils.conditional import format_http_date, is_not_modified
 
 router = APIRouter()
 
 
 def get_wechat_service():
     """依赖注入：获取微信公众号服务实例"""
-    return wechat_service
+    return async_wechat_service
+
+
+def conditional_response(request: Request, entry: ArticleEntry, content: Any) -> Response:
+    """附带 ETag / Last-Modified；客户端缓存仍有效时返回不含正文的 304"""
+    headers = {"ETag": entry.etag, "Last-Modified": format_http_date(entry.last_modified)}
+    if is_not_modified(request.headers, entry.etag, entry.last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content, headers=headers)
 
 
 @router.get(
     "/wechat",
     response_model=WeChatArticleResponse,
     responses={
+        304: {"description": "内容未变化"},
         400: {"model": ErrorResponse},
         502: {"model": ErrorResponse},
         500: {"model": ErrorResponse}
@@ -26,9 +46,10 @@ def get_wechat_service():
     description="抓取微信公众号文章并返回HTML格式的内容"
 )
 async def get_wechat_article(
+    request: Request,
     url: str = Query(..., description="微信公众号文章链接"),
-    service: wechat_service = Depends(get_wechat_service)
-) -> WeChatArticleResponse:
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> Response:
     """
     获取微信公众号文章内容
     
@@ -38,12 +59,14 @@ async def get_wechat_article(
     - **title**: 文章标题
     - **content**: 文章HTML内容
     - **cover**: 文章封面图片URL（可选）
+    
+    支持 If-None-Match / If-Modified-Since 条件请求，内容未变化时返回 304
     """
     try:
-        result = service.get_article_data(url)
-        return WeChatArticleResponse(**result)
+        entry = await service.get_article(url, "html")
+        return conditional_response(request, entry, WeChatArticleResponse(**entry.body).model_dump())
     except WeChatScraperException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务内部错误: {str(e)}")
 
@@ -51,6 +74,7 @@ async def get_wechat_article(
 @router.get(
     "/wechat/markdown",
     responses={
+        304: {"description": "内容未变化"},
         400: {"description": "无效的URL"},
         502: {"description": "网络请求失败"},
         500: {"description": "服务内部错误"}
@@ -59,20 +83,179 @@ async def get_wechat_article(
     description="抓取微信公众号文章并返回Markdown格式的内容，同时下载并替换图片为本地URL"
 )
 async def get_wechat_article_markdown(
+    request: Request,
     url: str = Query(..., description="微信公众号文章链接"),
-    service: wechat_service = Depends(get_wechat_service)
-) -> str:
+    stream: bool = Query(False, description="以 text/markdown 流式返回，边转换边输出"),
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> Response:
     """
     获取微信公众号文章内容（Markdown格式）
     
     - **url**: 微信公众号文章的完整URL
+    - **stream**: 为 true 时先返回标题，之后按段落顺序输出，每段的图片下载完成即输出该段
     
     返回Markdown格式的文章内容，图片会被下载到本地并替换URL
+    
+    支持 If-None-Match / If-Modified-Since 条件请求，内容未变化时返回 304
     """
     try:
-        markdown_content = service.get_article_markdown(url)
-        return markdown_content
+        if stream:
+            return await streaming_markdown_response(service, url)
+        entry = await service.get_article(url, "markdown")
+        return conditional_response(request, entry, entry.body)
     except WeChatScraperException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"服务内部错误: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"服务内部错误: {str(e)}")
+
+
+async def streaming_markdown_response(service: AsyncWeChatService, url: str) -> StreamingResponse:
+    """先取得第一段（抓取和解析完成）再开始响应，抓取失败时仍能返回正确的错误状态码"""
+    chunks = service.stream_article_markdown(url)
+    first = await chunks.__anext__()
+    
+    async def body():
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # 客户端断开时及时结束生成器，取消尚未完成的图片下载
+            await chunks.aclose()
+    
+    return StreamingResponse(body(), media_type="text/markdown; charset=utf-8")
+
+
+@router.get(
+    "/wechat/metadata",
+    response_model=WeChatMetadataResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        502: {"model": ErrorResponse},
+        500: {"model": ErrorResponse}
+    },
+    summary="获取微信公众号文章元数据",
+    description="只返回文章标题、封面和摘要，适用于链接预览；只读取页面头部，不下载正文和图片"
+)
+async def get_wechat_article_metadata(
+    url: str = Query(..., description="微信公众号文章链接"),
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> WeChatMetadataResponse:
+    """
+    获取微信公众号文章元数据
+    
+    - **url**: 微信公众号文章的完整URL
+    
+    返回:
+    - **title**: 文章标题
+    - **cover**: 文章封面图片URL（可选）
+    - **description**: 文章摘要（可选）
+    """
+    try:
+        return WeChatMetadataResponse(**await service.get_article_metadata(url))
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务内部错误: {str(e)}")
+
+
+@router.post(
+    "/wechat/batch",
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "每行一个JSON对象（结构见 WeChatBatchItem），按完成顺序返回"
+        }
+    },
+    summary="批量获取微信公众号文章",
+    description="一次提交多个文章链接并发转换，结果以NDJSON流式返回，单篇失败不影响其他文章"
+)
+async def batch_wechat_articles(
+    request: WeChatBatchRequest,
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> StreamingResponse:
+    """
+    批量获取微信公众号文章
+    
+    - **urls**: 文章链接列表
+    - **format**: 输出格式，html 或 markdown
+    
+    每行返回 index、url、status，以及 data（成功）或 error（失败）
+    """
+    async def lines():
+        async for item in service.convert_batch(request.urls, request.format):
+            yield WeChatBatchItem(**item).model_dump_json(exclude_none=True) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/wechat/cache/stats",
+    response_model=CacheStatsResponse,
+    summary="文章缓存统计",
+    description="返回文章缓存的命中/未命中次数、命中率和当前占用"
+)
+async def get_wechat_cache_stats(
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> CacheStatsResponse:
+    """获取文章缓存统计信息"""
+    return CacheStatsResponse(**await service.cache.stats())
+
+
+@router.get(
+    "/wechat/archive",
+    response_model=ArchivedArticleResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse}
+    },
+    summary="查询已归档的文章",
+    description="按文章链接从本地归档中读取转换结果，不访问上游"
+)
+async def get_archived_wechat_article(
+    url: str = Query(..., description="微信公众号文章链接"),
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> ArchivedArticleResponse:
+    """
+    查询已归档的文章
+    
+    - **url**: 微信公众号文章链接，不同形式的同一文章链接（短链接、带跟踪参数等）查询结果相同
+    
+    文章未归档时返回 404
+    """
+    try:
+        article = await service.get_archived_article(url)
+    except WeChatScraperException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    if article is None:
+        raise HTTPException(status_code=404, detail="文章未归档")
+    return ArchivedArticleResponse(content=article["html"], **article)
+
+
+@router.get(
+    "/wechat/archive/search",
+    response_model=ArchiveSearchResponse,
+    responses={
+        404: {"model": ErrorResponse}
+    },
+    summary="检索已归档的文章",
+    description="对已归档文章的标题和正文进行全文检索，按相关度排序"
+)
+async def search_archived_wechat_articles(
+    q: str = Query(..., min_length=1, description="检索词，多个词以空格分隔（同时包含）"),
+    limit: int = Query(20, ge=1, le=100, description="每页结果数"),
+    offset: int = Query(0, ge=0, description="跳过的结果数"),
+    service: AsyncWeChatService = Depends(get_wechat_service)
+) -> ArchiveSearchResponse:
+    """
+    全文检索已归档的文章
+    
+    - **q**: 检索词，中文无需分词，按连续字符匹配
+    - **limit** / **offset**: 分页参数
+    
+    返回命中总数，以及每篇文章的标题、链接、命中片段和相关度得分
+    """
+    if service.archive is None:
+        raise HTTPException(status_code=404, detail="文章归档未启用")
+    total, items = await service.archive.search(q, limit, offset)
+    return ArchiveSearchResponse(query=q, total=total, items=items)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List
 import os
 
 
@@ -10,6 +10,20 @@ class Settings(BaseSettings):
     app_name: str = "MyAPI"
     app_version: str = "1.0.0"
     debug: bool = False
+    admin_token: str = ""  # 管理接口（/admin/*）的访问令牌，为空时不开放
+    
+    # 服务进程配置（run.py 启动时使用）
+    host: str = "0.0.0.0"
+    port: int = 5201
+    workers: int = 1  # 大于 1 时以多进程方式运行，缓存和进行中的请求经本机 SQLite 在进程间共享
+    event_loop: str = "auto"  # auto（已安装时使用 uvloop）/ uvloop / asyncio
+    http_protocol: str = "auto"  # auto（已安装时使用 httptools）/ httptools / h11
+    graceful_timeout: float = 30.0  # 关闭或滚动重启时等待进行中请求完成的时间（秒）
+    
+    # 多 worker 共享的进行中请求登记：同一文章/图片只由一个进程抓取，其余进程等待结果
+    shared_state_path: str = "data/shared.sqlite3"
+    shared_flight_lease: float = 10.0  # 执行者租约时长（秒），进程退出后其他进程最多等待这么久接手
+    shared_flight_poll_interval: float = 0.05
     
     # 域名配置
     base_url: str = "https://myapi.5845.cn"
@@ -22,11 +36,116 @@ class Settings(BaseSettings):
     # 静态文件配置
     static_img_dir: str = "static/images"
     base_image_url: str = "https://myapi.5845.cn/static/images/"  # 可通过BASE_IMAGE_URL环境变量覆盖
+    image_index_path: str = "data/images.sqlite3"  # 图片源地址 -> 内容摘要索引
     
     # 网络请求配置
     request_timeout: int = 10
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0 Safari/537.36"
     
+    # HTTP连接池配置
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_max_connections_per_host: int = 10
+    
+    # 上游访问保护：按主机令牌桶限流、幂等请求重试、熔断
+    upstream_rate_limit: float = 10.0  # 每个主机每秒请求数，0 表示不限流
+    upstream_rate_burst: int = 20
+    upstream_host_rate_limits: Dict[str, float] = {}  # 按主机覆盖速率，如 {"mmbiz.qpic.cn": 50}
+    upstream_retries: int = 2
+    upstream_retry_backoff: float = 0.5  # 指数退避的基准时间（秒）
+    upstream_retry_max_backoff: float = 10.0
+    circuit_failure_threshold: int = 5  # 连续失败次数达到阈值后熔断，0 表示不熔断
+    circuit_reset_timeout: float = 30.0  # 熔断持续时间（秒）
+    
+    # HTML解析器：lxml（更快，未安装时自动回退）/ html.parser
+    html_parser: str = "lxml"
+    
+    # CPU密集型任务执行器：thread（正文只解析一次）/ process（多核并行，但解析结果以HTML返回，转换时需再解析一次）/ inline
+    cpu_executor: str = "thread"
+    cpu_executor_workers: int = 0  # 0 表示使用CPU核数（多 worker 时为 核数 / worker 数）
+    
+    # 图片下载配置
+    image_download_concurrency: int = 8
+    image_download_deadline: float = 60.0  # 单篇文章图片下载总时限（秒）
+    image_max_bytes: int = 20 * 1024 * 1024  # 单张图片大小上限
+    image_mode: str = "eager"  # eager：转换时下载全部图片；lazy：只改写为本地地址，首次访问时再下载
+    
+    # 图片优化（需安装 Pillow）：下载后生成 WebP / AVIF 版本，按请求的 Accept 头返回
+    image_optimize: bool = False
+    image_optimize_formats: List[str] = ["webp"]  # 可选 webp、avif，按优先级排列
+    image_optimize_quality: int = 80
+    image_optimize_max_dimension: int = 1920  # 长边超过时等比缩小，0 表示不缩放
+    image_allowed_content_types: List[str] = ["image/"]  # 允许的Content-Type前缀
+    image_stream_chunk_size: int = 64 * 1024
+    
+    # 图片存储预算：超出时按最近访问时间淘汰，被淘汰的图片再次访问时重新下载
+    image_storage_max_bytes: int = 0  # 0 表示不限制
+    image_storage_max_files: int = 0  # 0 表示不限制
+    image_storage_check_interval: float = 60.0  # 检查占用、写入访问时间的间隔（秒）
+    
+    # 元数据模式：流式读取页面头部，找到 og 标签后即断开
+    metadata_max_bytes: int = 256 * 1024  # 最多读取的页面字节数
+    
+    # 批量转换配置
+    batch_max_urls: int = 100
+    batch_concurrency: int = 4  # 所有批量请求共享的并发转换数（每个进程）
+    
+    # 文章缓存配置
+    cache_backend: str = "memory"  # memory / disk / none
+    cache_ttl: int = 3600
+    cache_stale_ttl: int = 86400  # 过期后继续保留的时间，期间通过条件请求向上游重新验证
+    cache_max_entries: int = 1024
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_path: str = "data/cache.sqlite3"
+    
+    # 文章归档：转换结果持久化保存，支持全文检索和按地址查询
+    archive_enabled: bool = True
+    archive_path: str = "data/articles.sqlite3"
+    
+    # 后台任务配置
+    job_db_path: str = "data/jobs.sqlite3"
+    job_workers: int = 2
+    job_poll_interval: float = 1.0  # 轮询其他进程提交的任务的间隔（秒）
+    job_timeout: float = 600.0  # 单个任务执行时限（秒）
+    job_max_attempts: int = 3  # 执行中断（如进程崩溃）后的最大重试次数
+    job_retention: int = 7 * 86400  # 已完成任务的保留时间（秒）
+    job_callback_timeout: float = 10.0
+    job_callback_retries: int = 3
+    # 允许的回调主机（域名及其子域名）；为空时允许任意主机，但必须解析为公网地址
+    job_callback_allowed_hosts: List[str] = []
+    
+    # 已跟踪文章的定期刷新（内容指纹未变化时不处理图片、不重新转换）
+    tracker_db_path: str = "data/tracked.sqlite3"
+    refresh_enabled: bool = True  # 是否在本进程运行刷新调度
+    refresh_interval: float = 3600.0  # 默认刷新间隔（秒）
+    refresh_min_interval: float = 60.0  # 允许设置的最短刷新间隔（秒）
+    refresh_rate: float = 0.5  # 每秒最多开始的刷新数（每个进程），0 表示不限速
+    refresh_concurrency: int = 2
+    refresh_batch_size: int = 20  # 每次领取的到期文章数
+    refresh_poll_interval: float = 10.0  # 没有到期文章时的检查间隔（秒）
+    refresh_timeout: float = 600.0  # 单篇文章刷新时限（秒）
+    
+    # 日志与请求追踪
+    log_format: str = "text"  # text / json（每条日志一行 JSON，含请求ID和结构化字段）
+    request_id_header: str = "X-Request-ID"  # 沿用客户端传入的请求ID，未传入时生成，并在响应头中返回
+    trace_enabled: bool = True  # 记录每个请求中各处理阶段和每张图片下载的耗时
+    trace_log_requests: bool = False  # 是否记录所有请求的追踪（默认只记录慢请求）
+    trace_max_spans: int = 1000  # 单个请求最多记录的阶段数
+    slow_request_threshold: float = 10.0  # 慢请求阈值（秒），0 表示不记录
+    slow_request_profile: bool = False  # 请求超过阈值后开始采样调用栈，随慢请求日志输出（采样整个进程，默认关闭）
+    profile_interval: float = 0.005  # 采样间隔（秒）
+    profile_top_stacks: int = 30  # 输出样本数最多的调用栈数量
+    
+    # 响应压缩配置（安装 brotli 后支持 br，否则只使用 gzip）
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    compression_cache_entries: int = 256  # 按 ETag 缓存的压缩结果数
+    
+    # 静态文件由 nginx 发送时的内部路径前缀（X-Accel-Redirect），留空则由应用直接发送
+    static_accel_redirect: str = ""
+    
     # 允许的域名
     allowed_domains: List[str] = ["mp.weixin.qq.com"]
     
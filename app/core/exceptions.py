@@ -28,6 +28,13 @@ class NetworkRequestException(WeChatScraperException):
         super().__init__(status_code=502, detail=detail)
 
 
+class UpstreamUnavailableException(WeChatScraperException):
+    """上游熔断中，请求未发出即失败"""
+    
+    def __init__(self, detail: str = "上游服务暂时不可用", retry_after: float = 0):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(max(int(retry_after), 1))})
+
+
 class ContentParseException(WeChatScraperException):
     """内容解析异常"""
     
@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class CPUExecutor:
+    """CPU密集型任务（HTML解析、Markdown转换）执行器
+    
+    - process：进程池，绕开GIL，可利用多核；参数和返回值需可序列化；
+    - thread：线程池，不阻塞事件循环，但受GIL限制无法并行；
+    - inline：在当前线程直接执行（未启动时的默认行为，便于测试和脚本使用）。
+    """
+    
+    def __init__(self):
+        self._executor: Optional[Executor] = None
+        self.kind = "inline"
+    
+    @property
+    def crosses_process(self) -> bool:
+        """任务是否在其他进程中执行（决定能否传递解析后的节点树）"""
+        return self.kind == "process"
+    
+    def start(self, kind: Optional[str] = None, workers: Optional[int] = None) -> None:
+        """创建执行器（在应用 lifespan 启动时调用）"""
+        if self._executor is not None:
+            return
+        kind = kind or settings.cpu_executor
+        # 多 worker 部署时各进程平分CPU核数，避免进程池总数成倍超出核数
+        workers = workers or settings.cpu_executor_workers or max((os.cpu_count() or 1) // settings.workers, 1)
+        if kind == "process":
+            # 使用 spawn 避免 fork 继承事件循环和数据库连接等状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        elif kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu")
+        else:
+            kind = "inline"
+        self.kind = kind
+    
+    def shutdown(self) -> None:
+        """关闭执行器（在应用 lifespan 关闭时调用）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.kind = "inline"
+    
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在执行器中运行函数，事件循环在此期间继续处理其他请求"""
+        if self._executor is None:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+
+# 全局CPU执行器实例
+cpu_executor = CPUExecutor()
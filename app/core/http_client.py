@@ -0,0 +1,199 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.core.resilience import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS_CODES,
+    CircuitBreaker,
+    CircuitOpenError,
+    TokenBucket,
+    retry_delay
+)
+from app.utils.metrics import (
+    UPSTREAM_CIRCUIT_OPEN,
+    UPSTREAM_RATE_LIMIT,
+    UPSTREAM_RATE_LIMIT_WAIT,
+    UPSTREAM_REJECTED,
+    UPSTREAM_REQUESTS_IN_FLIGHT,
+    UPSTREAM_RESPONSES,
+    UPSTREAM_RETRIES
+)
+from app.utils.tracing import span
+
+
+class AsyncHTTPClient:
+    """共享的异步HTTP客户端（长连接池 + 按主机并发限制、限流、重试和熔断）"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._rate_limiters: Dict[str, Optional[TokenBucket]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """根据配置创建连接池客户端"""
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            headers={"User-Agent": settings.user_agent},
+            timeout=settings.request_timeout,
+            limits=limits,
+            transport=self._transport,
+            follow_redirects=True
+        )
+
+    async def start(self) -> None:
+        """创建客户端（在应用 lifespan 启动时调用）"""
+        if self._client is None:
+            self._client = self._create_client()
+
+    async def close(self) -> None:
+        """关闭客户端并释放连接（在应用 lifespan 关闭时调用）"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_semaphores.clear()
+        self._rate_limiters.clear()
+        self._breakers.clear()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取底层客户端，未启动时按需创建"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取目标主机的并发信号量"""
+        host = urlparse(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.http_max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _rate_limiter(self, host: str) -> Optional[TokenBucket]:
+        """获取目标主机的令牌桶，速率为 0 时不限流"""
+        if host not in self._rate_limiters:
+            rate = settings.upstream_host_rate_limits.get(host, settings.upstream_rate_limit)
+            self._rate_limiters[host] = TokenBucket(rate, settings.upstream_rate_burst) if rate > 0 else None
+            UPSTREAM_RATE_LIMIT.set(rate, host=host)
+        return self._rate_limiters[host]
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        """获取目标主机的熔断器"""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(settings.circuit_failure_threshold, settings.circuit_reset_timeout)
+            self._breakers[host] = breaker
+        return breaker
+
+    async def _admit(self, host: str) -> CircuitBreaker:
+        """发出请求前检查熔断并按限流等待，主机熔断中时直接失败"""
+        breaker = self._breaker(host)
+        if not breaker.allow():
+            UPSTREAM_REJECTED.inc(host=host)
+            raise CircuitOpenError(host, breaker.retry_after)
+        limiter = self._rate_limiter(host)
+        if limiter is not None:
+            waited = await limiter.acquire()
+            if waited > 0:
+                UPSTREAM_RATE_LIMIT_WAIT.observe(waited, host=host)
+        return breaker
+
+    @staticmethod
+    def _record(host: str, breaker: CircuitBreaker, status_code: Optional[int]) -> None:
+        """记录响应状态（None 表示未拿到响应），5xx 和 429 计为主机故障"""
+        UPSTREAM_RESPONSES.inc(host=host, status="error" if status_code is None else str(status_code))
+        if status_code is None or status_code in RETRYABLE_STATUS_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        UPSTREAM_CIRCUIT_OPEN.set(1 if breaker.is_open else 0, host=host)
+
+    async def _backoff(self, host: str, attempt: int, response: Optional[httpx.Response] = None) -> None:
+        UPSTREAM_RETRIES.inc(host=host)
+        await asyncio.sleep(retry_delay(
+            attempt, settings.upstream_retry_backoff, settings.upstream_retry_max_backoff, response
+        ))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发起请求：按主机限流、并发限制和熔断；幂等请求遇到网络错误或 429/5xx 时退避重试"""
+        host = urlparse(url).netloc
+        retries = settings.upstream_retries if method.upper() in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        with span("upstream", method=method.upper(), host=host) as item:
+            while True:
+                breaker = await self._admit(host)
+                async with self._host_semaphore(url):
+                    with UPSTREAM_REQUESTS_IN_FLIGHT.track_inprogress(host=host):
+                        try:
+                            response = await self.client.request(method, url, **kwargs)
+                        except httpx.TransportError:
+                            self._record(host, breaker, None)
+                            if attempt >= retries:
+                                raise
+                            response = None
+                if response is not None:
+                    self._record(host, breaker, response.status_code)
+                    if attempt >= retries or response.status_code not in RETRYABLE_STATUS_CODES:
+                        if item is not None:
+                            item.set(status=response.status_code, attempts=attempt + 1)
+                        return response
+                await self._backoff(host, attempt, response)
+                attempt += 1
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """发起GET请求"""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """发起POST请求"""
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """以流式方式发起请求，响应读取完毕前一直占用主机并发名额
+
+        只在拿到可用响应之前重试，响应体读取过程中的错误直接抛出。
+        """
+        host = urlparse(url).netloc
+        retries = settings.upstream_retries if method.upper() in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            breaker = await self._admit(host)
+            retry_response = None
+            async with self._host_semaphore(url):
+                with UPSTREAM_REQUESTS_IN_FLIGHT.track_inprogress(host=host):
+                    responded = False
+                    try:
+                        async with self.client.stream(method, url, **kwargs) as response:
+                            responded = True
+                            self._record(host, breaker, response.status_code)
+                            if attempt < retries and response.status_code in RETRYABLE_STATUS_CODES:
+                                retry_response = response
+                            else:
+                                yield response
+                                return
+                    except httpx.TransportError:
+                        # 读取响应体时的错误已按状态码计数，只处理未拿到响应的失败
+                        if responded:
+                            raise
+                        self._record(host, breaker, None)
+                        if attempt >= retries:
+                            raise
+            await self._backoff(host, attempt, retry_response)
+            attempt += 1
+
+
+# 全局HTTP客户端实例
+http_client = AsyncHTTPClient()
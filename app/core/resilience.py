@@ -0,0 +1,111 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+import httpx
+
+# 可重试的上游状态码（限流和临时故障）
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 幂等方法，失败后可安全重发
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """目标主机熔断中，请求未发出即失败"""
+    
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"上游 {host} 暂时不可用，{retry_after:.0f} 秒后重试")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶限流：平均速率为 rate 次/秒，允许 burst 次突发
+    
+    令牌不足时预支令牌（可为负数）并等待，等待中的请求按到达顺序依次放行。
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+    
+    def reserve(self) -> float:
+        """取得一个令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    async def acquire(self) -> float:
+        """等待直到取得令牌，返回等待的秒数"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """熔断器
+    
+    - 闭合：正常放行，连续失败达到阈值后断开；
+    - 断开：reset_timeout 内直接失败，不再访问上游；
+    - 半开：断开期满后放行一个试探请求，成功则闭合，失败则继续断开。
+    """
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until: Optional[float] = None
+    
+    @property
+    def is_open(self) -> bool:
+        return self.open_until is not None
+    
+    @property
+    def retry_after(self) -> float:
+        """距离下次允许试探的秒数"""
+        if self.open_until is None:
+            return 0.0
+        return max(self.open_until - time.monotonic(), 0.0)
+    
+    def allow(self) -> bool:
+        """当前是否允许发出请求"""
+        if self.open_until is None:
+            return True
+        now = time.monotonic()
+        if now < self.open_until:
+            return False
+        # 半开：放行一个试探请求，结果出来前其余请求继续快速失败
+        self.open_until = now + self.reset_timeout
+        return True
+    
+    def record_success(self) -> None:
+        self.failures = 0
+        self.open_until = None
+    
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.open_until is not None or self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.reset_timeout
+
+
+def retry_delay(
+    attempt: int,
+    base: float,
+    maximum: float,
+    response: Optional[httpx.Response] = None
+) -> float:
+    """第 attempt 次重试前的等待时间：带完全抖动的指数退避，优先遵循上游的 Retry-After"""
+    if response is not None:
+        retry_after = response.headers.get("retry-after", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), maximum)
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
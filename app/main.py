@@ -1,10 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.executor import cpu_executor
+from app.core.http_client import http_client
 from app.api.api import api_router
+from app.api.metrics import router as metrics_router
+from app.services.image_storage import image_storage
+from app.services.jobs import job_queue
+from app.services.tracker import article_tracker
+from app.services.wechat_service import async_wechat_service
+from app.utils.compression import CompressionMiddleware
+from app.utils.logger import logger
+from app.utils.metrics import MetricsMiddleware
+from app.utils.static_files import ImageStaticFiles
+from app.utils.tracing import TracingMiddleware
 
 
 @asynccontextmanager
@@ -12,9 +23,22 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时的初始化操作
     print(f"启动 {settings.app_name} v{settings.app_version}")
+    async_wechat_service.prepare_storage()
+    if settings.workers > 1 and not async_wechat_service.cache.shared:
+        logger.warning("多 worker 部署时文章缓存未在进程间共享，建议设置 CACHE_BACKEND=disk")
+    await http_client.start()
+    cpu_executor.start()
+    job_queue.start()
+    image_storage.start()
+    article_tracker.start()
     yield
     # 关闭时的清理操作
     print("应用正在关闭...")
+    await job_queue.stop()
+    await article_tracker.stop()
+    await image_storage.stop()
+    await http_client.close()
+    cpu_executor.shutdown()
 
 
 def create_application() -> FastAPI:
@@ -37,12 +61,41 @@ def create_application() -> FastAPI:
         allow_headers=settings.cors_headers,
     )
     
+    # 按 Accept-Encoding 压缩文本响应
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        cache_entries=settings.compression_cache_entries
+    )
+    
+    # 请求耗时与进行中请求数统计（覆盖所有中间件和路由）
+    app.add_middleware(MetricsMiddleware)
+    
+    # 请求ID与处理阶段追踪、慢请求分析（最外层，请求期间的日志都带上请求ID）
+    app.add_middleware(TracingMiddleware)
+    
     # 挂载静态文件
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount(
+        "/static",
+        ImageStaticFiles(
+            directory="static",
+            accel_redirect=settings.static_accel_redirect,
+            lazy_loader=async_wechat_service.load_lazy_image,
+            variants=settings.image_optimize_formats if settings.image_optimize else (),
+            restore_loader=async_wechat_service.restore_image,
+            on_access=image_storage.touch
+        ),
+        name="static"
+    )
     
     # 注册API路由
     app.include_router(api_router, prefix="/api")
     
+    # 监控指标
+    app.include_router(metrics_router, tags=["metrics"])
+    
     return app
 
 
@@ -54,7 +107,7 @@ if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=5201,
+        host=settings.host,
+        port=settings.port,
         reload=settings.debug
     ) 
\ No newline at end of file
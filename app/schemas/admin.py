@@ -0,0 +1,27 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+
+class ImageStorageResponse(BaseModel):
+    """图片存储占用响应模型"""
+    files: int
+    bytes: int
+    max_files: int
+    max_bytes: int
+    evicted_files: int
+    evicted_bytes: int
+    last_eviction_at: Optional[float] = None
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "files": 1200,
+                "bytes": 734003200,
+                "max_files": 0,
+                "max_bytes": 1073741824,
+                "evicted_files": 35,
+                "evicted_bytes": 20971520,
+                "last_eviction_at": 1760000000.0
+            }
+        }
+    )
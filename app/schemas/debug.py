@@ -0,0 +1,31 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, List, Optional
+
+
+class ProfileResponse(BaseModel):
+    """单篇文章处理分析结果：各阶段耗时和采样调用栈"""
+    request_id: str
+    url: str
+    format: str
+    duration_ms: float
+    error: Optional[str] = None
+    summary: Dict[str, Dict[str, float]]
+    spans: List[Dict[str, Any]]
+    dropped_spans: int
+    profile: Dict[str, Any]
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "request_id": "3f2b8c1e9a7d4b60",
+                "url": "https://mp.weixin.qq.com/s/example",
+                "format": "markdown",
+                "duration_ms": 842.5,
+                "error": None,
+                "summary": {"fetch": {"count": 1, "total_ms": 210.4}, "image": {"count": 12, "total_ms": 1530.2}},
+                "spans": [{"name": "fetch", "start_ms": 0.3, "duration_ms": 210.4, "parent": None}],
+                "dropped_spans": 0,
+                "profile": {"samples": 160, "interval_ms": 5.0, "duration_ms": 842.1, "stacks": []}
+            }
+        }
+    )
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, HttpUrl, field_validator, ConfigDict
-from typing import Optional
+from typing import List, Literal, Optional, Union
+
+from app.core.config import settings
+from app.utils.url import parse_article_url
 
 
 class WeChatArticleRequest(BaseModel):
@@ -10,8 +13,7 @@ class WeChatArticleRequest(BaseModel):
     @classmethod
     def validate_wechat_url(cls, v):
         """验证是否为微信公众号URL"""
-        url_str = str(v)
-        if not any(domain in url_str for domain in ['mp.weixin.qq.com']):
+        if parse_article_url(str(v), tuple(settings.allowed_domains)) is None:
             raise ValueError('只允许抓取微信公众号文章')
         return v
 
@@ -33,6 +35,181 @@ class WeChatArticleResponse(BaseModel):
     )
 
 
+class WeChatMetadataResponse(BaseModel):
+    """文章元数据响应模型"""
+    title: str
+    cover: Optional[str] = None
+    description: Optional[str] = None
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "title": "文章标题",
+                "cover": "https://example.com/cover.jpg",
+                "description": "文章摘要"
+            }
+        }
+    )
+
+
+class WeChatBatchRequest(BaseModel):
+    """批量转换请求模型"""
+    urls: List[str]
+    format: Literal["html", "markdown"] = "markdown"
+    
+    @field_validator('urls')
+    @classmethod
+    def validate_urls(cls, v):
+        """限制单次批量请求的URL数量"""
+        if not v:
+            raise ValueError('urls 不能为空')
+        if len(v) > settings.batch_max_urls:
+            raise ValueError(f'单次最多提交 {settings.batch_max_urls} 个URL')
+        return v
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "urls": ["https://mp.weixin.qq.com/s/example"],
+                "format": "markdown"
+            }
+        }
+    )
+
+
+class WeChatBatchItem(BaseModel):
+    """批量转换结果（NDJSON中的一行）"""
+    index: int
+    url: str
+    status: int
+    data: Optional[Union[WeChatArticleResponse, str]] = None
+    error: Optional[str] = None
+
+
+class WeChatJobRequest(BaseModel):
+    """后台转换任务请求模型"""
+    url: str
+    format: Literal["html", "markdown"] = "markdown"
+    callback_url: Optional[HttpUrl] = None
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "url": "https://mp.weixin.qq.com/s/example",
+                "format": "markdown",
+                "callback_url": "https://example.com/webhook"
+            }
+        }
+    )
+
+
+class WeChatJobResponse(BaseModel):
+    """后台转换任务状态（完成后回调时POST同样的结构）"""
+    id: str
+    url: str
+    format: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    status_code: Optional[int] = None
+    data: Optional[Union[WeChatArticleResponse, str]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class TrackArticleRequest(BaseModel):
+    """跟踪文章请求模型"""
+    url: str
+    format: Literal["html", "markdown"] = "markdown"
+    interval: Optional[float] = None  # 刷新间隔（秒），默认使用 REFRESH_INTERVAL，不小于 REFRESH_MIN_INTERVAL
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "url": "https://mp.weixin.qq.com/s/example",
+                "format": "markdown",
+                "interval": 3600
+            }
+        }
+    )
+
+
+class TrackedArticleResponse(BaseModel):
+    """已跟踪文章的刷新状态"""
+    url: str
+    format: str
+    interval: float
+    fingerprint: Optional[str] = None
+    next_check_at: float
+    last_checked_at: Optional[float] = None
+    last_changed_at: Optional[float] = None
+    last_error: Optional[str] = None
+    checks: int
+    changes: int
+    created_at: float
+
+
+class TrackedArticleListResponse(BaseModel):
+    """已跟踪文章列表"""
+    total: int
+    items: List[TrackedArticleResponse]
+
+
+class CacheStatsResponse(BaseModel):
+    """文章缓存统计响应模型"""
+    backend: str
+    hits: int
+    misses: int
+    hit_ratio: float
+    entries: int
+    bytes: int
+
+
+class ArchivedArticleResponse(BaseModel):
+    """归档文章响应模型（content 为HTML格式正文，markdown 为Markdown格式正文，未转换过的格式为空）"""
+    url: str
+    title: str
+    cover: Optional[str] = None
+    content: Optional[str] = None
+    markdown: Optional[str] = None
+    fetched_at: float
+
+
+class ArchiveSearchItem(BaseModel):
+    """归档检索结果"""
+    url: str
+    title: str
+    cover: Optional[str] = None
+    snippet: str
+    score: float
+    fetched_at: float
+
+
+class ArchiveSearchResponse(BaseModel):
+    """归档检索响应模型"""
+    query: str
+    total: int
+    items: List[ArchiveSearchItem]
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "query": "公众号 运营",
+                "total": 1,
+                "items": [
+                    {
+                        "url": "https://mp.weixin.qq.com/s/example",
+                        "title": "公众号运营指南",
+                        "cover": "https://example.com/cover.jpg",
+                        "snippet": "…做好公众号运营的第一步是…",
+                        "score": 3.52,
+                        "fetched_at": 1760000000.0
+                    }
+                ]
+            }
+        }
+    )
+
+
 class ErrorResponse(BaseModel):
     """错误响应模型"""
     error: str
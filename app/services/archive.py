@@ -0,0 +1,210 @@
+import asyncio
+import html as html_lib
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.utils.sqlite import SQLiteDatabase
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    cover TEXT,
+    html TEXT,
+    markdown TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, body, tokenize = 'unicode61');
+"""
+
+ARCHIVE_MIGRATIONS = (
+    # 生成各格式结果时文章的内容指纹：内容未变化时刷新可直接沿用归档的结果
+    "ALTER TABLE articles ADD COLUMN html_fingerprint TEXT",
+    "ALTER TABLE articles ADD COLUMN markdown_fingerprint TEXT",
+)
+
+ARTICLE_COLUMNS = (
+    "key", "url", "title", "cover", "html", "markdown", "fetched_at", "html_fingerprint", "markdown_fingerprint"
+)
+
+# 标题命中的权重（bm25 各列权重：标题、正文）
+TITLE_WEIGHT = 5.0
+
+# 中日韩文字：连续的一段按相邻两字切分（二元分词），无需词典即可检索任意词语
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+CJK_RUN = re.compile(f"[{CJK_CHARS}]+")
+QUERY_TOKEN = re.compile(f"[{CJK_CHARS}]+|(?:(?![{CJK_CHARS}])[^\\W_])+")
+
+MARKDOWN_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+MARKDOWN_LINK = re.compile(r"\]\([^)]*\)")
+MARKDOWN_SYMBOLS = re.compile(r"[#*_>`|~\[\]-]+")
+HTML_TAG = re.compile(r"<[^>]+>")
+WHITESPACE = re.compile(r"\s+")
+
+
+def cjk_bigrams(run: str) -> List[str]:
+    """一段连续的中日韩文字切分为相邻两字，单字保持不变"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def segment_text(text: str) -> str:
+    """索引前的分词：中日韩文字转为空格分隔的二元词，其他文字交给 FTS5 的 unicode61 分词器"""
+    return CJK_RUN.sub(lambda m: f" {' '.join(cjk_bigrams(m.group()))} ", text)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """将用户输入转换为 FTS5 查询：各词之间为 AND，中日韩词语按二元词组成短语匹配
+    
+    只保留文字和数字，用户输入中的 FTS5 语法字符不会生效；没有可检索的词时返回 None。
+    """
+    terms = []
+    for token in QUERY_TOKEN.findall(query):
+        if CJK_RUN.fullmatch(token):
+            if len(token) == 1:
+                # 单字以前缀匹配，命中以该字开头的二元词
+                terms.append(f'"{token}" *')
+            else:
+                terms.append(f'"{" ".join(cjk_bigrams(token))}"')
+        else:
+            terms.append(f'"{token.lower()}"')
+    return " ".join(terms) or None
+
+
+def article_text(html: Optional[str] = None, markdown: Optional[str] = None) -> str:
+    """文章正文的纯文本（优先使用Markdown），去掉图片地址、链接地址和格式符号"""
+    if markdown:
+        text = MARKDOWN_IMAGE.sub(r"\1", markdown)
+        text = MARKDOWN_LINK.sub("]", text)
+        text = MARKDOWN_SYMBOLS.sub(" ", text)
+    elif html:
+        text = html_lib.unescape(HTML_TAG.sub(" ", html))
+    else:
+        return ""
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def make_snippet(text: str, query: str, width: int = 120) -> str:
+    """截取正文中第一个命中词附近的片段"""
+    lowered = text.lower()
+    positions = [lowered.find(token.lower()) for token in QUERY_TOKEN.findall(query)]
+    start = min((pos for pos in positions if pos >= 0), default=0)
+    start = max(start - width // 4, 0)
+    snippet = text[start:start + width]
+    if start > 0:
+        snippet = "…" + snippet
+    if start + width < len(text):
+        snippet += "…"
+    return snippet
+
+
+class ArticleArchive:
+    """文章归档：持久化保存转换结果，基于 SQLite FTS5 全文检索
+    
+    - 以文章标识为键，HTML 和 Markdown 两种结果分别写入，互不覆盖，各自记录生成时的内容指纹；
+    - 标题和正文经二元分词后写入 FTS5 索引，按 bm25 排序（标题权重更高）；
+    - 按地址查询只读本地数据库，不访问上游。
+    """
+    
+    def __init__(self, path: Union[str, Path]):
+        self.db = SQLiteDatabase(path, ARCHIVE_SCHEMA, ARCHIVE_MIGRATIONS)
+    
+    def _save_sync(
+        self,
+        key: str,
+        url: str,
+        title: str,
+        cover: Optional[str],
+        html: Optional[str],
+        markdown: Optional[str],
+        fingerprint: Optional[str]
+    ) -> None:
+        conn = self.db.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row_id, html, markdown = self.db.fetchone(
+                "INSERT INTO articles (key, url, title, cover, html, markdown, fetched_at, "
+                "html_fingerprint, markdown_fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET url = excluded.url, title = excluded.title, "
+                "cover = excluded.cover, html = COALESCE(excluded.html, html), "
+                "markdown = COALESCE(excluded.markdown, markdown), fetched_at = excluded.fetched_at, "
+                "html_fingerprint = IIF(excluded.html IS NULL, html_fingerprint, excluded.html_fingerprint), "
+                "markdown_fingerprint = IIF(excluded.markdown IS NULL, markdown_fingerprint, excluded.markdown_fingerprint) "
+                "RETURNING id, html, markdown",
+                (
+                    key, url, title, cover, html, markdown, time.time(),
+                    fingerprint if html is not None else None,
+                    fingerprint if markdown is not None else None
+                )
+            )
+            conn.execute("DELETE FROM articles_fts WHERE rowid = ?", (row_id,))
+            conn.execute(
+                "INSERT INTO articles_fts (rowid, title, body) VALUES (?, ?, ?)",
+                (row_id, segment_text(title), segment_text(article_text(html, markdown)))
+            )
+    
+    def _get_sync(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.db.fetchone(f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles WHERE key = ?", (key,))
+        return dict(zip(ARTICLE_COLUMNS, row)) if row else None
+    
+    def _search_sync(self, query: str, limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        match = build_match_query(query)
+        if match is None:
+            return 0, []
+        total = self.db.fetchone("SELECT COUNT(*) FROM articles_fts WHERE articles_fts MATCH ?", (match,))[0]
+        rows = self.db.connect().execute(
+            "SELECT a.url, a.title, a.cover, a.fetched_at, a.html, a.markdown, "
+            f"bm25(articles_fts, {TITLE_WEIGHT}, 1.0) AS rank "
+            "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+            "WHERE articles_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+            (match, limit, offset)
+        ).fetchall()
+        items = [
+            {
+                "url": url,
+                "title": title,
+                "cover": cover,
+                "fetched_at": fetched_at,
+                "snippet": make_snippet(article_text(html, markdown), query),
+                "score": -rank
+            }
+            for url, title, cover, fetched_at, html, markdown, rank in rows
+        ]
+        return total, items
+    
+    async def save(
+        self,
+        key: str,
+        url: str,
+        title: str,
+        cover: Optional[str] = None,
+        html: Optional[str] = None,
+        markdown: Optional[str] = None,
+        fingerprint: Optional[str] = None
+    ) -> None:
+        """保存文章（已存在时更新），html / markdown 为 None 时保留已归档的内容
+        
+        fingerprint 为生成本次结果时的内容指纹，与写入的格式一同记录。
+        """
+        await asyncio.to_thread(self._save_sync, key, url, title, cover, html, markdown, fingerprint)
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """按文章标识查询归档，未归档时返回 None"""
+        return await asyncio.to_thread(self._get_sync, key)
+    
+    async def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """全文检索，按相关度排序，返回命中总数和当前页结果"""
+        return await asyncio.to_thread(self._search_sync, query, limit, offset)
+
+
+def create_article_archive() -> Optional[ArticleArchive]:
+    """根据配置创建文章归档，未启用时返回 None"""
+    if not settings.archive_enabled:
+        return None
+    return ArticleArchive(settings.archive_path)
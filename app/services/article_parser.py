@@ -0,0 +1,290 @@
+import hashlib
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup, Comment, Doctype, NavigableString, PageElement, Tag
+from markdownify import (
+    MarkdownConverter,
+    re_extract_newlines,
+    should_remove_whitespace_inside,
+    should_remove_whitespace_outside
+)
+
+from app.core.exceptions import ContentParseException
+
+FALLBACK_HTML_PARSER = "html.parser"
+
+
+def resolve_html_parser(name: str) -> str:
+    """解析器可用性检查：lxml 未安装时回退到标准库 html.parser"""
+    if name == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            return FALLBACK_HTML_PARSER
+    return name
+
+
+def extract_article(html: str, parser: str = FALLBACK_HTML_PARSER) -> Tuple[str, Tag, Optional[str]]:
+    """解析文章页面（整页只解析一次），返回标题、正文节点树和封面图"""
+    try:
+        soup = BeautifulSoup(html, parser)
+        
+        # 提取标题
+        title_tag = soup.find('meta', property='og:title')
+        title = title_tag['content'] if title_tag else soup.title.string
+        if not title:
+            title = "无标题"
+        
+        # 提取内容
+        content_div = soup.find("div", class_="rich_media_content") or soup.find("div", id="js_content")
+        if not content_div:
+            raise ContentParseException("无法找到文章内容")
+        
+        # 提取封面图
+        cover_tag = soup.find('meta', property='og:image')
+        cover = cover_tag['content'] if cover_tag else None
+        
+        return title.strip(), content_div, cover
+    
+    except Exception as e:
+        raise ContentParseException(f"内容解析失败: {str(e)}")
+
+
+# 元数据模式读取的 og 属性 -> 结果字段
+METADATA_PROPERTIES = {"og:title": "title", "og:image": "cover", "og:description": "description"}
+
+
+class MetadataParser(HTMLParser):
+    """增量解析页面头部的 og 元数据，不构建节点树
+    
+    分块 feed 页面内容；所需标签都已找到或头部结束（</head> 或 <body>）后 done 为 True，调用者即可停止读取。
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.metadata: Dict[str, str] = {}
+        self.page_title: Optional[str] = None  # <title> 中的文本，没有 og:title 时使用
+        self.done = False
+        self._title_parts: Optional[List[str]] = None
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta":
+            attrs = dict(attrs)
+            name = METADATA_PROPERTIES.get(attrs.get("property") or "")
+            content = (attrs.get("content") or "").strip()
+            if name and content:
+                self.metadata.setdefault(name, content)
+                self.done = len(self.metadata) == len(METADATA_PROPERTIES)
+        elif tag == "title" and self.page_title is None:
+            self._title_parts = []
+        elif tag == "body":
+            self.done = True
+    
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.page_title = "".join(self._title_parts).strip()
+            self._title_parts = None
+        elif tag == "head":
+            self.done = True
+    
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+    
+    def result(self) -> Dict[str, Optional[str]]:
+        """标题（与正文解析相同，依次取 og:title、<title>）、封面和摘要"""
+        return {
+            "title": self.metadata.get("title") or self.page_title or "无标题",
+            "cover": self.metadata.get("cover"),
+            "description": self.metadata.get("description")
+        }
+
+
+@dataclass
+class ParsedArticle:
+    """解析后的文章
+    
+    content 在同一进程内为正文节点树（避免重复解析）；
+    需要跨进程传递时为序列化后的HTML字符串。
+    """
+    title: str
+    content: Union[Tag, str]
+    cover: Optional[str]
+    image_sources: List[str]
+    validators: Dict[str, str] = field(default_factory=dict)  # 上游页面的 ETag / Last-Modified
+    fingerprint: Optional[str] = None  # 内容指纹，与上次相同时可沿用上次的转换结果
+
+
+def content_fingerprint(title: str, cover: Optional[str], content_html: str) -> str:
+    """文章内容指纹：标题、封面和正文（js_content）HTML 的摘要，三者都未变化时转换结果不变"""
+    digest = hashlib.sha256()
+    for part in (title, cover or "", content_html):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def parse_article(html: str, parser: str = FALLBACK_HTML_PARSER, serialize: bool = False) -> ParsedArticle:
+    """解析阶段：提取标题、正文、封面，收集图片地址并计算内容指纹（可在进程池中执行）"""
+    title, content, cover = extract_article(html, parser)
+    content_html = str(content)
+    return ParsedArticle(
+        title=title,
+        content=content_html if serialize else content,
+        cover=cover,
+        image_sources=collect_image_sources(content),
+        fingerprint=content_fingerprint(title, cover, content_html)
+    )
+
+
+def serialize_content(content: Union[Tag, str]) -> str:
+    """正文序列化为HTML字符串"""
+    return content if isinstance(content, str) else str(content)
+
+
+def serialize_fragment(soup: BeautifulSoup, html: str) -> str:
+    """序列化解析后的HTML片段：lxml 等解析器会为片段补上 <html><body>，原文没有时只输出 body 内的内容"""
+    if soup.body is not None and "<body" not in html.lower():
+        return soup.body.decode_contents()
+    return str(soup)
+
+
+def parse_fragment(html: str, parser: str = FALLBACK_HTML_PARSER) -> Tag:
+    """将序列化后的正文HTML重新解析为节点树，返回正文根节点"""
+    soup = BeautifulSoup(html, parser)
+    return soup.find(id="js_content") or soup.body or soup
+
+
+def image_source(img: Tag) -> Optional[str]:
+    """获取图片的原始地址（微信正文图片通常为懒加载的 data-src）"""
+    src = img.get("data-src") or img.get("src")
+    if not src or not src.startswith("http"):
+        return None
+    return src
+
+
+def collect_image_sources(content: Tag) -> List[str]:
+    """按文档顺序收集正文中需要下载的图片地址（去重）"""
+    sources = (image_source(img) for img in content.find_all("img"))
+    return list(dict.fromkeys(src for src in sources if src))
+
+
+def apply_image_map(content: Tag, image_map: Dict[str, str]) -> None:
+    """将正文节点树中的图片地址原地替换为本地URL"""
+    for img in content.find_all("img"):
+        src = image_source(img)
+        if src in image_map:
+            img["src"] = image_map[src]
+
+
+class ArticleMarkdownConverter(MarkdownConverter):
+    """在转换过程中替换图片地址的 Markdown 转换器，不修改节点树本身"""
+    
+    def __init__(self, image_map: Optional[Dict[str, str]] = None, **options):
+        super().__init__(**options)
+        self.image_map = image_map if image_map is not None else {}
+    
+    def convert_img(self, el, text, parent_tags):
+        src = image_source(el)
+        if src not in self.image_map:
+            return super().convert_img(el, text, parent_tags)
+        # 以替换了 src 的只读视图代替原节点，避免共享节点树被并发修改
+        view = SimpleNamespace(attrs={**el.attrs, "src": self.image_map[src]}, parent=el.parent)
+        return super().convert_img(view, text, parent_tags)
+
+
+def render_markdown(content: Union[str, Tag], image_map: Optional[Dict[str, str]] = None) -> str:
+    """将正文（HTML字符串或已解析的节点树）转换为Markdown"""
+    try:
+        converter = ArticleMarkdownConverter(
+            image_map=image_map,
+            heading_style="ATX",
+            bullets="*",
+            strip=["script", "style"]
+        )
+        if isinstance(content, Tag):
+            # 直接转换子树时补上文档级的首尾换行处理，与转换完整文档的结果一致
+            return converter.convert__document_(content, converter.convert_soup(content), set())
+        return converter.convert(content)
+    except Exception as e:
+        raise ContentParseException(f"Markdown转换失败: {str(e)}")
+
+
+class MarkdownSectionRenderer:
+    """按正文的顶层子节点逐段转换Markdown，便于边下载图片边输出
+    
+    段与段之间按 markdownify 的规则合并换行，首尾空白延后到确定不是结尾时再输出，
+    所有段的输出拼接后与 render_markdown 的结果完全一致。
+    """
+    
+    def __init__(self, content: Tag, image_map: Optional[Dict[str, str]] = None):
+        self.image_map = image_map if image_map is not None else {}
+        self.converter = ArticleMarkdownConverter(
+            image_map=self.image_map,
+            heading_style="ATX",
+            bullets="*",
+            strip=["script", "style"]
+        )
+        remove_inside = should_remove_whitespace_inside(content)
+        self.sections = [
+            el for el in content.children
+            if not self._can_ignore(el, remove_inside)
+        ]
+        self.parent_tags = {content.name}
+        self._previous_trailing = ""
+        self._held = ""
+        self._started = False
+    
+    @staticmethod
+    def _can_ignore(el: PageElement, remove_inside: bool) -> bool:
+        """与 markdownify 处理子节点时忽略的空白、注释规则相同"""
+        if isinstance(el, Tag):
+            return False
+        if isinstance(el, (Comment, Doctype)):
+            return True
+        if isinstance(el, NavigableString) and str(el).strip() == "":
+            if remove_inside and (not el.previous_sibling or not el.next_sibling):
+                return True
+            return should_remove_whitespace_outside(el.previous_sibling) or \
+                should_remove_whitespace_outside(el.next_sibling)
+        return False
+    
+    def __len__(self) -> int:
+        return len(self.sections)
+    
+    def image_sources(self, index: int) -> List[str]:
+        """第 index 段中的图片地址"""
+        section = self.sections[index]
+        if not isinstance(section, Tag):
+            return []
+        images = [section] if section.name == "img" else section.find_all("img")
+        return list(dict.fromkeys(src for src in map(image_source, images) if src))
+    
+    def render(self, index: int) -> str:
+        """转换第 index 段（须按顺序调用），返回可以立即输出的文本"""
+        try:
+            text = self.converter.process_element(self.sections[index], parent_tags=self.parent_tags)
+        except Exception as e:
+            raise ContentParseException(f"Markdown转换失败: {str(e)}")
+        if not text:
+            return ""
+        leading, body, trailing = re_extract_newlines.match(text).groups()
+        if self._previous_trailing and leading:
+            leading = "\n" * min(2, max(len(self._previous_trailing), len(leading)))
+        else:
+            leading = self._previous_trailing + leading
+        self._previous_trailing = trailing
+        
+        output = self._held + leading + body
+        if not self._started:
+            output = output.lstrip()
+            if not output:
+                self._held = ""
+                return ""
+            self._started = True
+        stripped = output.rstrip()
+        self._held = output[len(stripped):]
+        return stripped
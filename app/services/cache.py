@@ -0,0 +1,274 @@
+import asyncio
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.metrics import CACHE_HIT_RATIO, CACHE_LOOKUPS
+from app.utils.sqlite import SQLiteDatabase
+
+
+@dataclass
+class ArticleEntry:
+    """缓存的文章结果及其验证信息
+
+    fresh_until 之前直接使用；之后（缓存项仍保留时）携带上游验证头发起条件请求，
+    上游返回 304 时无需重新抓取和转换。
+    """
+    body: Any
+    etag: str
+    last_modified: float  # 内容最近一次变化的时间
+    fresh_until: float
+    upstream: Dict[str, str] = field(default_factory=dict)  # 上游页面的 ETag / Last-Modified
+    fingerprint: Optional[str] = None  # 生成结果时文章的内容指纹
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional["ArticleEntry"]:
+        """从缓存值还原，旧格式的缓存值视为未命中"""
+        if not isinstance(data, dict) or "etag" not in data:
+            return None
+        return cls(**data)
+
+
+class CacheBackend(ABC):
+    """文章结果缓存后端基类（TTL + LRU淘汰，记录命中统计）"""
+
+    name = "base"
+    shared = False  # 是否在同机多个进程间共享
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        CACHE_LOOKUPS.inc(backend=self.name, result="miss" if value is None else "hit")
+        CACHE_HIT_RATIO.set(self.hits / (self.hits + self.misses), backend=self.name)
+        return value
+
+    async def peek(self, key: str) -> Optional[Any]:
+        """读取缓存但不计入命中统计（用于等待其他进程写入结果时的轮询）"""
+        return await self._get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出容量时按最近最少使用淘汰"""
+        await self._set(key, value, self.ttl if ttl is None else ttl)
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """删除缓存项"""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """清空缓存"""
+
+    @abstractmethod
+    async def size(self) -> Tuple[int, int]:
+        """返回当前 (条目数, 字节数)"""
+
+    async def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        entries, total_bytes = await self.size()
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes
+        }
+
+
+class MemoryCache(CacheBackend):
+    """进程内缓存"""
+
+    name = "memory"
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        super().__init__(ttl, max_entries, max_bytes)
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def _pop(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    async def _get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at, _ = item
+        if expires_at <= time.time():
+            self._pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if key in self._data:
+            self._pop(key)
+        self._data[key] = (value, time.time() + ttl, size)
+        self._bytes += size
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            self._pop(next(iter(self._data)))
+
+    async def delete(self, key: str) -> None:
+        if key in self._data:
+            self._pop(key)
+
+    async def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    async def size(self) -> Tuple[int, int]:
+        return len(self._data), self._bytes
+
+
+DISK_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at);
+"""
+
+
+class DiskCache(CacheBackend):
+    """基于SQLite的磁盘缓存，重启后保留，可被同机多个worker进程共享"""
+
+    name = "disk"
+    shared = True
+
+    def __init__(self, path: str, ttl: float, max_entries: int, max_bytes: int):
+        super().__init__(ttl, max_entries, max_bytes)
+        self.db = SQLiteDatabase(path, DISK_CACHE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return self.db.connect()
+
+    def _get_sync(self, key: str) -> Optional[Any]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def _set_sync(self, key: str, value: Any, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now + ttl, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """先清理过期项，再按访问时间淘汰直到满足容量限制"""
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total > self.max_bytes:
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def _size_sync(self) -> Tuple[int, int]:
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return row[0], row[1]
+
+    async def _get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._set_sync, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(lambda: self._connect().execute("DELETE FROM cache WHERE key = ?", (key,)))
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(lambda: self._connect().execute("DELETE FROM cache"))
+
+    async def size(self) -> Tuple[int, int]:
+        return await asyncio.to_thread(self._size_sync)
+
+
+class NullCache(CacheBackend):
+    """禁用缓存时使用的空实现"""
+
+    name = "none"
+
+    async def _get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        return None
+
+    async def delete(self, key: str) -> None:
+        return None
+
+    async def clear(self) -> None:
+        return None
+
+    async def size(self) -> Tuple[int, int]:
+        return 0, 0
+
+
+def create_cache_backend() -> CacheBackend:
+    """根据配置创建缓存后端"""
+    args = (settings.cache_ttl, settings.cache_max_entries, settings.cache_max_bytes)
+    if settings.cache_backend == "disk":
+        return DiskCache(settings.cache_path, *args)
+    if settings.cache_backend == "memory":
+        return MemoryCache(*args)
+    return NullCache(*args)
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖，未安装时不生成优化版本
+    Image = None
+
+# 优化版本的格式及其 Content-Type
+VARIANT_MEDIA_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+
+# 可转码的原图格式；SVG 等矢量图和本身已是目标格式的图片不处理
+SOURCE_SUFFIXES = frozenset({".png", ".jpg", ".jpeg", ".gif", ".bmp"})
+
+
+def variant_path(path: Path, fmt: str) -> Path:
+    """优化版本与原图同目录，文件名追加格式后缀：<sha256>.png -> <sha256>.png.webp"""
+    return path.with_name(f"{path.name}.{fmt}")
+
+
+@lru_cache(maxsize=None)
+def supported_formats() -> Tuple[str, ...]:
+    """当前环境可写出的优化格式"""
+    if Image is None:
+        return ()
+    try:
+        import pillow_avif  # noqa: F401  旧版 Pillow 通过插件支持 AVIF
+    except ImportError:
+        pass
+    Image.init()
+    return tuple(fmt for fmt in VARIANT_MEDIA_TYPES if fmt.upper() in Image.SAVE)
+
+
+def create_variants(
+    path: Union[str, Path],
+    formats: List[str],
+    quality: int,
+    max_dimension: int = 0
+) -> Dict[str, int]:
+    """为图片生成优化版本，返回 格式 -> 字节数
+    
+    超过 max_dimension 的图片等比缩小（动图保持原尺寸）；只保留比原图小的版本，
+    先写临时文件再原子重命名。已存在的版本不重复生成。
+    """
+    path = Path(path)
+    formats = [fmt for fmt in formats if fmt in supported_formats()]
+    if not formats or path.suffix.lower() not in SOURCE_SUFFIXES:
+        return {}
+    
+    original_size = path.stat().st_size
+    variants = {}
+    with Image.open(path) as img:
+        animated = getattr(img, "is_animated", False)
+        if not animated:
+            if max_dimension and max(img.size) > max_dimension:
+                img.thumbnail((max_dimension, max_dimension))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if img.mode in ("LA", "PA") or "transparency" in img.info else "RGB")
+        for fmt in formats:
+            target = variant_path(path, fmt)
+            if target.exists():
+                variants[fmt] = target.stat().st_size
+                continue
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, format=fmt.upper(), quality=quality, save_all=animated)
+                size = os.path.getsize(temp_path)
+                if size < original_size:
+                    os.replace(temp_path, target)
+                    variants[fmt] = size
+                else:
+                    os.unlink(temp_path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+    return variants
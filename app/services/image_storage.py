@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.image_store import ImageStore
+from app.services.wechat_service import AsyncWeChatService, async_wechat_service
+from app.utils.logger import logger
+from app.utils.metrics import IMAGE_EVICTIONS, IMAGE_STORAGE_BYTES, IMAGE_STORAGE_FILES
+
+
+class ImageStorageManager:
+    """图片存储空间管理
+    
+    - 静态图片被访问、转换时命中已存储的图片，访问时间都先记在内存中，由后台任务定期批量写入索引；
+    - 后台任务同时检查占用，超出预算时按最近最少访问淘汰；
+    - 被淘汰的图片保留源地址索引，再次访问或转换时重新下载。
+    """
+    
+    def __init__(self, service: Optional[AsyncWeChatService] = None):
+        self.service = service or async_wechat_service
+        self._accessed: Dict[str, float] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_eviction_at: Optional[float] = None
+    
+    @property
+    def store(self) -> ImageStore:
+        return self.service.image_store
+    
+    def touch(self, relative_path: str) -> None:
+        """记录一次图片访问（只写内存，不阻塞请求）"""
+        self._accessed[relative_path] = time.time()
+    
+    async def flush(self) -> None:
+        """将内存中的访问时间写入索引"""
+        if not self._accessed:
+            return
+        accessed, self._accessed = self._accessed, {}
+        await asyncio.to_thread(self.store.touch, accessed)
+    
+    async def run_once(self) -> Dict[str, Any]:
+        """写入访问时间并按预算淘汰，返回当前占用"""
+        await self.flush()
+        files, freed = await asyncio.to_thread(
+            self.store.evict, settings.image_storage_max_bytes, settings.image_storage_max_files
+        )
+        if files:
+            self.evicted_files += files
+            self.evicted_bytes += freed
+            self.last_eviction_at = time.time()
+            IMAGE_EVICTIONS.inc(files)
+            logger.info(f"图片存储超出预算，已淘汰 {files} 个文件，释放 {freed} 字节")
+        return await self.usage()
+    
+    async def usage(self) -> Dict[str, Any]:
+        """当前占用、预算和累计淘汰情况"""
+        files, size = await asyncio.to_thread(self.store.usage)
+        IMAGE_STORAGE_FILES.set(files)
+        IMAGE_STORAGE_BYTES.set(size)
+        return {
+            "files": files,
+            "bytes": size,
+            "max_files": settings.image_storage_max_files,
+            "max_bytes": settings.image_storage_max_bytes,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "last_eviction_at": self.last_eviction_at
+        }
+    
+    def start(self) -> None:
+        """启动后台任务（在应用 lifespan 启动时调用）"""
+        self.store.on_access = self.touch
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止后台任务并写入尚未保存的访问时间"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"图片存储检查失败: {e}")
+            await asyncio.sleep(settings.image_storage_check_interval)
+
+
+# 全局图片存储管理实例
+image_storage = ImageStorageManager()
@@ -0,0 +1,332 @@
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from app.core.exceptions import ImageDownloadException
+from app.utils.sqlite import SQLiteDatabase
+
+IMAGE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    source_url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_digest ON images(digest);
+CREATE TABLE IF NOT EXISTS lazy_images (
+    key TEXT PRIMARY KEY,
+    source_url TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_image_files_accessed ON image_files(accessed_at);
+"""
+
+IMAGE_INDEX_MIGRATIONS = (
+    # 旧版索引没有 image_files：已下载的文件按创建时间作为最近访问时间补录
+    "INSERT OR IGNORE INTO image_files (path, size, accessed_at) "
+    "SELECT path, MAX(size), MAX(created_at) FROM images GROUP BY path",
+)
+
+# 查询源地址对应的、当前仍在磁盘上的文件（被淘汰的文件不在 image_files 中）
+STORED_PATH_SQL = (
+    "SELECT images.path FROM images JOIN image_files ON image_files.path = images.path "
+    "WHERE images.source_url = ?"
+)
+
+# 延迟下载图片的访问路径前缀：<base_url>lazy/<源地址的SHA-256>
+LAZY_PREFIX = "lazy/"
+
+# 常见图片格式的文件头
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+    "image/bmp": ".bmp",
+}
+
+# 存储文件只使用以上扩展名，源地址中的其他扩展名（含 .svg / .html 等可执行脚本的格式）一律不采用
+ALLOWED_EXTENSIONS = frozenset(CONTENT_TYPE_EXTENSIONS.values())
+
+# 可包含脚本的图片类型：从本站 /static 提供会成为存储型XSS，不下载
+SCRIPTABLE_CONTENT_TYPES = frozenset({"image/svg+xml"})
+
+
+def guess_extension(head: bytes, content_type: Optional[str] = None, src: str = "") -> str:
+    """根据文件头、Content-Type 和源地址推断图片扩展名"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if content_type:
+        ext = CONTENT_TYPE_EXTENSIONS.get(content_type.split(";")[0].strip().lower())
+        if ext:
+            return ext
+    parsed = urlparse(src)
+    # 微信图片地址通常没有扩展名，格式在 wx_fmt 参数中
+    # 源地址中的扩展名不可信，只接受已知的图片扩展名，避免路径穿越或被当作其他类型提供
+    wx_fmt = parse_qs(parsed.query).get("wx_fmt")
+    if wx_fmt:
+        ext = "." + ("jpg" if wx_fmt[0].lower() == "jpeg" else wx_fmt[0].lower())
+    else:
+        ext = os.path.splitext(parsed.path)[-1].lower()
+    return ext if ext in ALLOWED_EXTENSIONS else ".jpg"
+
+
+class ImageStore:
+    """内容寻址的图片存储
+    
+    - 以图片内容的 SHA-256 命名，相同内容只存一份；
+    - 按摘要前缀分两级子目录存放，避免单目录文件过多；
+    - 先写临时文件再原子重命名，进程崩溃不会留下被当作完整文件的残缺图片；
+    - 维护 源地址 -> 存储路径 的索引，已下载的图片无需访问文件系统即可命中；
+    - 记录每个文件的大小和最近访问时间，超出存储预算时按最近最少访问淘汰，
+      淘汰后保留源地址索引，再次需要时重新下载；
+    - 存储预算只统计索引中的文件，目录中不在索引里的文件（旧版按 md5 命名的图片、
+      索引丢失后遗留的文件）不计入占用，也不会被淘汰；
+    - 命中索引时不直接写入访问时间，而是以存储路径调用 on_access（由调用方批量写入），
+      避免请求路径上的写事务。
+    """
+    
+    def __init__(
+        self,
+        root: Path,
+        base_url: str,
+        index_path: Path,
+        on_access: Optional[Callable[[str], None]] = None
+    ):
+        self.root = Path(root)
+        self.base_url = base_url
+        self.incoming_dir = self.root / ".incoming"
+        self.index = SQLiteDatabase(index_path, IMAGE_INDEX_SCHEMA, IMAGE_INDEX_MIGRATIONS)
+        self.on_access = on_access
+    
+    @staticmethod
+    def relative_path(digest: str, ext: str) -> str:
+        """存储路径：ab/cd/abcd...ext"""
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+    
+    def url_for(self, relative_path: str) -> str:
+        """存储路径对应的对外访问URL"""
+        return self.base_url + relative_path
+    
+    def lookup(self, src: str) -> Optional[str]:
+        """查询源地址是否已存储，命中时记录访问并返回访问URL"""
+        row = self.index.fetchone(STORED_PATH_SQL, (src,))
+        if row is None:
+            return None
+        if self.on_access is not None:
+            self.on_access(row[0])
+        return self.url_for(row[0])
+    
+    def stored_path(self, src: str) -> Optional[Path]:
+        """源地址已存储时返回文件路径"""
+        row = self.index.fetchone(STORED_PATH_SQL, (src,))
+        return self.root / row[0] if row else None
+    
+    def source_for_path(self, relative_path: str) -> Optional[str]:
+        """存储路径对应的任一源地址（文件被淘汰后用于重新下载）"""
+        row = self.index.fetchone("SELECT source_url FROM images WHERE path = ? LIMIT 1", (relative_path,))
+        return row[0] if row else None
+    
+    @staticmethod
+    def lazy_key(src: str) -> str:
+        """延迟下载路径中的标识，由源地址唯一确定"""
+        return hashlib.sha256(src.encode("utf-8")).hexdigest()
+    
+    def register_lazy(self, sources: List[str]) -> Dict[str, str]:
+        """为图片分配访问URL而不下载：已存储的图片返回实际地址，其余返回延迟下载地址并记录源地址"""
+        conn = self.index.connect()
+        image_map = {}
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN")
+            for src in sources:
+                row = self.index.fetchone(STORED_PATH_SQL, (src,))
+                if row:
+                    image_map[src] = self.url_for(row[0])
+                    continue
+                key = self.lazy_key(src)
+                conn.execute(
+                    "INSERT OR IGNORE INTO lazy_images (key, source_url, created_at) VALUES (?, ?, ?)",
+                    (key, src, now)
+                )
+                image_map[src] = self.url_for(LAZY_PREFIX + key)
+        return image_map
+    
+    def lazy_source(self, key: str) -> Optional[str]:
+        """查询延迟下载标识对应的源地址，未登记时返回 None"""
+        row = self.index.fetchone("SELECT source_url FROM lazy_images WHERE key = ?", (key,))
+        return row[0] if row else None
+    
+    def record(self, src: str, digest: str, relative_path: str, size: int) -> None:
+        """记录源地址到存储路径的索引"""
+        conn = self.index.connect()
+        with conn:
+            conn.execute("BEGIN")
+            self._record(conn, src, digest, relative_path, size)
+    
+    @staticmethod
+    def _record(conn, src: str, digest: str, relative_path: str, size: int) -> None:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO images (source_url, digest, path, size, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (src, digest, relative_path, size, now)
+        )
+        conn.execute(
+            "INSERT INTO image_files (path, size, accessed_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET accessed_at = excluded.accessed_at",
+            (relative_path, size, now)
+        )
+    
+    def record_variants(self, path: Path, variants: Dict[str, int]) -> None:
+        """生成优化版本后更新文件占用的字节数（原图 + 各版本）"""
+        self.index.connect().execute(
+            "UPDATE image_files SET size = ? WHERE path = ?",
+            (path.stat().st_size + sum(variants.values()), path.relative_to(self.root).as_posix())
+        )
+    
+    def touch(self, accessed: Dict[str, float]) -> None:
+        """批量更新文件的最近访问时间"""
+        self.index.connect().executemany(
+            "UPDATE image_files SET accessed_at = MAX(accessed_at, ?) WHERE path = ?",
+            [(accessed_at, path) for path, accessed_at in accessed.items()]
+        )
+    
+    def usage(self) -> Tuple[int, int]:
+        """当前存储的文件数和字节数（只统计索引中的文件）"""
+        return self.index.fetchone("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_files")
+    
+    def evict(self, max_bytes: int = 0, max_files: int = 0, target_ratio: float = 0.9) -> Tuple[int, int]:
+        """超出预算（0 表示不限制）时按最近访问时间淘汰文件，降到预算的 target_ratio 以下，
+        避免每次只淘汰一两个文件；返回淘汰的文件数和字节数
+        """
+        def over_budget(files: int, size: int, ratio: float) -> bool:
+            return bool(max_bytes and size > max_bytes * ratio) or bool(max_files and files > max_files * ratio)
+        
+        count, total = self.usage()
+        if not over_budget(count, total, 1.0):
+            return 0, 0
+        conn = self.index.connect()
+        victims = []
+        freed = 0
+        # 选择、删除索引和删除文件都在写事务内进行：与 commit_temp_file 互斥（含其他进程），
+        # 不会出现提交时看到文件存在、随后文件被删除而索引仍指向它的情况
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_files").fetchone()
+            cursor = conn.execute("SELECT path, size FROM image_files ORDER BY accessed_at")
+            for path, size in cursor:
+                if not over_budget(count - len(victims), total - freed, target_ratio):
+                    break
+                victims.append(path)
+                freed += size
+            cursor.close()
+            conn.executemany("DELETE FROM image_files WHERE path = ?", [(path,) for path in victims])
+            for path in victims:
+                self.remove_file(path)
+        return len(victims), freed
+    
+    def remove_file(self, relative_path: str) -> None:
+        """删除图片文件及其优化版本"""
+        target = self.root / relative_path
+        for candidate in target.parent.glob(target.name + "*"):
+            candidate.unlink(missing_ok=True)
+    
+    def new_temp_file(self) -> Tuple[int, Path]:
+        """在存储目录所在的文件系统上创建临时文件，保证后续重命名是原子的"""
+        self.incoming_dir.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.incoming_dir, suffix=".part")
+        return fd, Path(path)
+    
+    def commit_temp_file(self, src: str, temp_path: Path, digest: str, ext: str, size: int) -> str:
+        """将写完的临时文件移动到内容寻址路径并记录索引，返回访问URL"""
+        relative_path = self.relative_path(digest, ext)
+        target = self.root / relative_path
+        conn = self.index.connect()
+        # 检查文件、移动和记录索引在写事务内完成，与淘汰互斥
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if target.exists():
+                # 相同内容已存在（来自其他源地址或并发写入），丢弃临时文件
+                temp_path.unlink(missing_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, target)
+            self._record(conn, src, digest, relative_path, size)
+        return self.url_for(relative_path)
+    
+    def open_writer(self, max_bytes: int = 0) -> "ImageWriter":
+        """创建流式写入器，max_bytes 为 0 表示不限制大小"""
+        return ImageWriter(self, max_bytes)
+    
+    def save_bytes(self, src: str, data: bytes, content_type: Optional[str] = None) -> str:
+        """存储图片内容，返回访问URL"""
+        writer = self.open_writer()
+        try:
+            writer.write(data)
+            return writer.commit(src, content_type)
+        except BaseException:
+            writer.abort()
+            raise
+
+
+class ImageWriter:
+    """流式写入单张图片：分块写入临时文件并同步计算摘要，内存占用与图片大小无关"""
+    
+    def __init__(self, store: ImageStore, max_bytes: int = 0):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.path: Optional[Path] = None  # 提交后的存储路径
+        self._hasher = hashlib.sha256()
+        fd, self.temp_path = store.new_temp_file()
+        self._file: BinaryIO = os.fdopen(fd, "wb")
+    
+    def write(self, chunk: bytes) -> None:
+        """写入一个数据块，超过大小限制时抛出异常"""
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise ImageDownloadException(f"图片超过大小限制: {self.max_bytes} 字节")
+        if len(self.head) < 16:
+            self.head += chunk[:16 - len(self.head)]
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+    
+    def commit(self, src: str, content_type: Optional[str] = None) -> str:
+        """落盘并移动到内容寻址路径，返回访问URL"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        ext = guess_extension(self.head, content_type, src)
+        digest = self._hasher.hexdigest()
+        self.path = self.store.root / self.store.relative_path(digest, ext)
+        return self.store.commit_temp_file(src, self.temp_path, digest, ext, self.size)
+    
+    def abort(self) -> None:
+        """放弃写入并删除临时文件"""
+        self._file.close()
+        self.temp_path.unlink(missing_ok=True)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import InvalidURLException, WeChatScraperException
+from app.services.wechat_service import AsyncWeChatService, async_wechat_service
+from app.utils.logger import logger
+from app.utils.sqlite import SQLiteDatabase
+from app.utils.url import is_safe_callback_url
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    callback_url TEXT,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+JOB_COLUMNS = (
+    "id", "url", "format", "callback_url", "status", "status_code",
+    "result", "error", "attempts", "lease_until", "created_at", "updated_at"
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobStore:
+    """基于SQLite的持久化任务队列
+    
+    任务被领取时记录租约到期时间；进程崩溃后租约过期的任务会被重新领取，
+    同机多个worker进程共享同一个数据库文件时也不会重复执行。
+    """
+    
+    def __init__(self, path: Path):
+        self.db = SQLiteDatabase(path, JOBS_SCHEMA)
+    
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+    
+    def submit(self, url: str, fmt: str, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """新建排队中的任务"""
+        now = time.time()
+        row = self.db.fetchone(
+            "INSERT INTO jobs (id, url, format, callback_url, status, created_at, updated_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING {', '.join(JOB_COLUMNS)}",
+            (uuid.uuid4().hex, url, fmt, callback_url, JOB_QUEUED, now, now)
+        )
+        return self._to_dict(row)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务，不存在返回 None"""
+        row = self.db.fetchone(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+        return self._to_dict(row) if row else None
+    
+    def claim(self, lease: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """领取最早的排队任务（或租约已过期的运行中任务），没有可执行任务时返回 None"""
+        conn = self.db.connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # 多次执行都未完成（如每次都导致进程崩溃）的任务不再重试
+            conn.execute(
+                "UPDATE jobs SET status = ?, status_code = 500, error = ?, updated_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (JOB_FAILED, "任务多次执行未完成", now, JOB_RUNNING, now, max_attempts)
+            )
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1) "
+                f"RETURNING {', '.join(JOB_COLUMNS)}",
+                (JOB_RUNNING, now + lease, now, JOB_QUEUED, JOB_RUNNING, now)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        status_code: int,
+        result: Any = None,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """记录任务结果"""
+        row = self.db.fetchone(
+            "UPDATE jobs SET status = ?, status_code = ?, result = ?, error = ?, lease_until = NULL, "
+            f"updated_at = ? WHERE id = ? RETURNING {', '.join(JOB_COLUMNS)}",
+            (
+                status,
+                status_code,
+                None if result is None else json.dumps(result, ensure_ascii=False),
+                error,
+                time.time(),
+                job_id
+            )
+        )
+        return self._to_dict(row)
+    
+    def release(self, job_id: str) -> None:
+        """放回队列（服务关闭时中断的任务），不计入执行次数"""
+        self.db.connect().execute(
+            "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (JOB_QUEUED, time.time(), job_id, JOB_RUNNING)
+        )
+    
+    def purge(self, before: float) -> int:
+        """删除在指定时间之前结束的任务，返回删除数量"""
+        cursor = self.db.connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_SUCCEEDED, JOB_FAILED, before)
+        )
+        return cursor.rowcount
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """对外返回的任务信息（不含租约等内部字段）"""
+    return {
+        "id": job["id"],
+        "url": job["url"],
+        "format": job["format"],
+        "status": job["status"],
+        "status_code": job["status_code"],
+        "data": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+
+class JobQueue:
+    """后台文章转换任务：提交后立即返回任务ID，由工作协程执行转换，完成后可回调通知"""
+    
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        service: Optional[AsyncWeChatService] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        self.store = store or JobStore(Path(settings.job_db_path))
+        self.service = service or async_wechat_service
+        # 回调使用独立的客户端：不跟随重定向，也不占用上游抓取的限流和熔断额度
+        self._client = client
+        self._owns_client = client is None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """发送回调的客户端，按需创建"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": settings.user_agent},
+                timeout=settings.job_callback_timeout,
+                follow_redirects=False
+            )
+        return self._client
+    
+    @staticmethod
+    async def is_safe_callback(callback_url: str) -> bool:
+        """回调地址是否允许（DNS解析在线程中进行）"""
+        return await asyncio.to_thread(is_safe_callback_url, callback_url, settings.job_callback_allowed_hosts)
+    
+    async def submit(self, url: str, fmt: str, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """提交任务；文章URL或回调地址无效时直接拒绝，不进入队列"""
+        if not self.service.validate_url(url):
+            raise InvalidURLException("只允许抓取微信公众号文章")
+        if callback_url and not await self.is_safe_callback(callback_url):
+            raise InvalidURLException("回调地址必须是可公开访问的 http(s) 地址")
+        job = await asyncio.to_thread(self.store.submit, url, fmt, callback_url)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return public_job(job)
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态和结果"""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        return public_job(job) if job else None
+    
+    def start(self, workers: Optional[int] = None) -> None:
+        """启动工作协程（在应用 lifespan 启动时调用）"""
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self.store.purge(time.time() - settings.job_retention)
+        for _ in range(workers or settings.job_workers):
+            self._workers.append(asyncio.create_task(self._worker()))
+    
+    async def stop(self) -> None:
+        """停止工作协程，执行中的任务放回队列，重启后继续执行"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._wakeup = None
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _worker(self) -> None:
+        while True:
+            claim = asyncio.ensure_future(asyncio.to_thread(
+                self.store.claim, settings.job_timeout + settings.job_poll_interval, settings.job_max_attempts
+            ))
+            try:
+                job = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # 领取操作已在线程中进行，等待完成后把任务放回队列
+                job = await claim
+                if job is not None:
+                    await asyncio.to_thread(self.store.release, job["id"])
+                raise
+            if job is None:
+                # 本进程提交任务时立即唤醒；其他进程提交的任务靠定时轮询发现
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                await asyncio.shield(asyncio.to_thread(self.store.release, job["id"]))
+                raise
+            except Exception as e:
+                logger.error(f"任务执行异常: {job['id']} - {e}")
+    
+    async def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """执行一个已领取的任务并记录结果，设置了回调地址时通知调用方"""
+        try:
+            entry = await asyncio.wait_for(
+                self.service.get_article(job["url"], job["format"]), settings.job_timeout
+            )
+            outcome = (JOB_SUCCEEDED, 200, entry.body, None)
+        except WeChatScraperException as e:
+            outcome = (JOB_FAILED, e.status_code, None, e.detail)
+        except asyncio.TimeoutError:
+            outcome = (JOB_FAILED, 504, None, f"任务超时: {settings.job_timeout} 秒")
+        except Exception as e:
+            outcome = (JOB_FAILED, 500, None, f"服务内部错误: {str(e)}")
+        job = await asyncio.to_thread(self.store.finish, job["id"], *outcome)
+        if job["callback_url"]:
+            await self.notify(job)
+        return job
+    
+    async def notify(self, job: Dict[str, Any]) -> bool:
+        """向回调地址 POST 任务结果，失败时按指数退避重试；不跟随重定向
+        
+        发送前重新校验地址，提交后域名解析结果变为内网地址时不发送。
+        """
+        if not await self.is_safe_callback(job["callback_url"]):
+            logger.warning(f"任务回调地址不允许: {job['id']} -> {job['callback_url']}")
+            return False
+        payload = public_job(job)
+        for attempt in range(settings.job_callback_retries + 1):
+            try:
+                resp = await self.client.post(
+                    job["callback_url"], json=payload, timeout=settings.job_callback_timeout
+                )
+                if resp.status_code < 400:
+                    return True
+                error = f"HTTP {resp.status_code}"
+            except Exception as e:
+                error = str(e)
+            if attempt < settings.job_callback_retries:
+                await asyncio.sleep(2 ** attempt)
+        logger.warning(f"任务回调失败: {job['id']} -> {job['callback_url']} - {error}")
+        return False
+
+
+# 全局任务队列实例
+job_queue = JobQueue()
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import WeChatScraperException
+from app.core.resilience import TokenBucket
+from app.services.wechat_service import AsyncWeChatService, async_wechat_service
+from app.utils.logger import logger
+from app.utils.sqlite import SQLiteDatabase
+
+TRACKER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracked_articles (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    interval REAL NOT NULL,
+    fingerprint TEXT,
+    next_check_at REAL NOT NULL,
+    last_checked_at REAL,
+    last_changed_at REAL,
+    last_error TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracked_articles_next_check ON tracked_articles(next_check_at);
+"""
+
+TRACKED_COLUMNS = (
+    "key", "url", "format", "interval", "fingerprint", "next_check_at", "last_checked_at",
+    "last_changed_at", "last_error", "checks", "changes", "created_at"
+)
+
+
+class TrackerStore:
+    """已跟踪文章的持久化列表：刷新间隔、下次刷新时间和上次的内容指纹
+    
+    到期的文章被领取时先把下次刷新时间推后一个租约时长，同机多个worker进程共享同一个数据库文件时
+    不会重复刷新；进程崩溃后租约到期即可被重新领取。
+    """
+    
+    def __init__(self, path: Path):
+        self.db = SQLiteDatabase(path, TRACKER_SCHEMA)
+    
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        return dict(zip(TRACKED_COLUMNS, row))
+    
+    def track(self, key: str, url: str, fmt: str, interval: float) -> Dict[str, Any]:
+        """开始跟踪（新加入的文章立即刷新一次）；已跟踪时更新格式和刷新间隔，保留刷新记录"""
+        now = time.time()
+        row = self.db.fetchone(
+            "INSERT INTO tracked_articles (key, url, format, interval, next_check_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET url = excluded.url, format = excluded.format, "
+            "interval = excluded.interval, next_check_at = MIN(next_check_at, ? + excluded.interval) "
+            f"RETURNING {', '.join(TRACKED_COLUMNS)}",
+            (key, url, fmt, interval, now, now, now)
+        )
+        return self._to_dict(row)
+    
+    def untrack(self, key: str) -> bool:
+        """停止跟踪，文章未被跟踪时返回 False"""
+        cursor = self.db.connect().execute("DELETE FROM tracked_articles WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询跟踪记录，未跟踪时返回 None"""
+        row = self.db.fetchone(f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_articles WHERE key = ?", (key,))
+        return self._to_dict(row) if row else None
+    
+    def list(self, limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        """按加入时间列出跟踪记录，返回总数和当前页"""
+        total = self.db.fetchone("SELECT COUNT(*) FROM tracked_articles")[0]
+        rows = self.db.connect().execute(
+            f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_articles ORDER BY created_at LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+        return total, [self._to_dict(row) for row in rows]
+    
+    def claim_due(self, limit: int, lease: float) -> List[Dict[str, Any]]:
+        """领取最多 limit 篇已到期的文章，领取后 lease 秒内不会被再次领取"""
+        conn = self.db.connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "UPDATE tracked_articles SET next_check_at = ? "
+                "WHERE key IN (SELECT key FROM tracked_articles WHERE next_check_at <= ? "
+                "ORDER BY next_check_at LIMIT ?) "
+                f"RETURNING {', '.join(TRACKED_COLUMNS)}",
+                (now + lease, now, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+    
+    def record(self, key: str, fingerprint: Optional[str], error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """记录一次刷新结果并按刷新间隔安排下一次；与上次的内容指纹不同时计为一次变化
+        
+        fingerprint 为 None（刷新失败或有图片未能下载）时不判断是否变化，保留上次的指纹。
+        """
+        now = time.time()
+        # SET 中的表达式均基于更新前的行计算
+        changed = "(fingerprint IS NOT NULL AND :fingerprint IS NOT NULL AND fingerprint != :fingerprint)"
+        row = self.db.fetchone(
+            "UPDATE tracked_articles SET "
+            f"changes = changes + {changed}, "
+            f"last_changed_at = IIF({changed}, :now, last_changed_at), "
+            "fingerprint = COALESCE(:fingerprint, fingerprint), last_error = :error, "
+            "checks = checks + 1, last_checked_at = :now, next_check_at = :now + interval "
+            f"WHERE key = :key RETURNING {', '.join(TRACKED_COLUMNS)}",
+            {"key": key, "fingerprint": fingerprint, "error": error, "now": now}
+        )
+        return self._to_dict(row) if row else None
+
+
+class ArticleTracker:
+    """已跟踪文章的定期刷新
+    
+    后台任务领取到期的文章，按 refresh_rate 限定的速率和 refresh_concurrency 限定的并发重新获取；
+    内容指纹未变化时沿用上次的结果，不处理图片、不重新转换，内容变化时只下载新增的图片。
+    """
+    
+    def __init__(self, store: Optional[TrackerStore] = None, service: Optional[AsyncWeChatService] = None):
+        self.store = store or TrackerStore(Path(settings.tracker_db_path))
+        self.service = service or async_wechat_service
+        # 速率为 0 时不限速（与上游限流一致）
+        self.rate_limiter = TokenBucket(settings.refresh_rate, 1) if settings.refresh_rate > 0 else None
+        self._task: Optional["asyncio.Task[None]"] = None
+    
+    async def track(self, url: str, fmt: str, interval: Optional[float] = None) -> Dict[str, Any]:
+        """开始跟踪文章（同一文章的不同形式链接视为同一篇）；URL 无效时直接拒绝"""
+        article_url = self.service.canonicalize_url(url)
+        interval = max(interval or settings.refresh_interval, settings.refresh_min_interval)
+        return await asyncio.to_thread(self.store.track, article_url.key, article_url.url, fmt, interval)
+    
+    async def untrack(self, url: str) -> bool:
+        """停止跟踪文章"""
+        return await asyncio.to_thread(self.store.untrack, self.service.canonicalize_url(url).key)
+    
+    async def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """查询文章的跟踪记录"""
+        return await asyncio.to_thread(self.store.get, self.service.canonicalize_url(url).key)
+    
+    async def list(self, limit: int = 50, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """列出已跟踪的文章"""
+        return await asyncio.to_thread(self.store.list, limit, offset)
+    
+    async def refresh(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """刷新一篇已跟踪的文章并记录结果，返回更新后的跟踪记录（刷新期间已取消跟踪时为 None）"""
+        fingerprint = error = None
+        try:
+            entry = await asyncio.wait_for(
+                self.service.refresh_article(item["url"], item["format"]), settings.refresh_timeout
+            )
+            fingerprint = entry.fingerprint
+        except WeChatScraperException as e:
+            error = e.detail
+        except asyncio.TimeoutError:
+            error = f"刷新超时: {settings.refresh_timeout} 秒"
+        except Exception as e:
+            error = f"服务内部错误: {str(e)}"
+        if error:
+            logger.warning(f"文章刷新失败: {item['url']} - {error}")
+        return await asyncio.to_thread(self.store.record, item["key"], fingerprint, error)
+    
+    async def refresh_now(self, url: str) -> Optional[Dict[str, Any]]:
+        """立即刷新一篇已跟踪的文章，未跟踪时返回 None"""
+        item = await self.get(url)
+        if item is None:
+            return None
+        return await self.refresh(item)
+    
+    async def run_once(self) -> int:
+        """领取到期的文章并以限定的速率和并发刷新，返回本次刷新的文章数"""
+        limit = settings.refresh_batch_size
+        # 租约覆盖按速率排队等待的时间和单篇刷新时限
+        queued = limit / settings.refresh_rate if settings.refresh_rate > 0 else 0.0
+        lease = queued + settings.refresh_timeout
+        items = await asyncio.to_thread(self.store.claim_due, limit, lease)
+        semaphore = asyncio.Semaphore(settings.refresh_concurrency)
+        
+        async def bounded_refresh(item: Dict[str, Any]) -> None:
+            async with semaphore:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                await self.refresh(item)
+        
+        await asyncio.gather(*(bounded_refresh(item) for item in items))
+        return len(items)
+    
+    def start(self) -> None:
+        """启动刷新调度（在应用 lifespan 启动时调用），未启用时不启动"""
+        if self._task is None and settings.refresh_enabled:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止刷新调度；进行中的刷新被中断，租约到期后重新领取"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                refreshed = await self.run_once()
+            except Exception as e:
+                logger.error(f"文章刷新调度失败: {e}")
+                refreshed = 0
+            # 有到期文章时继续领取，速率由令牌桶限制
+            if not refreshed:
+                await asyncio.sleep(settings.refresh_poll_interval)
+
+
+# 全局文章跟踪实例
+article_tracker = ArticleTracker()
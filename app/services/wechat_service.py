@@ -1,126 +1,214 @@
-from typing import Tuple, Optional
-from urllib.parse import urlparse
-import hashlib
-import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Optional, TypeVar, Union
+import asyncio
+import codecs
+import time
+from dataclasses import replace
 from pathlib import Path
-import requests
-from requests.exceptions import RequestException
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+from bs4 import BeautifulSoup, Tag
+import httpx
 
 from app.core.config import settings
+from app.core.http_client import AsyncHTTPClient, http_client
+from app.core.executor import CPUExecutor, cpu_executor
+from app.core.resilience import CircuitOpenError
+from app.services.archive import ArticleArchive, create_article_archive
+from app.services.article_parser import (
+    MarkdownSectionRenderer,
+    MetadataParser,
+    ParsedArticle,
+    apply_image_map,
+    collect_image_sources,
+    extract_article,
+    parse_article,
+    parse_fragment,
+    render_markdown,
+    resolve_html_parser,
+    serialize_content,
+    serialize_fragment
+)
+from app.services.cache import ArticleEntry, CacheBackend, NullCache, create_cache_backend
+from app.services.image_optimizer import create_variants, supported_formats
+from app.services.image_store import SCRIPTABLE_CONTENT_TYPES, ImageStore
+from app.utils.conditional import compute_etag, conditional_request_headers, validators_from_headers
+from app.utils.logger import logger
+from app.utils.metrics import ARTICLE_REFRESHES, IMAGE_DOWNLOAD_BYTES, IMAGE_DOWNLOADS
+from app.utils.singleflight import SharedFlight, SingleFlight
+from app.utils.tracing import span, stage
+from app.utils.url import ArticleURL, parse_article_url
 from app.core.exceptions import (
     InvalidURLException,
     NetworkRequestException,
-    ContentParseException,
-    ImageDownloadException
+    ImageDownloadException,
+    UpstreamUnavailableException,
+    WeChatScraperException
 )
 
+T = TypeVar("T")
 
-class WeChatService:
-    """微信公众号文章抓取服务"""
+# 构造参数的默认值：按配置创建；显式传入 None 表示不使用（不缓存、不归档）
+DEFAULT: Any = object()
+
+
+def canonicalize_article_url(url: str) -> ArticleURL:
+    """解析文章地址，得到文章标识和规范化的抓取地址，不是允许的文章地址时抛出 InvalidURLException"""
+    article_url = parse_article_url(url, tuple(settings.allowed_domains))
+    if article_url is None:
+        raise InvalidURLException("只允许抓取微信公众号文章")
+    return article_url
+
+
+def check_image_response(content_type: Optional[str], content_length: Optional[str]) -> None:
+    """读取响应体之前校验图片类型和声明的大小"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in SCRIPTABLE_CONTENT_TYPES or not any(
+        media_type.startswith(prefix) for prefix in settings.image_allowed_content_types
+    ):
+        raise ImageDownloadException(f"不支持的图片类型: {content_type}")
+    if content_length and content_length.isdigit() and int(content_length) > settings.image_max_bytes:
+        raise ImageDownloadException(f"图片超过大小限制: {settings.image_max_bytes} 字节")
+
+
+def should_optimize_images() -> bool:
+    """是否按配置生成图片的 WebP / AVIF 版本"""
+    return settings.image_optimize and bool(supported_formats())
+
+
+def create_image_store(directory: Path) -> ImageStore:
+    """按配置创建图片存储"""
+    return ImageStore(directory, settings.base_image_url, Path(settings.image_index_path))
+
+
+def prepare_image_dir(directory: Path) -> Path:
+    """创建图片目录，权限不足时改用临时目录，返回实际使用的目录"""
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+    except PermissionError:
+        import tempfile
+        temp_dir = Path(tempfile.gettempdir()) / "myapi_images"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        logger.warning(f"使用临时目录存储图片: {temp_dir}")
+        return temp_dir
+
+
+class BaseWeChatService:
+    """同步和异步版本共用的部分：请求头、HTML解析器、图片存储和地址校验（都不涉及I/O调用方式）"""
     
     def __init__(self):
         self.headers = {"User-Agent": settings.user_agent}
+        self.html_parser = resolve_html_parser(settings.html_parser)
         self.static_img_dir = Path(settings.static_img_dir)
-        try:
-            self.static_img_dir.mkdir(parents=True, exist_ok=True)
-        except PermissionError:
-            # 如果权限不足，尝试使用临时目录
-            import tempfile
-            temp_dir = Path(tempfile.gettempdir()) / "myapi_images"
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            self.static_img_dir = temp_dir
-            print(f"使用临时目录存储图片: {temp_dir}")
+        self.image_store = create_image_store(self.static_img_dir)
+    
+    def prepare_storage(self) -> None:
+        """创建图片目录（在应用 lifespan 启动时调用，导入模块时不访问文件系统），权限不足时改用临时目录"""
+        directory = prepare_image_dir(self.static_img_dir)
+        if directory != self.static_img_dir:
+            self.static_img_dir = directory
+            self.image_store = create_image_store(directory)
     
     def validate_url(self, url: str) -> bool:
         """验证URL是否为有效的微信公众号文章链接"""
-        try:
-            parsed = urlparse(url)
-            return any(domain in parsed.netloc for domain in settings.allowed_domains)
-        except Exception:
-            return False
+        return parse_article_url(url, tuple(settings.allowed_domains)) is not None
     
-    def fetch_article_html(self, url: str) -> Tuple[str, str, Optional[str]]:
-        """获取微信公众号文章HTML内容"""
-        if not self.validate_url(url):
-            raise InvalidURLException("只允许抓取微信公众号文章")
+    def canonicalize_url(self, url: str) -> ArticleURL:
+        """解析文章地址，得到文章标识和规范化的抓取地址"""
+        return canonicalize_article_url(url)
+
+
+class WeChatService(BaseWeChatService):
+    """微信公众号文章抓取服务"""
+    
+    def fetch_page(self, url: str) -> str:
+        """获取微信公众号文章页面源码"""
+        import requests  # 只有同步版本使用 requests，延迟导入以加快应用启动
+        url = self.canonicalize_url(url).url
         
         try:
             resp = requests.get(url, headers=self.headers, timeout=settings.request_timeout)
             resp.encoding = 'utf-8'
             resp.raise_for_status()
-        except (RequestException, Exception) as e:
-            raise NetworkRequestException(f"网络请求失败: {str(e)}")
-        
-        try:
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # 提取标题
-            title_tag = soup.find('meta', property='og:title')
-            title = title_tag['content'] if title_tag else soup.title.string
-            if not title:
-                title = "无标题"
-            
-            # 提取内容
-            content_div = soup.find("div", class_="rich_media_content") or soup.find("div", id="js_content")
-            if not content_div:
-                raise ContentParseException("无法找到文章内容")
-            content_html = str(content_div)
-            
-            # 提取封面图
-            cover_tag = soup.find('meta', property='og:image')
-            cover = cover_tag['content'] if cover_tag else None
-            
-            return title.strip(), content_html, cover
-            
         except Exception as e:
-            raise ContentParseException(f"内容解析失败: {str(e)}")
+            raise NetworkRequestException(f"网络请求失败: {str(e)}")
+        return resp.text
     
-    def download_and_replace_images(self, html: str) -> str:
-        """下载图片并替换为本地URL"""
-        soup = BeautifulSoup(html, "html.parser")
-        
-        for img in soup.find_all("img"):
-            src = img.get("data-src") or img.get("src")
-            if not src or not src.startswith("http"):
-                continue
-            
+    def fetch_article_html(self, url: str) -> Tuple[str, str, Optional[str]]:
+        """获取微信公众号文章HTML内容"""
+        return self.parse_article_html(self.fetch_page(url))
+    
+    def extract_article(self, html: str) -> Tuple[str, Tag, Optional[str]]:
+        """解析文章页面，返回标题、正文节点树和封面图"""
+        return extract_article(html, self.html_parser)
+    
+    def parse_article_html(self, html: str) -> Tuple[str, str, Optional[str]]:
+        """解析文章页面，提取标题、正文HTML和封面图"""
+        title, content, cover = self.extract_article(html)
+        return title, str(content), cover
+    
+    def download_images(self, sources: List[str]) -> Dict[str, str]:
+        """依次下载图片，返回 源地址 -> 本地URL 映射（失败的图片不在映射中）"""
+        import requests
+        image_map = {}
+        for src in sources:
             try:
-                # 生成文件名
-                ext = os.path.splitext(urlparse(src).path)[-1] or ".jpg"
-                filename = hashlib.md5(src.encode("utf-8")).hexdigest() + ext
-                local_path = self.static_img_dir / filename
-                new_url = settings.base_image_url + filename
+                new_url = self.image_store.lookup(src)
                 
-                # 下载图片
-                if not local_path.exists():
-                    r = requests.get(src, headers=self.headers, timeout=settings.request_timeout)
-                    r.raise_for_status()
-                    with open(local_path, "wb") as f:
-                        f.write(r.content)
-                
-                # 替换图片URL
-                img["src"] = new_url
+                # 下载图片（流式写入磁盘）
+                if new_url is None:
+                    with requests.get(
+                        src, headers=self.headers, timeout=settings.request_timeout, stream=True
+                    ) as r:
+                        r.raise_for_status()
+                        content_type = r.headers.get("Content-Type")
+                        check_image_response(content_type, r.headers.get("Content-Length"))
+                        writer = self.image_store.open_writer(settings.image_max_bytes)
+                        try:
+                            for chunk in r.iter_content(settings.image_stream_chunk_size):
+                                writer.write(chunk)
+                            new_url = writer.commit(src, content_type)
+                        except BaseException:
+                            writer.abort()
+                            raise
+                        self.optimize_image(writer.path)
                 
+                image_map[src] = new_url
+            
             except Exception as e:
                 # 图片下载失败时记录日志但不中断流程
-                print(f"图片下载失败: {src} - {e}")
+                logger.warning(f"图片下载失败: {src} - {e}")
                 continue
         
-        return str(soup)
+        return image_map
     
-    def convert_to_markdown(self, html: str) -> str:
-        """将HTML转换为Markdown格式"""
+    def optimize_image(self, path: Path) -> None:
+        """按配置生成图片的 WebP / AVIF 版本，失败时只保留原图"""
+        if not should_optimize_images():
+            return
         try:
-            return md(
-                html,
-                heading_style="ATX",
-                bullets="*",
-                strip=["script", "style"]
+            variants = create_variants(
+                path,
+                settings.image_optimize_formats,
+                settings.image_optimize_quality,
+                settings.image_optimize_max_dimension
             )
+            if variants:
+                self.image_store.record_variants(path, variants)
         except Exception as e:
-            raise ContentParseException(f"Markdown转换失败: {str(e)}")
+            logger.warning(f"图片优化失败: {path} - {e}")
+    
+    def download_and_replace_images(self, html: str) -> str:
+        """下载图片并替换为本地URL"""
+        soup = BeautifulSoup(html, self.html_parser)
+        apply_image_map(soup, self.download_images(collect_image_sources(soup)))
+        return serialize_fragment(soup, html)
+    
+    def convert_to_markdown(
+        self,
+        html: Union[str, Tag],
+        image_map: Optional[Dict[str, str]] = None
+    ) -> str:
+        """将HTML（字符串或已解析的节点树）转换为Markdown格式，可同时替换图片地址"""
+        return render_markdown(html, image_map)
     
     def get_article_data(self, url: str) -> dict:
         """获取文章数据（HTML格式）"""
@@ -132,12 +220,597 @@ class WeChatService:
         }
     
     def get_article_markdown(self, url: str) -> str:
-        """获取文章数据（Markdown格式）"""
-        title, content_html, _ = self.fetch_article_html(url)
-        html_with_local_images = self.download_and_replace_images(content_html)
-        content_md = self.convert_to_markdown(html_with_local_images)
+        """获取文章数据（Markdown格式），正文只解析一次"""
+        title, content, _ = self.extract_article(self.fetch_page(url))
+        image_map = self.download_images(collect_image_sources(content))
+        content_md = self.convert_to_markdown(content, image_map)
         return f"# {title}\n\n{content_md}"
 
 
+class AsyncWeChatService(BaseWeChatService):
+    """微信公众号文章抓取服务（异步版本，基于共享连接池，不阻塞事件循环）
+    
+    与同步版本 WeChatService 没有继承关系：两者的方法同名但调用方式不同，共用的部分在 BaseWeChatService 中。
+    cache / archive 未传入时按配置创建，显式传入 None 表示不缓存、不归档。
+    """
+    
+    def __init__(
+        self,
+        client: Optional[AsyncHTTPClient] = None,
+        cache: Optional[CacheBackend] = DEFAULT,
+        executor: Optional[CPUExecutor] = None,
+        archive: Optional[ArticleArchive] = DEFAULT,
+        shared_flights: Optional[SharedFlight] = None
+    ):
+        super().__init__()
+        self.client = client or http_client
+        self.executor = executor or cpu_executor
+        if cache is DEFAULT:
+            cache = create_cache_backend()
+        elif cache is None:
+            cache = NullCache(settings.cache_ttl, settings.cache_max_entries, settings.cache_max_bytes)
+        self.cache = cache
+        self.archive = create_article_archive() if archive is DEFAULT else archive
+        self.flights = SingleFlight()
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_semaphore: Optional[asyncio.Semaphore] = None
+        if shared_flights is None and settings.workers > 1:
+            shared_flights = SharedFlight(
+                settings.shared_state_path,
+                settings.shared_flight_lease,
+                settings.shared_flight_poll_interval
+            )
+        self.shared_flights = shared_flights
+    
+    async def dedup(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Optional[Callable[[], Awaitable[Optional[T]]]] = None
+    ) -> T:
+        """合并同一键的并发调用：进程内经 SingleFlight；多 worker 部署且结果可由 lookup
+        从共享存储读取时，再经 SharedFlight 与其他进程合并
+        """
+        if self.shared_flights is None or lookup is None:
+            return await self.flights.do(key, fn)
+        return await self.flights.do(key, lambda: self.shared_flights.do(key, fn, lookup))
+    
+    async def fresh_cache_entry(self, key: str) -> Optional[ArticleEntry]:
+        """共享缓存中的有效结果（供等待其他进程时轮询）"""
+        entry = ArticleEntry.from_dict(await self.cache.peek(key))
+        return entry if entry is not None and entry.is_fresh else None
+    
+    def cache_key(self, url: str, fmt: str) -> str:
+        """缓存键：输出格式 + 文章标识"""
+        return f"{fmt}:{self.canonicalize_url(url).key}"
+    
+    async def fetch_page_response(
+        self,
+        url: str,
+        validators: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """请求文章页面（规范化后的地址）；带上游验证头时发起条件请求，内容未变化时上游返回 304"""
+        url = self.canonicalize_url(url).url
+        headers = {**self.headers, **conditional_request_headers(validators or {})}
+        try:
+            with stage("fetch"):
+                resp = await self.client.get(url, headers=headers)
+            resp.encoding = 'utf-8'
+            if resp.status_code != 304:
+                resp.raise_for_status()
+        except CircuitOpenError as e:
+            raise UpstreamUnavailableException(str(e), e.retry_after)
+        except Exception as e:
+            raise NetworkRequestException(f"网络请求失败: {str(e)}")
+        return resp
+    
+    async def fetch_page(self, url: str) -> str:
+        """获取微信公众号文章页面源码"""
+        return (await self.fetch_page_response(url)).text
+    
+    async def fetch_article(
+        self,
+        url: str,
+        validators: Optional[Dict[str, str]] = None
+    ) -> Optional[ParsedArticle]:
+        """获取并解析文章，同一文章的并发请求共享一次抓取和解析
+        
+        解析在CPU执行器中进行；返回的正文节点树在调用者之间共享，只读使用。
+        传入 validators 时发起条件请求，上游返回 304 时结果为 None。
+        """
+        article_url = self.canonicalize_url(url)
+        
+        async def fetch_and_parse() -> Optional[ParsedArticle]:
+            resp = await self.fetch_page_response(article_url.url, validators)
+            if resp.status_code == 304:
+                return None
+            with stage("parse"):
+                article = await self.executor.run(
+                    parse_article, resp.text, self.html_parser, self.executor.crosses_process
+                )
+            article.validators = validators_from_headers(resp.headers)
+            return article
+        
+        if validators:
+            # 条件请求的结果可能为空，不与普通请求合并
+            return await fetch_and_parse()
+        return await self.flights.do(f"page:{article_url.key}", fetch_and_parse)
+    
+    async def get_article_metadata(self, url: str) -> Dict[str, Optional[str]]:
+        """只获取文章标题、封面和摘要，优先读取缓存"""
+        article_url = self.canonicalize_url(url)
+        key = f"metadata:{article_url.key}"
+        metadata = await self.cache.get(key)
+        if metadata is not None:
+            return metadata
+        return await self.dedup(
+            key,
+            lambda: self._fetch_metadata(article_url.url, key),
+            (lambda: self.cache.peek(key)) if self.cache.shared else None
+        )
+    
+    async def _fetch_metadata(self, url: str, key: str) -> Dict[str, Optional[str]]:
+        """流式读取页面并增量解析头部，所需标签找到后即关闭连接，不下载和解析正文"""
+        parser = MetadataParser()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        received = 0
+        try:
+            with stage("metadata"):
+                async with self.client.stream("GET", url, headers=self.headers) as r:
+                    r.raise_for_status()
+                    # 按到达的数据块解析，不重新分块，头部到达后即可结束
+                    async for chunk in r.aiter_bytes():
+                        parser.feed(decoder.decode(chunk))
+                        received += len(chunk)
+                        if parser.done or received >= settings.metadata_max_bytes:
+                            break
+        except CircuitOpenError as e:
+            raise UpstreamUnavailableException(str(e), e.retry_after)
+        except Exception as e:
+            raise NetworkRequestException(f"网络请求失败: {str(e)}")
+        metadata = parser.result()
+        await self.cache.set(key, metadata)
+        return metadata
+    
+    async def fetch_article_html(self, url: str) -> Tuple[str, str, Optional[str]]:
+        """获取微信公众号文章HTML内容"""
+        article = await self.fetch_article(url)
+        content_html = await self.executor.run(serialize_content, article.content)
+        return article.title, content_html, article.cover
+    
+    async def download_image(self, src: str) -> str:
+        """下载单张图片（已存在则跳过），返回本地访问URL；同一图片的并发下载只执行一次"""
+        return await self.dedup(
+            f"img:{src}",
+            lambda: self._download_image(src),
+            lambda: asyncio.to_thread(self.image_store.lookup, src)
+        )
+    
+    async def _download_image(self, src: str) -> str:
+        with span("image", src=src) as item:
+            new_url = await asyncio.to_thread(self.image_store.lookup, src)
+            if new_url is not None:
+                IMAGE_DOWNLOADS.inc(result="cached")
+                if item is not None:
+                    item.set(result="cached")
+                return new_url
+            async with self.client.stream("GET", src, headers=self.headers) as r:
+                r.raise_for_status()
+                content_type = r.headers.get("content-type")
+                check_image_response(content_type, r.headers.get("content-length"))
+                # 分块写入临时文件，单张图片的内存占用不超过一个数据块；文件操作都在线程中进行，不阻塞事件循环
+                writer = await asyncio.to_thread(self.image_store.open_writer, settings.image_max_bytes)
+                try:
+                    async for chunk in r.aiter_bytes(settings.image_stream_chunk_size):
+                        await asyncio.to_thread(writer.write, chunk)
+                    new_url = await asyncio.to_thread(writer.commit, src, content_type)
+                except BaseException:
+                    # 取消时也要同步清理临时文件，不能再等待线程
+                    writer.abort()
+                    raise
+            IMAGE_DOWNLOADS.inc(result="downloaded")
+            IMAGE_DOWNLOAD_BYTES.inc(writer.size)
+            if item is not None:
+                item.set(result="downloaded", bytes=writer.size)
+            await self.optimize_image(writer.path)
+            return new_url
+    
+    async def optimize_image(self, path: Path) -> None:
+        """按配置生成图片的 WebP / AVIF 版本（在CPU执行器中进行，不阻塞事件循环），失败时只保留原图"""
+        if not should_optimize_images():
+            return
+        try:
+            with stage("image_optimize"):
+                variants = await self.executor.run(
+                    create_variants,
+                    str(path),
+                    settings.image_optimize_formats,
+                    settings.image_optimize_quality,
+                    settings.image_optimize_max_dimension
+                )
+            if variants:
+                await asyncio.to_thread(self.image_store.record_variants, path, variants)
+        except Exception as e:
+            logger.warning(f"图片优化失败: {path} - {e}")
+    
+    def start_image_downloads(self, sources: List[str]) -> Dict[str, "asyncio.Task[str]"]:
+        """为每张图片创建下载任务，同时进行的下载数受 image_download_concurrency 限制"""
+        semaphore = asyncio.Semaphore(settings.image_download_concurrency)
+        
+        async def bounded_download(src: str) -> str:
+            async with semaphore:
+                return await self.download_image(src)
+        
+        return {src: asyncio.create_task(bounded_download(src)) for src in sources}
+    
+    @staticmethod
+    def image_download_result(src: str, task: "asyncio.Task[str]") -> Optional[str]:
+        """取下载任务的结果并记录指标，未完成（超时）或失败时返回 None"""
+        if not task.done() or task.cancelled():
+            IMAGE_DOWNLOADS.inc(result="timeout")
+            logger.warning(f"图片下载超时: {src}")
+        elif task.exception() is not None:
+            IMAGE_DOWNLOADS.inc(result="failed")
+            logger.warning(f"图片下载失败: {src} - {task.exception()}")
+        else:
+            return task.result()
+        return None
+    
+    @staticmethod
+    async def cancel_tasks(tasks) -> None:
+        """取消未完成的任务并等待其结束"""
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def download_images(self, sources: List[str]) -> Dict[str, str]:
+        """并发下载图片，返回 源地址 -> 本地URL 映射（失败或超时的图片不在映射中）"""
+        if not sources:
+            return {}
+        
+        tasks = self.start_image_downloads(sources)
+        done, pending = await asyncio.wait(tasks.values(), timeout=settings.image_download_deadline)
+        for task in pending:
+            task.cancel()
+        
+        image_map = {}
+        for src, task in tasks.items():
+            new_url = self.image_download_result(src, task)
+            if new_url is not None:
+                image_map[src] = new_url
+        await self.cancel_tasks(pending)
+        return image_map
+    
+    async def lazy_image_map(self, sources: List[str]) -> Dict[str, str]:
+        """延迟下载模式：只分配本地URL并记录源地址，图片在首次被访问时下载"""
+        if not sources:
+            return {}
+        return await asyncio.to_thread(self.image_store.register_lazy, sources)
+    
+    async def resolve_images(self, sources: List[str]) -> Dict[str, str]:
+        """按 image_mode 得到 源地址 -> 本地URL 映射"""
+        if settings.image_mode == "lazy":
+            return await self.lazy_image_map(sources)
+        return await self.download_images(sources)
+    
+    async def load_lazy_image(self, key: str) -> Optional[Path]:
+        """下载延迟下载地址对应的图片（同一图片的并发首次访问只下载一次），返回文件路径
+        
+        只接受转换文章时登记过的标识，未登记时返回 None。
+        """
+        src = await asyncio.to_thread(self.image_store.lazy_source, key)
+        if src is None:
+            return None
+        return await self.download_for_serving(src)
+    
+    async def restore_image(self, relative_path: str) -> Optional[Path]:
+        """重新下载已被淘汰的图片，返回文件路径；源地址未知或内容已变化（存储路径不同）时返回 None"""
+        src = await asyncio.to_thread(self.image_store.source_for_path, relative_path)
+        if src is None:
+            return None
+        path = await self.download_for_serving(src)
+        if path is None or path != self.image_store.root / relative_path:
+            return None
+        return path
+    
+    async def download_for_serving(self, src: str) -> Optional[Path]:
+        """为静态图片请求下载图片，失败时转换为对应的HTTP错误"""
+        try:
+            await self.download_image(src)
+        except WeChatScraperException:
+            raise
+        except CircuitOpenError as e:
+            raise UpstreamUnavailableException(str(e), e.retry_after)
+        except Exception as e:
+            IMAGE_DOWNLOADS.inc(result="failed")
+            raise NetworkRequestException(f"图片下载失败: {str(e)}")
+        return await asyncio.to_thread(self.image_store.stored_path, src)
+    
+    async def download_and_replace_images(self, html: str) -> str:
+        """替换图片为本地URL：默认并发下载，下载失败或超时的图片保留原地址；延迟模式下只改写地址"""
+        soup = BeautifulSoup(html, self.html_parser)
+        apply_image_map(soup, await self.resolve_images(collect_image_sources(soup)))
+        return serialize_fragment(soup, html)
+    
+    async def get_article(self, url: str, fmt: str) -> ArticleEntry:
+        """获取文章结果及其 ETag / Last-Modified（fmt 为 html 或 markdown），优先读取缓存"""
+        key = self.cache_key(url, fmt)
+        entry = ArticleEntry.from_dict(await self.cache.get(key))
+        if entry is not None and entry.is_fresh:
+            return entry
+        return await self.dedup(
+            key,
+            lambda: self._refresh_article(url, fmt, key, entry),
+            (lambda: self.fresh_cache_entry(key)) if self.cache.shared else None
+        )
+    
+    async def refresh_article(self, url: str, fmt: str) -> ArticleEntry:
+        """忽略缓存有效期立即向上游重新获取文章（用于已跟踪文章的定期刷新）
+        
+        内容指纹与上次相同时沿用上次的结果，不处理图片、不重新转换；内容变化时只下载新增的图片。
+        """
+        key = self.cache_key(url, fmt)
+        stale = ArticleEntry.from_dict(await self.cache.peek(key))
+        return await self.flights.do(key, lambda: self._refresh_article(url, fmt, key, stale))
+    
+    async def render_article(self, url: str, fmt: str) -> Any:
+        """不读写缓存和归档，完整执行一次抓取、解析、图片处理和转换（用于调试分析）"""
+        article = await self.fetch_article(url)
+        if fmt == "markdown":
+            return (await self._render_article_markdown(article))[0]
+        return await self._render_article_data(article)
+    
+    async def _refresh_article(
+        self,
+        url: str,
+        fmt: str,
+        key: str,
+        stale: Optional[ArticleEntry]
+    ) -> ArticleEntry:
+        """生成或重新验证文章结果；已过期的缓存项先向上游发起条件请求，内容指纹未变化时沿用上次的结果"""
+        article = await self.fetch_article(url, stale.upstream if stale else None)
+        if article is None:
+            return await self._store_revalidated(key, stale)
+        body = await self.previous_body(url, fmt, article, stale)
+        if body is not None:
+            return await self._store_article(key, body, article, stale, article.fingerprint)
+        if fmt == "markdown":
+            body, complete = await self._render_article_markdown(article)
+        else:
+            body, complete = await self._render_article_data(article), True
+        # 有图片未能下载的结果不记录指纹，下次刷新时重新处理
+        fingerprint = article.fingerprint if complete else None
+        await self.archive_article(url, fmt, body, article, fingerprint)
+        return await self._store_article(key, body, article, stale, fingerprint)
+    
+    async def previous_body(
+        self,
+        url: str,
+        fmt: str,
+        article: ParsedArticle,
+        stale: Optional[ArticleEntry]
+    ) -> Optional[Any]:
+        """内容指纹与上次生成结果时相同则返回上次的结果（先查缓存项，缓存已淘汰时查文章归档），否则返回 None"""
+        previous = None
+        if stale is not None and stale.fingerprint:
+            previous = stale.fingerprint, stale.body
+        else:
+            archived = await self.archived_body(url, fmt)
+            if archived is not None:
+                previous = archived
+        if previous is None:
+            ARTICLE_REFRESHES.inc(result="new")
+            return None
+        fingerprint, body = previous
+        if fingerprint != article.fingerprint:
+            ARTICLE_REFRESHES.inc(result="changed")
+            return None
+        ARTICLE_REFRESHES.inc(result="unchanged")
+        return body
+    
+    async def archived_body(self, url: str, fmt: str) -> Optional[Tuple[str, Any]]:
+        """文章归档中对应格式的结果及生成时的内容指纹，未记录指纹时返回 None"""
+        try:
+            article = await self.get_archived_article(url)
+        except Exception as e:
+            logger.warning(f"读取文章归档失败: {url} - {e}")
+            return None
+        fingerprint = article and article[f"{fmt}_fingerprint"]
+        if not fingerprint:
+            return None
+        if fmt == "markdown":
+            return fingerprint, article["markdown"]
+        return fingerprint, {"title": article["title"], "content": article["html"], "cover": article["cover"]}
+    
+    async def _store_revalidated(self, key: str, stale: ArticleEntry) -> ArticleEntry:
+        """上游确认页面未变化，沿用缓存结果并延长有效期"""
+        ARTICLE_REFRESHES.inc(result="not_modified")
+        entry = replace(stale, fresh_until=time.time() + self.cache.ttl)
+        await self.cache.set(key, entry.to_dict(), self.cache.ttl + settings.cache_stale_ttl)
+        return entry
+    
+    async def _store_article(
+        self,
+        key: str,
+        body: Any,
+        article: ParsedArticle,
+        stale: Optional[ArticleEntry],
+        fingerprint: Optional[str] = None
+    ) -> ArticleEntry:
+        """缓存新生成的结果"""
+        now = time.time()
+        etag = compute_etag(body)
+        # 重新生成的内容与缓存一致时保留原 Last-Modified，客户端的条件请求仍可命中
+        unchanged = stale is not None and stale.etag == etag
+        entry = ArticleEntry(
+            body=body,
+            etag=etag,
+            last_modified=stale.last_modified if unchanged else now,
+            fresh_until=now + self.cache.ttl,
+            upstream=article.validators,
+            fingerprint=fingerprint
+        )
+        await self.cache.set(key, entry.to_dict(), self.cache.ttl + settings.cache_stale_ttl)
+        return entry
+    
+    async def archive_article(
+        self,
+        url: str,
+        fmt: str,
+        body: Any,
+        article: ParsedArticle,
+        fingerprint: Optional[str] = None
+    ) -> None:
+        """将新生成的结果写入文章归档，写入失败不影响本次请求"""
+        if self.archive is None:
+            return
+        article_url = self.canonicalize_url(url)
+        try:
+            await self.archive.save(
+                article_url.key,
+                article_url.url,
+                article.title,
+                article.cover,
+                html=body["content"] if fmt == "html" else None,
+                markdown=body if fmt == "markdown" else None,
+                fingerprint=fingerprint
+            )
+        except Exception as e:
+            logger.warning(f"文章归档失败: {article_url.url} - {e}")
+    
+    async def get_archived_article(self, url: str) -> Optional[Dict[str, Any]]:
+        """按地址查询已归档的文章（只读本地归档，不访问上游），未启用归档或未归档时返回 None"""
+        if self.archive is None:
+            return None
+        return await self.archive.get(self.canonicalize_url(url).key)
+    
+    async def _render_article_data(self, article: ParsedArticle) -> dict:
+        with stage("serialize"):
+            content_html = await self.executor.run(serialize_content, article.content)
+        return {
+            "title": article.title,
+            "content": content_html,
+            "cover": article.cover
+        }
+    
+    async def _render_article_markdown(self, article: ParsedArticle) -> Tuple[str, bool]:
+        """返回Markdown结果，以及是否所有图片都已替换为本地地址"""
+        # 正文只解析一次，图片替换在Markdown转换时完成；网络IO留在事件循环，解析和转换交给CPU执行器
+        # 已下载过的图片按源地址直接取得本地地址，内容变化时只下载新增的图片
+        with stage("image_download"):
+            image_map = await self.resolve_images(article.image_sources)
+        with stage("markdown"):
+            content_md = await self.executor.run(render_markdown, article.content, image_map)
+        complete = all(src in image_map for src in article.image_sources)
+        return f"# {article.title}\n\n{content_md}", complete
+    
+    async def stream_article_markdown(self, url: str) -> AsyncIterator[str]:
+        """流式生成文章Markdown：先输出标题，之后按段落顺序输出，每段只等待本段的图片
+        
+        所有图片在开始时一并发起下载（延迟下载模式下只改写地址）；缓存命中或内容指纹未变化时直接输出上次的结果，生成完成后写入缓存。
+        """
+        key = self.cache_key(url, "markdown")
+        stale = ArticleEntry.from_dict(await self.cache.get(key))
+        if stale is not None and stale.is_fresh:
+            yield stale.body
+            return
+        
+        article = await self.fetch_article(url, stale.upstream if stale else None)
+        if article is None:
+            yield (await self._store_revalidated(key, stale)).body
+            return
+        body = await self.previous_body(url, "markdown", article, stale)
+        if body is not None:
+            yield body
+            await self._store_article(key, body, article, stale, article.fingerprint)
+            return
+        
+        content = article.content
+        if not isinstance(content, Tag):
+            # 进程池模式下正文以HTML字符串返回，需在本进程重新解析
+            content = await asyncio.to_thread(parse_fragment, content, self.html_parser)
+        renderer = MarkdownSectionRenderer(content)
+        chunks = [f"# {article.title}\n\n"]
+        yield chunks[0]
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.image_download_deadline
+        if settings.image_mode == "lazy":
+            renderer.image_map.update(await self.lazy_image_map(article.image_sources))
+            tasks = {}
+        else:
+            tasks = self.start_image_downloads(article.image_sources)
+        complete = True
+        try:
+            with stage("markdown_stream"):
+                for index in range(len(renderer)):
+                    sources = [src for src in renderer.image_sources(index) if src in tasks]
+                    pending = [tasks[src] for src in sources if not tasks[src].done()]
+                    if pending:
+                        await asyncio.wait(pending, timeout=max(deadline - loop.time(), 0))
+                    for src in sources:
+                        new_url = self.image_download_result(src, tasks.pop(src))
+                        if new_url is not None:
+                            renderer.image_map[src] = new_url
+                        else:
+                            complete = False
+                    text = renderer.render(index)
+                    if text:
+                        chunks.append(text)
+                        yield text
+        finally:
+            # 客户端断开或出错时取消剩余下载；其他请求仍在等待的同一图片继续下载
+            await self.cancel_tasks(tasks.values())
+        
+        body = "".join(chunks)
+        fingerprint = article.fingerprint if complete else None
+        await self.archive_article(url, "markdown", body, article, fingerprint)
+        await self._store_article(key, body, article, stale, fingerprint)
+    
+    async def get_article_data(self, url: str) -> dict:
+        """获取文章数据（HTML格式），优先读取缓存"""
+        return (await self.get_article(url, "html")).body
+    
+    async def get_article_markdown(self, url: str) -> str:
+        """获取文章数据（Markdown格式），优先读取缓存"""
+        return (await self.get_article(url, "markdown")).body
+    
+    def batch_semaphore(self) -> asyncio.Semaphore:
+        """所有批量请求共享的并发转换上限（按事件循环创建）"""
+        loop = asyncio.get_running_loop()
+        if self._batch_semaphore is None or self._batch_loop is not loop:
+            self._batch_loop = loop
+            self._batch_semaphore = asyncio.Semaphore(settings.batch_concurrency)
+        return self._batch_semaphore
+    
+    async def convert_batch(self, urls: List[str], fmt: str) -> AsyncIterator[Dict[str, Any]]:
+        """并发转换多篇文章，按完成顺序逐条产出结果，单篇失败不影响其他文章
+        
+        同时进行的转换数由所有批量请求共享的 batch_concurrency 限制，并发的批量请求不会成倍增加。
+        """
+        semaphore = self.batch_semaphore()
+        convert = self.get_article_markdown if fmt == "markdown" else self.get_article_data
+        
+        async def run(index: int, url: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return {"index": index, "url": url, "status": 200, "data": await convert(url)}
+                except WeChatScraperException as e:
+                    return {"index": index, "url": url, "status": e.status_code, "error": e.detail}
+                except Exception as e:
+                    return {"index": index, "url": url, "status": 500, "error": f"服务内部错误: {str(e)}"}
+        
+        tasks = [asyncio.create_task(run(i, url)) for i, url in enumerate(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端提前断开或出错时取消尚未完成的文章，并等待其结束
+            await self.cancel_tasks(tasks)
+
+
 # 服务实例
-wechat_service = WeChatService() 
\ No newline at end of file
+wechat_service = WeChatService()
+async_wechat_service = AsyncWeChatService()
@@ -0,0 +1,198 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 值得压缩的响应类型；图片等已压缩的内容原样返回
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """按优先级排列的可用编码"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """根据 Accept-Encoding 选择编码（q 值最高者，相同时优先 br），无可用编码返回 None"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Compressor:
+    """流式压缩器：每个数据块同步刷新，流式响应（如NDJSON）可逐行到达客户端"""
+    
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 5):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    
+    def compress(self, data: bytes) -> bytes:
+        """压缩一个数据块并刷新输出"""
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        """结束压缩流"""
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._zlib.flush()
+    
+    def compress_all(self, data: bytes) -> bytes:
+        """一次性压缩完整内容"""
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressedBodyCache:
+    """按 (ETag, 编码) 缓存压缩结果，同一内容重复请求时无需再次压缩"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get((etag, encoding))
+            if body is not None:
+                self._data.move_to_end((etag, encoding))
+            return body
+    
+    def set(self, etag: str, encoding: str, body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[(etag, encoding)] = body
+            self._data.move_to_end((etag, encoding))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 协商 br / gzip 压缩响应的ASGI中间件
+    
+    - 只压缩文本类响应，跳过已编码、过小和非 200 的响应；
+    - 带强 ETag 的完整响应缓存压缩结果，ETag 改为弱 ETag（与 nginx 行为一致，条件请求仍可匹配）；
+    - 流式响应逐块压缩并刷新。
+    """
+    
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache_entries: int = 256
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedBodyCache(cache_entries)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+        
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                # 等到第一个响应体再决定是否压缩
+                start_message = message
+                return
+            if passthrough or start_message is None:
+                await send(message)
+                return
+            if compressor is not None:
+                body = compressor.compress(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += compressor.finish()
+                await send({"type": "http.response.body", "body": body, "more_body": message.get("more_body", False)})
+                return
+            
+            body = message.get("body", b"") if message_type == "http.response.body" else b""
+            more_body = message.get("more_body", False)
+            if message_type != "http.response.body" or not self._should_compress(start_message, body, more_body):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                del headers["Content-Length"]
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+                return
+            
+            compressed = self.cache.get(etag, encoding) if etag and not etag.startswith("W/") else None
+            if compressed is None:
+                compressed = Compressor(encoding, self.gzip_level, self.brotli_quality).compress_all(body)
+                if etag and not etag.startswith("W/"):
+                    self.cache.set(etag, encoding, compressed)
+            headers["Content-Length"] = str(len(compressed))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    def _should_compress(self, start_message, body: bytes, more_body: bool) -> bool:
+        if start_message["status"] != 200:
+            return False
+        headers = Headers(raw=start_message["headers"])
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        # 流式响应总长度未知，始终压缩；完整响应过小时压缩收益不足以抵消开销
+        return more_body or len(body) >= self.minimum_size
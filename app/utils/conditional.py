@@ -0,0 +1,64 @@
+import hashlib
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+
+def compute_etag(body: Any) -> str:
+    """根据响应内容计算强ETag（字典按键排序后序列化，保证同一内容的ETag稳定）"""
+    if not isinstance(body, str):
+        body = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def format_http_date(timestamp: float) -> str:
+    """格式化为HTTP日期（RFC 7231）"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[float]:
+    """解析HTTP日期，格式无效时返回 None"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: float) -> bool:
+    """判断条件请求能否返回 304
+    
+    同时携带两个条件头时以 If-None-Match 为准；Last-Modified 只精确到秒。
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = parse_http_date(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+# 上游响应中的验证头 -> 重新验证时使用的条件请求头
+CONDITIONAL_HEADERS = {
+    "etag": "If-None-Match",
+    "last-modified": "If-Modified-Since",
+}
+
+
+def validators_from_headers(headers: Mapping[str, str]) -> Dict[str, str]:
+    """提取上游响应的验证头（ETag / Last-Modified）"""
+    return {name: headers[name] for name in CONDITIONAL_HEADERS if headers.get(name)}
+
+
+def conditional_request_headers(validators: Mapping[str, str]) -> Dict[str, str]:
+    """根据保存的验证头生成条件请求头"""
+    return {CONDITIONAL_HEADERS[name]: value for name, value in validators.items() if name in CONDITIONAL_HEADERS}
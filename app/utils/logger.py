@@ -1,10 +1,65 @@
+import json
 import logging
 import sys
+from contextvars import ContextVar
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
 from app.core.config import settings
 
+# 当前请求的ID（由 TracingMiddleware 设置），写入同一请求期间的所有日志
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录附加当前请求ID（request_id），文本格式使用的前缀为 request_tag"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        record.request_tag = f"[{record.request_id}] " if record.request_id else ""
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式：结构化字段以 JSON 附在消息之后"""
+    
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + json.dumps(fields, ensure_ascii=False, default=str)
+        return message
+
+
+class JSONFormatter(logging.Formatter):
+    """JSON格式：每条日志一行 JSON 对象，结构化字段合并到顶层"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            document["request_id"] = record.request_id
+        document.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+def create_formatter(log_format: str) -> logging.Formatter:
+    """按配置创建格式化器：text / json"""
+    if log_format == "json":
+        return JSONFormatter()
+    return TextFormatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(request_tag)s%(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
 
 def setup_logger(
     name: str = "wechat_scraper",
@@ -21,15 +76,14 @@ def setup_logger(
         return logger
     
     # 创建格式化器
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    formatter = create_formatter(settings.log_format)
+    request_id_filter = RequestIdFilter()
     
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(request_id_filter)
     logger.addHandler(console_handler)
     
     # 文件处理器（如果指定了日志文件）
@@ -38,10 +92,11 @@ def setup_logger(
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
+        file_handler.addFilter(request_id_filter)
         logger.addHandler(file_handler)
     
     return logger
 
 
 # 创建默认日志记录器
-logger = setup_logger() 
\ No newline at end of file
+logger = setup_logger()
@@ -0,0 +1,318 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value: float) -> str:
+    """按 Prometheus 文本格式输出数值"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    """指标基类：按标签值分组存储，线程安全"""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} 需要标签 {self.label_names}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def samples(self) -> List[Tuple[str, LabelValues, float, Tuple[str, ...], Tuple[str, ...]]]:
+        """返回 (指标名, 标签值, 数值, 额外标签名, 额外标签值) 列表"""
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, values, value, extra_names, extra_values in self.samples():
+            labels = format_labels(self.label_names + extra_names, values + extra_values)
+            lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """只增计数器"""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, k, v, (), ()) for k, v in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """可增可减的瞬时值"""
+    
+    type = "gauge"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+    
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """进入时加一、退出时减一"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, k, v, (), ()) for k, v in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """分桶直方图"""
+    
+    type = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+    
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """记录代码块耗时（秒），异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels: str) -> int:
+        item = self._values.get(self._key(labels))
+        return sum(item[0]) if item else 0
+    
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    result.append((f"{self.name}_bucket", key, cumulative, ("le",), (format_value(bound),)))
+                result.append((f"{self.name}_sum", key, total[0], (), ()))
+                result.append((f"{self.name}_count", key, cumulative, (), ()))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表，输出 Prometheus 文本格式"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+    
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets or DEFAULT_BUCKETS))
+    
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+# HTTP接口
+HTTP_REQUEST_DURATION = registry.histogram(
+    "myapi_http_request_duration_seconds", "接口请求耗时", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "myapi_http_requests_in_flight", "正在处理的接口请求数"
+)
+
+# 文章处理各阶段
+STAGE_DURATION = registry.histogram(
+    "myapi_wechat_stage_duration_seconds", "文章处理各阶段耗时（fetch/parse/image_download/image_optimize/markdown/markdown_stream）", ["stage"]
+)
+
+# 上游请求
+UPSTREAM_RESPONSES = registry.counter(
+    "myapi_upstream_responses_total", "上游响应数（status 为 HTTP 状态码或 error）", ["host", "status"]
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = registry.gauge(
+    "myapi_upstream_requests_in_flight", "正在进行的上游请求数", ["host"]
+)
+UPSTREAM_RATE_LIMIT = registry.gauge(
+    "myapi_upstream_rate_limit", "按主机配置的请求速率上限（次/秒）", ["host"]
+)
+UPSTREAM_RATE_LIMIT_WAIT = registry.histogram(
+    "myapi_upstream_rate_limit_wait_seconds", "因限流等待令牌的时间", ["host"]
+)
+UPSTREAM_RETRIES = registry.counter(
+    "myapi_upstream_retries_total", "上游请求重试次数", ["host"]
+)
+UPSTREAM_CIRCUIT_OPEN = registry.gauge(
+    "myapi_upstream_circuit_open", "主机是否处于熔断状态（1 为熔断）", ["host"]
+)
+UPSTREAM_REJECTED = registry.counter(
+    "myapi_upstream_rejected_total", "熔断期间未发出即失败的请求数", ["host"]
+)
+
+# 文章重新生成
+ARTICLE_REFRESHES = registry.counter(
+    "myapi_article_refreshes_total",
+    "重新获取文章时与上次结果的比较（not_modified 上游304 / unchanged 内容指纹相同 / changed / new 无上次结果）",
+    ["result"]
+)
+
+# 图片下载
+IMAGE_DOWNLOADS = registry.counter(
+    "myapi_image_downloads_total", "图片处理次数（downloaded/cached/failed/timeout）", ["result"]
+)
+IMAGE_DOWNLOAD_BYTES = registry.counter(
+    "myapi_image_download_bytes_total", "下载的图片字节数"
+)
+IMAGE_STORAGE_FILES = registry.gauge(
+    "myapi_image_storage_files", "图片存储中的文件数"
+)
+IMAGE_STORAGE_BYTES = registry.gauge(
+    "myapi_image_storage_bytes", "图片存储占用的字节数（含优化版本）"
+)
+IMAGE_EVICTIONS = registry.counter(
+    "myapi_image_evictions_total", "超出存储预算被淘汰的图片文件数"
+)
+
+# 文章缓存
+CACHE_LOOKUPS = registry.counter(
+    "myapi_cache_lookups_total", "文章缓存查询次数（hit/miss）", ["backend", "result"]
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "myapi_cache_hit_ratio", "文章缓存命中率（进程启动以来）", ["backend"]
+)
+
+
+def route_label(scope) -> str:
+    """按路由模板而非原始路径统计，避免标签基数膨胀"""
+    # 新版 FastAPI 的 include_router 为惰性挂载，scope["route"] 是不含前缀的原始路由，
+    # 完整路径在 effective_route_context 中
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    if getattr(context, "path", None):
+        return context.path
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    # 挂载的子应用（如静态文件）没有 route，路由匹配后 root_path 为挂载前缀
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """记录接口耗时和进行中请求数的ASGI中间件"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_label(scope),
+                status=str(status_code)
+            )
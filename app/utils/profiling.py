@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+# 这些文件中的栈顶帧表示线程空闲（线程池工作线程等待任务），不计入样本
+IDLE_FILES = ("threading.py", "queue.py", "thread.py")
+MAX_STACK_DEPTH = 64
+
+
+def collapse_stack(thread_name: str, frame: Optional[FrameType]) -> Optional[str]:
+    """调用栈折叠为一行（火焰图 collapsed 格式：线程;外层;...;内层），空闲线程返回 None"""
+    if frame is None or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+        return None
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class ProfileSession:
+    """一次采样的结果：各调用栈的样本数"""
+    
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+    
+    def add(self, stacks: List[str]) -> None:
+        self.samples += 1
+        self.stacks.update(stacks)
+    
+    def result(self, interval: float, top: int) -> Dict[str, Any]:
+        """样本数、采样时长和样本数最多的 top 个调用栈"""
+        return {
+            "samples": self.samples,
+            "interval_ms": round(interval * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)]
+        }
+
+
+class SamplingProfiler:
+    """采样分析器：有进行中的采样时，后台线程每隔 interval 秒抓取一次所有线程的调用栈
+    
+    采样的是整个进程（事件循环线程和线程池），同时进行的请求的样本无法区分归属；
+    CPU执行器为进程池时，子进程中的解析和转换不在采样范围内，其耗时见追踪中的对应阶段。
+    多个会话同时进行时共用一个采样线程。
+    """
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> ProfileSession:
+        """开始一次采样"""
+        session = ProfileSession()
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session
+    
+    def stop(self, session: ProfileSession, top: int = 30) -> Dict[str, Any]:
+        """结束采样，返回结果"""
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.duration = time.perf_counter() - session.started
+        return session.result(self.interval, top)
+    
+    def sample(self) -> List[str]:
+        """抓取一次除采样线程外所有非空闲线程的调用栈"""
+        current = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == current:
+                continue
+            stack = collapse_stack(names.get(ident, str(ident)), frame)
+            if stack is not None:
+                stacks.append(stack)
+        return stacks
+    
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+            stacks = self.sample()
+            for session in sessions:
+                session.add(stacks)
+            time.sleep(self.interval)
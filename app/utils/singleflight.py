@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar, Union
+
+from app.utils.sqlite import SQLiteDatabase
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """合并同一键的并发调用：进行中的调用只执行一次，结果/异常由所有调用者共享
+    
+    单个调用者取消（如客户端断开）不影响其他等待者；最后一个等待者也取消时，
+    调用随之取消，不再继续占用上游连接。
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._inflight)
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行或加入键为 key 的调用"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # 没有其他等待者：取消调用并等待其清理完毕，之后的调用重新执行
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+    
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已取消时，避免“异常未被获取”的警告
+        if not task.cancelled():
+            task.exception()
+
+
+SHARED_FLIGHT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedFlight:
+    """跨进程合并同一键的调用：同机多个 worker 进程中只有一个执行，其余等待其结果
+    
+    执行者在共享的 SQLite 文件中登记租约并定期续期；等待者轮询 lookup（共享缓存、图片索引等）
+    直到结果出现。执行者失败或进程退出（租约过期）且没有结果时，由等待者之一接手执行。
+    """
+    
+    def __init__(self, path: Union[str, Path], lease: float = 10.0, poll_interval: float = 0.05):
+        self.db = SQLiteDatabase(path, SHARED_FLIGHT_SCHEMA)
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+    
+    def _acquire(self, key: str) -> bool:
+        """登记租约，键已被其他执行者持有且未过期时返回 False"""
+        now = time.time()
+        cursor = self.db.connect().execute(
+            "INSERT INTO flights (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE flights.expires_at <= ?",
+            (key, self.owner, now + self.lease, now)
+        )
+        return cursor.rowcount == 1
+    
+    def _renew(self, key: str) -> None:
+        self.db.connect().execute(
+            "UPDATE flights SET expires_at = ? WHERE key = ? AND owner = ?",
+            (time.time() + self.lease, key, self.owner)
+        )
+    
+    def _release(self, key: str) -> None:
+        self.db.connect().execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, self.owner))
+    
+    def _held(self, key: str) -> bool:
+        return self.db.fetchone(
+            "SELECT 1 FROM flights WHERE key = ? AND expires_at > ?", (key, time.time())
+        ) is not None
+    
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Callable[[], Awaitable[Optional[T]]]
+    ) -> T:
+        """执行键为 key 的调用；其他进程正在执行时等待，由 lookup 取得其结果"""
+        while True:
+            if await asyncio.to_thread(self._acquire, key):
+                return await self._run(key, fn)
+            while await asyncio.to_thread(self._held, key):
+                await asyncio.sleep(self.poll_interval)
+                result = await lookup()
+                if result is not None:
+                    return result
+            # 租约已释放或过期：结果已写入则直接使用，否则尝试接手执行
+            result = await lookup()
+            if result is not None:
+                return result
+    
+    async def _run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        keep_alive = asyncio.create_task(self._keep_alive(key))
+        try:
+            return await fn()
+        finally:
+            keep_alive.cancel()
+            await asyncio.to_thread(self._release, key)
+    
+    async def _keep_alive(self, key: str) -> None:
+        """执行期间定期续期，执行时间超过租约时长也不会被其他进程接手"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self._renew, key)
@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+
+class SQLiteDatabase:
+    """SQLite数据库封装：每个线程独立连接，WAL模式支持同机多进程并发读写"""
+    
+    def __init__(self, path: Union[str, Path], schema: str, migrations: Sequence[str] = ()):
+        self.path = Path(path)
+        self.schema = schema
+        # 一次性数据迁移，按 user_version 记录已执行到第几条，每个数据库文件只执行一次
+        self.migrations = tuple(migrations)
+        self._local = threading.local()
+    
+    def connect(self) -> sqlite3.Connection:
+        """获取当前线程的连接，首次使用时初始化表结构"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self.migrate(conn)
+            self._local.conn = conn
+        return conn
+    
+    def migrate(self, conn: sqlite3.Connection) -> None:
+        """执行尚未执行的迁移（写事务内检查版本，多进程同时启动也只执行一次）"""
+        if not self.migrations:
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for index, sql in enumerate(self.migrations[version:], start=version + 1):
+                conn.execute(sql)
+                conn.execute(f"PRAGMA user_version = {index}")
+    
+    def fetchone(self, sql: str, parameters: Union[Sequence[Any], Dict[str, Any]] = ()) -> Optional[tuple]:
+        """查询单行并立即结束语句：未执行完的语句会让连接停留在旧的读快照上，看不到其他连接的写入"""
+        cursor = self.connect().execute(sql, parameters)
+        try:
+            return cursor.fetchone()
+        finally:
+            cursor.close()
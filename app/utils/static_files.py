@@ -0,0 +1,138 @@
+import os
+import re
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Sequence
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.staticfiles import StaticFiles
+
+from app.core.exceptions import WeChatScraperException
+from app.services.image_optimizer import VARIANT_MEDIA_TYPES, variant_path
+
+# 内容寻址存储的图片路径（images/ab/cd/<sha256>.ext），内容永不改变
+CONTENT_ADDRESSED_PATH = re.compile(r"^images/([0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+)$")
+
+# 延迟下载的图片路径（images/lazy/<源地址的sha256>），首次访问时下载
+LAZY_IMAGE_PATH = re.compile(r"^images/lazy/([0-9a-f]{64})$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 按标识下载图片并返回文件路径，无法提供时返回 None
+ImageLoader = Callable[[str], Awaitable[Optional[Path]]]
+
+
+def accepted_media_types(accept: str) -> frozenset:
+    """Accept 头中明确列出（q > 0）的类型；*/* 不代表支持 WebP / AVIF"""
+    accepted = set()
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(media_type.strip().lower())
+    return frozenset(accepted)
+
+
+class ImageStaticFiles(StaticFiles):
+    """静态文件服务
+    
+    - 内容寻址的图片附带长期不可变缓存头，浏览器和CDN无需重新验证；
+    - 文件本身由 FileResponse 发送，ASGI服务器支持 pathsend 扩展时零拷贝发送；
+    - 设置 accel_redirect 时只返回 X-Accel-Redirect 头，由 nginx 以 sendfile 直接发送文件；
+    - 设置 lazy_loader 时，延迟下载的图片在首次访问时由其下载，之后按内容寻址的文件返回；
+    - 设置 variants 时，按 Accept 头返回已生成的 AVIF / WebP 版本（按列表顺序优先）；
+    - 设置 restore_loader 时，已被淘汰的内容寻址图片在再次访问时重新下载；
+    - 设置 on_access 时，每次返回内容寻址的图片都以其存储路径调用，用于记录访问时间。
+    """
+    
+    def __init__(
+        self,
+        *args,
+        accel_redirect: str = "",
+        lazy_loader: Optional[ImageLoader] = None,
+        variants: Sequence[str] = (),
+        restore_loader: Optional[ImageLoader] = None,
+        on_access: Optional[Callable[[str], None]] = None,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.accel_redirect = accel_redirect.rstrip("/")
+        self.lazy_loader = lazy_loader
+        self.variants = [fmt for fmt in variants if fmt in VARIANT_MEDIA_TYPES]
+        self.restore_loader = restore_loader
+        self.on_access = on_access
+    
+    async def get_response(self, path: str, scope) -> Response:
+        normalized = path.replace(os.sep, "/")
+        lazy = LAZY_IMAGE_PATH.match(normalized)
+        if lazy is not None and self.lazy_loader is not None and scope["method"] in ("GET", "HEAD"):
+            return await self.loaded_response(self.lazy_loader, lazy.group(1), scope)
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            stored = CONTENT_ADDRESSED_PATH.match(normalized)
+            if e.status_code != 404 or stored is None or self.restore_loader is None:
+                raise
+            return await self.loaded_response(self.restore_loader, stored.group(1), scope)
+    
+    async def loaded_response(self, loader: ImageLoader, key: str, scope) -> Response:
+        """由 loader 下载图片后返回文件"""
+        try:
+            full_path = await loader(key)
+        except WeChatScraperException as e:
+            return PlainTextResponse(e.detail, status_code=e.status_code, headers=e.headers)
+        if full_path is None:
+            return PlainTextResponse("Not Found", status_code=404)
+        relative_path = os.path.relpath(full_path, self.directory)
+        if relative_path.startswith(os.pardir):
+            # 图片存储目录不在静态目录下，直接发送文件
+            return FileResponse(full_path, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+        return await super().get_response(relative_path, scope)
+    
+    def select_variant(self, full_path, scope):
+        """客户端支持且已生成的优化版本，返回 (路径, stat, Content-Type)，没有时返回 None"""
+        accepted = accepted_media_types(Headers(scope=scope).get("accept", ""))
+        for fmt in self.variants:
+            media_type = VARIANT_MEDIA_TYPES[fmt]
+            if media_type not in accepted:
+                continue
+            path = variant_path(Path(full_path), fmt)
+            try:
+                return path, os.stat(path), media_type
+            except OSError:
+                continue
+        return None
+    
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        content_addressed = CONTENT_ADDRESSED_PATH.match(relative_path)
+        variant = self.select_variant(full_path, scope) if content_addressed and self.variants else None
+        if variant is not None:
+            full_path, stat_result, media_type = variant
+            relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if variant is not None and isinstance(response, FileResponse):
+            response.headers["Content-Type"] = media_type
+        if content_addressed:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            if self.on_access is not None:
+                self.on_access(content_addressed.group(1))
+            if self.variants:
+                response.headers.add_vary_header("Accept")
+        if self.accel_redirect and isinstance(response, FileResponse):
+            # nginx 会保留 Content-Type、Cache-Control 等头，并自行处理 Range 和条件请求
+            headers = {
+                "X-Accel-Redirect": f"{self.accel_redirect}/{relative_path}",
+                "Content-Type": response.headers["content-type"]
+            }
+            for name in ("Cache-Control", "Vary"):
+                if name in response.headers:
+                    headers[name] = response.headers[name]
+            return Response(status_code=status_code, headers=headers)
+        return response
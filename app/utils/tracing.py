@@ -0,0 +1,226 @@
+import asyncio
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.utils.logger import logger, request_id_var
+from app.utils.metrics import STAGE_DURATION, route_label
+from app.utils.profiling import SamplingProfiler
+
+# 客户端传入的请求ID只接受有限的字符和长度，避免日志注入
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+
+@dataclass
+class Span:
+    """一个处理阶段：相对请求开始的起始时间、耗时、父阶段和附加属性"""
+    name: str
+    start: float
+    parent: Optional[int] = None  # 父阶段在 Trace.spans 中的序号
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    
+    def set(self, **attributes: Any) -> None:
+        """补充属性（如结果、字节数）"""
+        self.attributes.update(attributes)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round(self.start * 1000, 3),
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "parent": self.parent
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        data.update(self.attributes)
+        return data
+
+
+class Trace:
+    """一个请求的追踪：按开始顺序记录各阶段，超过 max_spans 的阶段只计数"""
+    
+    def __init__(self, request_id: str, max_spans: int = 1000):
+        self.request_id = request_id
+        self.max_spans = max_spans
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+        self.dropped = 0
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in self.spans]
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def traced(request_id: str, max_spans: Optional[int] = None) -> Iterator[Trace]:
+    """开始一个追踪：代码块内（含其中创建的任务）的 span 都记录到该追踪，日志带上请求ID"""
+    trace = Trace(request_id, max_spans or settings.trace_max_spans)
+    tokens = (request_id_var.set(request_id), current_trace.set(trace), current_span.set(None))
+    try:
+        yield trace
+    finally:
+        current_span.reset(tokens[2])
+        current_trace.reset(tokens[1])
+        request_id_var.reset(tokens[0])
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """记录一个处理阶段的耗时；不在追踪中（如后台任务、追踪未启用）时不记录，返回 None
+    
+    在 span 内创建的任务（asyncio.create_task、to_thread）继承当前上下文，其中的 span 为其子阶段。
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped += 1
+        yield None
+        return
+    item = Span(name, trace.elapsed(), current_span.get(), attributes=attributes)
+    trace.spans.append(item)
+    token = current_span.set(len(trace.spans) - 1)
+    try:
+        yield item
+    except asyncio.CancelledError:
+        item.error = "cancelled"
+        raise
+    except BaseException as e:
+        item.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        item.duration = trace.elapsed() - item.start
+        try:
+            current_span.reset(token)
+        except ValueError:
+            # 异步生成器被回收时可能在另一个上下文中结束
+            pass
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """文章处理阶段：同时记录阶段耗时指标和追踪 span"""
+    with STAGE_DURATION.time(stage=name), span(name, **attributes) as item:
+        yield item
+
+
+def trace_summary(trace: Trace) -> Dict[str, Any]:
+    """各阶段名称的次数和累计耗时（毫秒），便于快速定位耗时最多的阶段"""
+    summary: Dict[str, Dict[str, float]] = {}
+    for item in trace.spans:
+        entry = summary.setdefault(item.name, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + (item.duration or 0.0) * 1000, 3)
+    return summary
+
+
+# 全局采样分析器（慢请求和调试接口共用）
+profiler = SamplingProfiler(settings.profile_interval)
+
+
+class TracingMiddleware:
+    """请求追踪ASGI中间件
+    
+    - 沿用请求头中的请求ID（未传入或格式无效时生成），在响应头中返回，并附加到请求期间的所有日志；
+    - 记录请求中各处理阶段的耗时，超过 slow_request_threshold 的请求以结构化日志输出完整追踪；
+    - 开启 slow_request_profile 时，请求超过阈值仍未结束即开始采样调用栈，请求结束后随慢请求日志输出。
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.request_id_header.lower().encode("latin-1")
+    
+    def request_id(self, scope) -> str:
+        for name, value in scope.get("headers") or ():
+            if name == self.header:
+                value = value.decode("latin-1")
+                if REQUEST_ID_PATTERN.match(value):
+                    return value
+                break
+        return new_request_id()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.trace_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = self.request_id(scope)
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [(name, value) for name, value in message.get("headers", []) if name != self.header]
+                headers.append((self.header, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        threshold = settings.slow_request_threshold
+        session = None
+        
+        def start_profile():
+            nonlocal session
+            session = profiler.start()
+        
+        handle = None
+        if threshold > 0 and settings.slow_request_profile:
+            handle = asyncio.get_running_loop().call_later(threshold, start_profile)
+        
+        with traced(request_id) as trace:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if handle is not None:
+                    handle.cancel()
+                profile = profiler.stop(session, settings.profile_top_stacks) if session is not None else None
+                duration = trace.elapsed()
+                slow = 0 < threshold <= duration
+                if slow or settings.trace_log_requests:
+                    self.log(scope, trace, status_code, duration, slow, profile)
+    
+    @staticmethod
+    def log(
+        scope,
+        trace: Trace,
+        status_code: int,
+        duration: float,
+        slow: bool,
+        profile: Optional[Dict[str, Any]]
+    ) -> None:
+        fields = {
+            "event": "slow_request" if slow else "request",
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_label(scope),
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "summary": trace_summary(trace),
+            "spans": trace.to_list(),
+            "dropped_spans": trace.dropped
+        }
+        if profile is not None:
+            fields["profile"] = profile
+        message = f"{scope['method']} {scope['path']} {status_code} {fields['duration_ms']}ms"
+        if slow:
+            logger.warning(f"慢请求: {message}", extra={"fields": fields})
+        else:
+            logger.info(message, extra={"fields": fields})
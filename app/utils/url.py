@@ -0,0 +1,139 @@
+import ipaddress
+import re
+import socket
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# 不影响文章内容的跟踪/会话参数，规范化时剔除
+TRACKING_PARAMS = frozenset({
+    "ascene", "chksm", "clicktime", "devicetype", "enterid", "exportkey",
+    "from", "isappinstalled", "key", "lang", "pass_ticket", "scene",
+    "sessionid", "subscene", "uin", "version", "wx_header", "poc_token",
+})
+
+# 短链接形式：/s/<文章ID>
+SHORT_PATH = re.compile(r"^/s/([A-Za-z0-9_-]+)/?$")
+
+# 参数形式：/s?__biz=..&mid=..&idx=..&sn=..，旧版 /mp/appmsg/show?__biz=..&appmsgid=..&itemidx=..
+PARAM_PATHS = frozenset({"/s", "/mp/appmsg/show"})
+PARAM_ALIASES = {"appmsgid": "mid", "itemidx": "idx"}
+IDENTITY_PARAMS = ("__biz", "mid", "idx", "sn")
+
+
+@dataclass(frozen=True)
+class ArticleURL:
+    """微信文章地址的规范形式"""
+    key: str  # 文章标识，同一文章的不同地址形式得到相同的值，用作缓存和去重键
+    url: str  # 规范化后的抓取地址
+
+
+@lru_cache(maxsize=16)
+def host_pattern(domains: Tuple[str, ...]) -> "re.Pattern[str]":
+    """允许的主机：与域名完全相同，或为其子域名"""
+    alternatives = "|".join(re.escape(domain.lower().strip(".")) for domain in domains)
+    return re.compile(rf"^(?:[a-z0-9-]+\.)*(?:{alternatives})$")
+
+
+def is_allowed_host(host: str, domains: Iterable[str]) -> bool:
+    """按域名后缀精确匹配主机，evilmp.weixin.qq.com.attacker.com 之类的主机不会通过"""
+    return bool(host_pattern(tuple(domains)).match(host.lower().rstrip(".")))
+
+
+def normalize_article_url(url: str) -> str:
+    """规范化文章URL：统一大小写、去掉片段和跟踪参数、查询参数排序"""
+    parsed = urlparse(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("sharer_")
+    )
+    return urlunparse((
+        parsed.scheme.lower() or "https",
+        parsed.netloc.lower(),
+        parsed.path.rstrip("/") or "/",
+        "",
+        urlencode(query),
+        ""
+    ))
+
+
+@lru_cache(maxsize=4096)
+def parse_article_url(url: str, domains: Tuple[str, ...]) -> Optional[ArticleURL]:
+    """从各种形式的文章地址中提取文章标识，不是允许域名下的文章地址时返回 None
+    
+    - /s/<ID>：标识为 s/<ID>；
+    - /s?__biz=..&mid=..&idx=..（含旧版 appmsg/show）：标识为 biz/<__biz>/<mid>/<idx>，抓取地址只保留这几个参数和 sn；
+    - 其他形式：去掉跟踪参数后的规范化URL。
+    """
+    try:
+        parsed = urlparse(url.strip())
+        port = parsed.port
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").rstrip(".")
+    if (
+        parsed.scheme.lower() not in ("http", "https")
+        or parsed.username is not None
+        or port not in (None, 80, 443)
+        or not is_allowed_host(host, domains)
+    ):
+        return None
+    
+    origin = f"https://{host}"
+    short = SHORT_PATH.match(parsed.path)
+    if short:
+        return ArticleURL(key=f"s/{short.group(1)}", url=f"{origin}/s/{short.group(1)}")
+    
+    path = parsed.path.rstrip("/") or "/"
+    if path in PARAM_PATHS:
+        params = {}
+        for name, value in parse_qsl(parsed.query):
+            name = PARAM_ALIASES.get(name, name)
+            if name in IDENTITY_PARAMS and value:
+                params.setdefault(name, value)
+        if "__biz" in params and "mid" in params:
+            params.setdefault("idx", "1")
+            query = urlencode([(name, params[name]) for name in IDENTITY_PARAMS if name in params])
+            return ArticleURL(
+                key=f"biz/{params['__biz']}/{params['mid']}/{params['idx']}",
+                url=f"{origin}/s?{query}"
+            )
+    
+    normalized = normalize_article_url(urlunparse(("https", host, path, "", parsed.query, "")))
+    return ArticleURL(key=normalized, url=normalized)
+
+
+def is_public_address(address: str) -> bool:
+    """是否为公网地址：回环、私有、链路本地（含云服务元数据地址）、保留和组播地址都不是"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_safe_callback_url(url: str, allowed_hosts: Iterable[str] = ()) -> bool:
+    """校验用户提供的回调地址，避免服务端被用来访问内网（SSRF）
+    
+    只允许不带用户信息的 http(s) 地址；配置了 allowed_hosts 时主机必须是其中的域名（或子域名），
+    这些主机由运维显式信任，不再限制地址；否则主机解析出的所有地址都必须是公网地址。
+    """
+    try:
+        parsed = urlparse(url.strip())
+        port = parsed.port
+    except ValueError:
+        return False
+    host = (parsed.hostname or "").rstrip(".")
+    if parsed.scheme.lower() not in ("http", "https") or parsed.username is not None or not host:
+        return False
+    allowed_hosts = tuple(allowed_hosts)
+    if allowed_hosts:
+        return is_allowed_host(host, allowed_hosts)
+    try:
+        infos = socket.getaddrinfo(host, port or 443, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError):
+        return False
+    return bool(infos) and all(is_public_address(info[4][0]) for info in infos)
@@ -0,0 +1,117 @@
+"""服务各阶段的微基准：抓取解析、图片下载替换、Markdown转换
+
+上游由进程内的模拟上游（ASGI传输，无网络开销）提供，可配置延迟；
+每个阶段按文章规模分别统计单次耗时（墙钟时间）的平均值和百分位数。
+
+用法：
+    python -m benchmarks.bench_micro [--iterations 20] [--image-latency 0.01] [--json] [--output micro.json]
+"""
+
+import argparse
+import asyncio
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import AsyncHTTPClient
+from app.services.article_parser import render_markdown, serialize_content
+from app.services.image_store import ImageStore
+from app.services.wechat_service import AsyncWeChatService
+from benchmarks.fake_upstream import UpstreamRedirectTransport, create_app
+from benchmarks.fixtures import ARTICLE_SIZES
+from benchmarks.results import add_output_arguments, emit, percentile
+
+
+async def measure(fn: Callable[[], Awaitable[Any]], iterations: int) -> Dict[str, float]:
+    """预热一次后执行 iterations 次，返回耗时统计（毫秒）"""
+    await fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return {
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "p50_ms": round(percentile(durations, 50), 3),
+        "p95_ms": round(percentile(durations, 95), 3)
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    workdir = Path(tempfile.mkdtemp(prefix="myapi-bench-"))
+    settings.static_img_dir = str(workdir / "images")
+    settings.image_index_path = str(workdir / "images.sqlite3")
+    settings.shared_state_path = str(workdir / "shared.sqlite3")
+    # 基准测量的是本服务自身的开销，关闭对上游的限流
+    settings.upstream_rate_limit = 0
+    
+    upstream = create_app(args.page_latency, args.image_latency, args.image_size)
+    client = AsyncHTTPClient(transport=UpstreamRedirectTransport(
+        "http://upstream", httpx.ASGITransport(app=upstream)
+    ))
+    await client.start()
+    service = AsyncWeChatService(client=client, cache=None, archive=None)
+    
+    results = []
+    try:
+        for size in ARTICLE_SIZES:
+            url = f"https://mp.weixin.qq.com/s/{size}-0"
+            article = await service.fetch_article(url)
+            content_html = serialize_content(article.content)
+            counter = iter(range(1_000_000))
+            
+            async def fetch_article_html():
+                await service.fetch_article_html(url)
+            
+            async def download_and_replace_images():
+                # 每次使用新的图片存储，避免已下载的图片直接命中索引
+                store_dir = workdir / f"store-{next(counter)}"
+                service.image_store = ImageStore(store_dir, settings.base_image_url, store_dir / "index.sqlite3")
+                await service.download_and_replace_images(content_html)
+            
+            async def convert_to_markdown():
+                render_markdown(content_html)
+            
+            stages = {
+                "fetch_article_html": fetch_article_html,
+                "download_and_replace_images": download_and_replace_images,
+                "convert_to_markdown": convert_to_markdown
+            }
+            for name, fn in stages.items():
+                metrics = await measure(fn, args.iterations)
+                results.append({"name": f"{name}[{size}]", "metrics": metrics})
+    finally:
+        await client.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--page-latency", type=float, default=0.0, help="模拟上游文章页面延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="模拟上游图片延迟（秒）")
+    parser.add_argument("--image-size", type=int, default=32 * 1024, help="单张图片字节数")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    parameters = {
+        "iterations": args.iterations,
+        "page_latency": args.page_latency,
+        "image_latency": args.image_latency,
+        "image_size": args.image_size,
+        "html_parser": settings.html_parser
+    }
+    emit("micro", parameters, results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""单篇文章解析与Markdown转换的CPU耗时基准
+
+对比旧流程（整页解析 -> 序列化正文 -> 重新解析替换图片 -> markdownify 再次解析）
+与单次解析流程（整页解析一次，图片替换在Markdown转换时完成）。
+
+用法：
+    python -m benchmarks.bench_parse [--iterations 20] [--json] [--output parse.json]
+"""
+
+import argparse
+import time
+from typing import Callable, Dict
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify as md
+
+from app.services.article_parser import (
+    collect_image_sources,
+    extract_article,
+    render_markdown,
+    resolve_html_parser
+)
+from benchmarks.fixtures import ARTICLE_SIZES, image_urls, make_article_page
+from benchmarks.results import add_output_arguments, emit
+
+
+def legacy_pipeline(page: str, image_map: Dict[str, str]) -> str:
+    """旧流程：同一份正文被解析三次"""
+    soup = BeautifulSoup(page, "html.parser")
+    content_html = str(soup.find("div", class_="rich_media_content") or soup.find("div", id="js_content"))
+    soup = BeautifulSoup(content_html, "html.parser")
+    for img in soup.find_all("img"):
+        src = img.get("data-src") or img.get("src")
+        if src in image_map:
+            img["src"] = image_map[src]
+    return md(str(soup), heading_style="ATX", bullets="*", strip=["script", "style"])
+
+
+def single_parse_pipeline(parser: str) -> Callable[[str, Dict[str, str]], str]:
+    """新流程：整页只解析一次"""
+    def run(page: str, image_map: Dict[str, str]) -> str:
+        _, content, _ = extract_article(page, parser)
+        collect_image_sources(content)
+        return render_markdown(content, image_map)
+    return run
+
+
+def cpu_per_article(fn: Callable[[str, Dict[str, str]], str], page: str, image_map: Dict[str, str], iterations: int) -> float:
+    """返回单篇文章平均CPU耗时（毫秒）"""
+    fn(page, image_map)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(page, image_map)
+    return (time.process_time() - start) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    
+    pipelines = {"legacy": legacy_pipeline, "single_parse[html.parser]": single_parse_pipeline("html.parser")}
+    if resolve_html_parser("lxml") == "lxml":
+        pipelines["single_parse[lxml]"] = single_parse_pipeline("lxml")
+    
+    results = []
+    for size, (paragraphs, images) in ARTICLE_SIZES.items():
+        page = make_article_page(paragraphs, images)
+        image_map = {src: f"https://example.com/static/images/{i}.png" for i, src in enumerate(image_urls(images))}
+        for name, fn in pipelines.items():
+            results.append({
+                "name": f"{name}[{size}]",
+                "metrics": {
+                    "page_bytes": len(page.encode("utf-8")),
+                    "cpu_ms": round(cpu_per_article(fn, page, image_map, args.iterations), 3)
+                }
+            })
+    
+    emit("parse", {"iterations": args.iterations}, results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""本地模拟的微信上游：提供不同规模的文章页面和图片，可配置响应延迟
+
+文章地址 /s/<规模>-<seed>（规模见 fixtures.ARTICLE_SIZES），如 /s/medium-3；
+图片地址与文章中引用的 mmbiz 图片路径一致。配合 UpstreamRedirectTransport，
+应用访问 mp.weixin.qq.com / mmbiz.qpic.cn 的请求都会被转发到这里。
+
+单独运行：
+    python -m benchmarks.fake_upstream [--port 8900] [--page-latency 0.05] [--image-latency 0.02]
+"""
+
+import argparse
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from benchmarks.fixtures import ARTICLE_SIZES, make_article_page
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@lru_cache(maxsize=None)
+def article_page(size: str, seed: int) -> str:
+    paragraphs, images = ARTICLE_SIZES[size]
+    return make_article_page(paragraphs, images, seed=seed)
+
+
+def image_bytes(key: str, size: int) -> bytes:
+    """按图片路径生成确定的图片内容，不同图片内容不同"""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    filler = digest * (max(size - len(PNG_SIGNATURE), 0) // len(digest) + 1)
+    return PNG_SIGNATURE + filler[:max(size - len(PNG_SIGNATURE), 0)]
+
+
+def create_app(page_latency: float = 0.0, image_latency: float = 0.0, image_size: int = 32 * 1024) -> Starlette:
+    """创建模拟上游应用"""
+    
+    async def article(request: Request) -> Response:
+        size, _, seed = request.path_params["slug"].partition("-")
+        if size not in ARTICLE_SIZES or not seed.isdigit():
+            return PlainTextResponse("not found", status_code=404)
+        if page_latency:
+            await asyncio.sleep(page_latency)
+        return Response(article_page(size, int(seed)), media_type="text/html; charset=utf-8")
+    
+    async def image(request: Request) -> Response:
+        if image_latency:
+            await asyncio.sleep(image_latency)
+        return Response(image_bytes(request.url.path, image_size), media_type="image/png")
+    
+    return Starlette(routes=[
+        Route("/s/{slug}", article),
+        Route("/mmbiz_png/{key}/640", image),
+    ])
+
+
+class UpstreamRedirectTransport(httpx.AsyncBaseTransport):
+    """把所有请求改写到指定的模拟上游地址，路径和查询参数保持不变"""
+    
+    def __init__(self, target: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.target = httpx.URL(target)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self.target.scheme,
+            host=self.target.host,
+            port=self.target.port
+        )
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+        return await self.transport.handle_async_request(request)
+    
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--page-latency", type=float, default=0.0, help="文章页面响应延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="图片响应延迟（秒）")
+    parser.add_argument("--image-size", type=int, default=32 * 1024, help="单张图片字节数")
+    args = parser.parse_args()
+    
+    import uvicorn
+    uvicorn.run(
+        create_app(args.page_latency, args.image_latency, args.image_size),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
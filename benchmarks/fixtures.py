@@ -0,0 +1,74 @@
+"""基准测试用的仿真微信公众号文章页面"""
+
+import random
+from typing import List
+
+IMAGE_HOST = "https://mmbiz.qpic.cn"
+
+# 文章规模：(段落数, 图片数)
+ARTICLE_SIZES = {
+    "small": (20, 5),
+    "medium": (80, 30),
+    "large": (250, 80),
+}
+
+SENTENCES = [
+    "微信公众号文章通常包含大量中文段落与插图。",
+    "这里是一段用于基准测试的正文内容，长度与真实文章接近。",
+    "<strong>加粗的重点内容</strong>以及<em>强调文字</em>会穿插其中。",
+    "文章中还会出现<a href=\"https://mp.weixin.qq.com/s/other\">相关阅读链接</a>。",
+]
+
+
+def image_urls(count: int, host: str = IMAGE_HOST, seed: int = 0) -> List[str]:
+    """生成文章中使用的图片地址，不同 seed 的文章使用不同的图片"""
+    return [f"{host}/mmbiz_png/bench{seed}-{i}/640?wx_fmt=png" for i in range(count)]
+
+
+def make_article_page(
+    paragraphs: int = 60,
+    images: int = 20,
+    image_host: str = IMAGE_HOST,
+    seed: int = 0
+) -> str:
+    """生成结构与真实微信文章页面相近的HTML"""
+    rng = random.Random(seed)
+    srcs = image_urls(images, image_host, seed)
+    blocks = []
+    for i in range(paragraphs):
+        text = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 6)))
+        if i % 10 == 0:
+            blocks.append(f"<h2><span>第{i // 10 + 1}节</span></h2>")
+        blocks.append(f'<p style="margin: 0 8px;"><span style="font-size: 15px;">{text}</span></p>')
+        if srcs and i % max(1, paragraphs // images) == 0:
+            src = srcs.pop(0)
+            blocks.append(
+                f'<p style="text-align: center;"><img class="rich_pages wxw-img" '
+                f'data-src="{src}" data-ratio="0.75" data-w="1080" style="width: 100%;"></p>'
+            )
+    blocks.extend(
+        f'<p><img class="rich_pages" data-src="{src}"></p>' for src in srcs
+    )
+    head_filler = "\n".join(
+        f'<script type="text/javascript">var __bench_{i} = "{"x" * 200}";</script>' for i in range(40)
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>基准测试文章</title>
+<meta property="og:title" content="基准测试文章标题">
+<meta property="og:image" content="{image_host}/mmbiz_jpg/cover/0?wx_fmt=jpeg">
+{head_filler}
+</head>
+<body id="activity-detail" class="zh_CN">
+<div class="rich_media_inner">
+<h1 class="rich_media_title" id="activity-name">基准测试文章标题</h1>
+<div class="rich_media_content js_underline_content" id="js_content" style="visibility: hidden;">
+{"".join(blocks)}
+</div>
+</div>
+<script type="text/javascript">{"var a = 1;" * 2000}</script>
+</body>
+</html>
+"""
@@ -0,0 +1,166 @@
+"""端到端负载测试：启动模拟上游和应用（uvicorn），以固定并发请求文章接口
+
+统计吞吐量（RPS）、延迟百分位数和错误数。每篇文章使用不同的 seed，
+--articles 控制不同文章的数量：数量小于请求数时后续请求可命中缓存。
+
+用法：
+    python -m benchmarks.load_test [--requests 200] [--concurrency 20] [--size medium]
+        [--scenario markdown|html|markdown_stream|metadata] [--cache memory|none]
+        [--page-latency 0.05] [--image-latency 0.02] [--json] [--output load.json]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.fixtures import ARTICLE_SIZES
+from benchmarks.results import add_output_arguments, emit, percentile
+
+SCENARIOS = {
+    "markdown": ("/api/v1/wechat/markdown", {}),
+    "html": ("/api/v1/wechat", {}),
+    "markdown_stream": ("/api/v1/wechat/markdown", {"stream": "true"}),
+    "metadata": ("/api/v1/wechat/metadata", {}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """等待服务开始监听"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程提前退出: {process.args}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"等待服务启动超时: {url}")
+
+
+@contextmanager
+def running(args: List[str], ready_url: str, env: Optional[Dict[str, str]] = None) -> Iterator[None]:
+    process = subprocess.Popen([sys.executable, "-m", *args], env=env)
+    try:
+        wait_ready(ready_url, process)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """以固定并发发出请求，返回统计结果"""
+    path, params = SCENARIOS[args.scenario]
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+    latencies: List[float] = []
+    errors = 0
+    
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            article_url = f"https://mp.weixin.qq.com/s/{args.size}-{i % args.articles}"
+            start = time.perf_counter()
+            try:
+                resp = await client.get(path, params={**params, "url": article_url})
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+    
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "rps": round(args.requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--articles", type=int, default=0, help="不同文章数量，默认与请求数相同（全部未命中缓存）")
+    parser.add_argument("--size", choices=list(ARTICLE_SIZES), default="medium")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="markdown")
+    parser.add_argument("--cache", choices=["memory", "none"], default="memory")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="模拟上游文章页面延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=0.02, help="模拟上游图片延迟（秒）")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    args.articles = args.articles or args.requests
+    
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    workdir = tempfile.mkdtemp(prefix="myapi-load-")
+    env = {
+        **os.environ,
+        "CACHE_BACKEND": args.cache,
+        # 测量的是本服务的处理能力，关闭对上游的限流
+        "UPSTREAM_RATE_LIMIT": "0",
+        "STATIC_IMG_DIR": os.path.join(workdir, "images"),
+        "IMAGE_INDEX_PATH": os.path.join(workdir, "images.sqlite3"),
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+        # 归档和订阅数据库也放在临时目录，避免复用上次运行留下的内容指纹而跳过处理
+        "ARCHIVE_PATH": os.path.join(workdir, "articles.sqlite3"),
+        "TRACKER_DB_PATH": os.path.join(workdir, "tracked.sqlite3"),
+        "SHARED_STATE_PATH": os.path.join(workdir, "shared.sqlite3")
+    }
+    
+    upstream_cmd = [
+        "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--page-latency", str(args.page_latency), "--image-latency", str(args.image_latency)
+    ]
+    app_cmd = ["benchmarks.serve_app", "--upstream", upstream_url, "--port", str(app_port)]
+    try:
+        with running(upstream_cmd, upstream_url), running(app_cmd, app_url, env):
+            metrics = asyncio.run(drive(app_url, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    parameters = {
+        key: getattr(args, key)
+        for key in ("requests", "concurrency", "articles", "size", "scenario", "cache", "page_latency", "image_latency")
+    }
+    emit("load", parameters, [{"name": f"{args.scenario}[{args.size}]", "metrics": metrics}], args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""基准测试结果的统一格式与跨提交对比
+
+所有基准以相同结构输出JSON，便于保存并在不同提交之间对比：
+
+    {
+      "suite": "micro",
+      "environment": {"commit": "...", "python": "...", ...},
+      "parameters": {...},
+      "results": [{"name": "parse[medium]", "metrics": {"cpu_ms": 12.3, ...}}, ...]
+    }
+
+对比两次结果：
+    python -m benchmarks.results baseline.json current.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位数（输入须已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """记录运行环境，对比结果时据此判断是否可比"""
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--json", action="store_true", help="以JSON输出到标准输出")
+    parser.add_argument("--output", help="将JSON结果写入文件")
+
+
+def emit(suite: str, parameters: Dict[str, Any], results: List[Dict[str, Any]], args: argparse.Namespace) -> None:
+    """按统一格式输出结果：表格打印到终端，或输出/写入JSON"""
+    document = {
+        "suite": suite,
+        "environment": environment(),
+        "parameters": parameters,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(document, ensure_ascii=False, indent=2))
+        return
+    for result in results:
+        metrics = "  ".join(f"{key}={value}" for key, value in result["metrics"].items())
+        print(f"{result['name']:<40}{metrics}")
+
+
+def metric_direction(name: str) -> int:
+    """指标方向：1 越大越好，-1 越小越好，0 仅供参考"""
+    if name in ("rps",) or name.endswith("_per_s"):
+        return 1
+    if name.endswith("_ms") or name.endswith("_s") or name == "errors":
+        return -1
+    return 0
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """逐项对比两次结果，返回变化超过阈值的退化项"""
+    base_results = {r["name"]: r["metrics"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        base_metrics = base_results.get(result["name"])
+        if base_metrics is None:
+            continue
+        for key, value in result["metrics"].items():
+            direction = metric_direction(key)
+            base_value = base_metrics.get(key)
+            if not direction or not isinstance(base_value, (int, float)) or not base_value:
+                continue
+            change = (value - base_value) / base_value
+            marker = ""
+            if change * direction < -threshold:
+                marker = "  <-- 退化"
+                regressions.append({"name": result["name"], "metric": key, "baseline": base_value, "current": value})
+            print(f"{result['name']:<40}{key:<16}{base_value:>12}{value:>12}{change:>+10.1%}{marker}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定为退化的相对变化，默认 10%%")
+    args = parser.parse_args()
+    
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    print(f"baseline: {baseline['environment'].get('commit')}  current: {current['environment'].get('commit')}")
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} 项指标退化超过 {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
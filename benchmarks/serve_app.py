@@ -0,0 +1,30 @@
+"""启动应用并把上游请求转发到模拟上游，供负载测试使用
+
+用法：
+    python -m benchmarks.serve_app --upstream http://127.0.0.1:8900 [--port 8000]
+"""
+
+import argparse
+
+import uvicorn
+
+from app.core.http_client import http_client
+from benchmarks.fake_upstream import UpstreamRedirectTransport
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upstream", required=True, help="模拟上游地址")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    
+    # 客户端在 lifespan 启动时才创建，此前替换传输层即可
+    http_client._transport = UpstreamRedirectTransport(args.upstream)
+    
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
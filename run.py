@@ -1,22 +1,57 @@
 #!/usr/bin/env python3
 """
 微信公众号文章抓取API服务启动脚本
+
+    python run.py                   # 单进程（DEBUG=true 时自动重载代码）
+    python run.py --workers 4       # 生产模式：多 worker 进程，kill -HUP <主进程PID> 滚动重启
 """
 
+import argparse
+import os
+
 import uvicorn
 from app.core.config import settings
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="启动 MyAPI 服务")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.workers, help="worker 进程数")
+    parser.add_argument("--loop", choices=["auto", "uvloop", "asyncio"], default=settings.event_loop)
+    parser.add_argument("--http", choices=["auto", "httptools", "h11"], default=settings.http_protocol)
+    parser.add_argument(
+        "--reload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.debug,
+        help="代码变化时自动重载（开发模式，只能单进程）"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """启动应用"""
+    args = parse_args(argv)
+    if args.reload:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True, log_level="info")
+        return
+    
+    if args.workers > 1:
+        # worker 进程重新导入应用并读取环境变量，据此启用跨进程共享的缓存和请求合并
+        os.environ["WORKERS"] = str(args.workers)
+        if "cache_backend" not in settings.model_fields_set:
+            os.environ["CACHE_BACKEND"] = "disk"
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=5201,
-        reload=settings.debug,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=args.loop,
+        http=args.http,
+        timeout_graceful_shutdown=settings.graceful_timeout,
         log_level="info"
     )
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -61,6 +61,7 @@ services:
       - DEBUG=false
     volumes:
       - ./static:/app/static
+      - ./data:/app/data
     restart: unless-stopped
     healthcheck:
       test: ["CMD", "curl", "-f", "http://localhost:5201/docs"]
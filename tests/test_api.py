@@ -1,7 +1,16 @@
+import json
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 
+from app.core.config import settings
+from app.services.cache import ArticleEntry
+
+
+def make_entry(body, etag='"abc"', last_modified=1700000000.0):
+    """构造文章结果缓存项"""
+    return ArticleEntry(body=body, etag=etag, last_modified=last_modified, fresh_until=last_modified + 3600)
+
 
 class TestWeChatAPI:
     """微信公众号API测试类"""
@@ -17,29 +26,31 @@ class TestWeChatAPI:
         response = client.get("/api/v1/wechat")
         assert response.status_code == 422  # 验证错误
     
-    @patch('app.services.wechat_service.wechat_service.get_article_data')
-    def test_get_wechat_article_success(self, mock_get_data, client: TestClient):
+    @patch('app.services.wechat_service.async_wechat_service.get_article', new_callable=AsyncMock)
+    def test_get_wechat_article_success(self, mock_get_article, client: TestClient):
         """测试成功获取文章"""
         mock_data = {
             "title": "测试文章",
             "content": "<p>文章内容</p>",
             "cover": "https://example.com/cover.jpg"
         }
-        mock_get_data.return_value = mock_data
+        mock_get_article.return_value = make_entry(mock_data)
         
         response = client.get("/api/v1/wechat", params={"url": "https://mp.weixin.qq.com/s/example"})
         
         assert response.status_code == 200
+        assert response.headers["etag"] == '"abc"'
+        assert response.headers["last-modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
         data = response.json()
         assert data["title"] == "测试文章"
         assert data["content"] == "<p>文章内容</p>"
         assert data["cover"] == "https://example.com/cover.jpg"
     
-    @patch('app.services.wechat_service.wechat_service.get_article_markdown')
-    def test_get_wechat_article_markdown_success(self, mock_get_markdown, client: TestClient):
+    @patch('app.services.wechat_service.async_wechat_service.get_article', new_callable=AsyncMock)
+    def test_get_wechat_article_markdown_success(self, mock_get_article, client: TestClient):
         """测试成功获取Markdown格式文章"""
         mock_markdown = "# 测试文章\n\n这是文章内容"
-        mock_get_markdown.return_value = mock_markdown
+        mock_get_article.return_value = make_entry(mock_markdown)
         
         response = client.get("/api/v1/wechat/markdown", params={"url": "https://mp.weixin.qq.com/s/example"})
         
@@ -47,10 +58,149 @@ class TestWeChatAPI:
         assert "application/json" in response.headers["content-type"]
         assert "# 测试文章" in response.text
     
+    @patch('app.services.wechat_service.async_wechat_service.stream_article_markdown')
+    def test_get_wechat_article_markdown_stream(self, mock_stream, client: TestClient):
+        """测试流式Markdown以 text/markdown 返回"""
+        async def chunks(url):
+            yield "# 测试文章\n\n"
+            yield "段落一\n\n段落二"
+        
+        mock_stream.side_effect = chunks
+        
+        response = client.get(
+            "/api/v1/wechat/markdown",
+            params={"url": "https://mp.weixin.qq.com/s/example", "stream": "true"}
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/markdown")
+        assert response.text == "# 测试文章\n\n段落一\n\n段落二"
+    
+    def test_get_wechat_article_markdown_stream_invalid_url(self, client: TestClient):
+        """测试流式模式下URL无效时仍返回400"""
+        response = client.get(
+            "/api/v1/wechat/markdown",
+            params={"url": "https://example.com/article", "stream": "true"}
+        )
+        assert response.status_code == 400
+    
+    @patch('app.services.wechat_service.async_wechat_service.get_article', new_callable=AsyncMock)
+    def test_if_none_match_returns_304(self, mock_get_article, client: TestClient):
+        """测试 ETag 匹配时返回不含正文的 304"""
+        mock_get_article.return_value = make_entry("# 测试文章")
+        params = {"url": "https://mp.weixin.qq.com/s/example"}
+        
+        response = client.get("/api/v1/wechat/markdown", params=params, headers={"If-None-Match": 'W/"abc"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == '"abc"'
+        
+        response = client.get("/api/v1/wechat/markdown", params=params, headers={"If-None-Match": '"other"'})
+        assert response.status_code == 200
+    
+    @patch('app.services.wechat_service.async_wechat_service.get_article', new_callable=AsyncMock)
+    def test_if_modified_since_returns_304(self, mock_get_article, client: TestClient):
+        """测试内容在 If-Modified-Since 之后未变化时返回 304"""
+        mock_get_article.return_value = make_entry({"title": "标题", "content": "<p>正文</p>", "cover": None})
+        params = {"url": "https://mp.weixin.qq.com/s/example"}
+        
+        response = client.get("/api/v1/wechat", params=params, headers={"If-Modified-Since": "Tue, 14 Nov 2023 22:13:20 GMT"})
+        assert response.status_code == 304
+        
+        response = client.get("/api/v1/wechat", params=params, headers={"If-Modified-Since": "Mon, 13 Nov 2023 00:00:00 GMT"})
+        assert response.status_code == 200
+    
+    @patch('app.services.wechat_service.async_wechat_service.get_article_markdown', new_callable=AsyncMock)
+    def test_batch_markdown_streams_ndjson(self, mock_get_markdown, client: TestClient):
+        """测试批量转换以NDJSON返回，单篇失败不影响其他文章"""
+        from app.core.exceptions import NetworkRequestException
+        
+        async def fake_markdown(url):
+            if url.endswith("bad"):
+                raise NetworkRequestException("网络请求失败: timeout")
+            return f"# {url}"
+        
+        mock_get_markdown.side_effect = fake_markdown
+        urls = ["https://mp.weixin.qq.com/s/a", "https://mp.weixin.qq.com/s/bad"]
+        
+        response = client.post("/api/v1/wechat/batch", json={"urls": urls, "format": "markdown"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        items = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda i: i["index"])
+        assert items[0] == {"index": 0, "url": urls[0], "status": 200, "data": f"# {urls[0]}"}
+        assert items[1]["status"] == 502
+        assert "timeout" in items[1]["error"]
+    
+    def test_batch_rejects_empty_urls(self, client: TestClient):
+        """测试空URL列表返回验证错误"""
+        response = client.post("/api/v1/wechat/batch", json={"urls": []})
+        assert response.status_code == 422
+    
+    @patch('app.services.wechat_service.async_wechat_service.get_article_metadata', new_callable=AsyncMock)
+    def test_get_wechat_article_metadata(self, mock_get_metadata, client: TestClient):
+        """测试获取文章元数据"""
+        mock_get_metadata.return_value = {"title": "测试文章", "cover": None, "description": "摘要"}
+        
+        response = client.get("/api/v1/wechat/metadata", params={"url": "https://mp.weixin.qq.com/s/example"})
+        
+        assert response.status_code == 200
+        assert response.json() == {"title": "测试文章", "cover": None, "description": "摘要"}
+    
+    @patch('app.services.wechat_service.async_wechat_service.get_archived_article', new_callable=AsyncMock)
+    def test_get_archived_article(self, mock_get_archived, client: TestClient):
+        """测试按链接查询归档，未归档时返回404"""
+        mock_get_archived.return_value = {
+            "key": "s/example",
+            "url": "https://mp.weixin.qq.com/s/example",
+            "title": "测试文章",
+            "cover": None,
+            "html": "<p>文章内容</p>",
+            "markdown": None,
+            "fetched_at": 1700000000.0
+        }
+        
+        response = client.get("/api/v1/wechat/archive", params={"url": "https://mp.weixin.qq.com/s/example"})
+        
+        assert response.status_code == 200
+        assert response.json()["content"] == "<p>文章内容</p>"
+        assert response.json()["markdown"] is None
+        mock_get_archived.return_value = None
+        response = client.get("/api/v1/wechat/archive", params={"url": "https://mp.weixin.qq.com/s/example"})
+        assert response.status_code == 404
+    
     def test_api_docs_available(self, client: TestClient):
         """测试API文档是否可用"""
         response = client.get("/docs")
         assert response.status_code == 200
         
         response = client.get("/redoc")
-        assert response.status_code == 200 
\ No newline at end of file
+        assert response.status_code == 200 
+
+
+class TestAdminAPI:
+    """管理接口测试类"""
+    
+    @patch('app.services.image_storage.image_storage.usage', new_callable=AsyncMock)
+    @patch('app.services.image_storage.image_storage.run_once', new_callable=AsyncMock)
+    def test_storage_requires_admin_token(self, mock_run_once, mock_usage, client: TestClient):
+        """测试未配置令牌时接口不存在，令牌缺失或错误时拒绝且不执行淘汰"""
+        usage = {
+            "files": 1, "bytes": 40, "max_files": 0, "max_bytes": 0,
+            "evicted_files": 0, "evicted_bytes": 0, "last_eviction_at": None
+        }
+        mock_usage.return_value = mock_run_once.return_value = usage
+        
+        with patch.object(settings, "admin_token", ""):
+            assert client.get("/api/v1/admin/storage").status_code == 404
+            assert client.post("/api/v1/admin/storage/evict").status_code == 404
+        with patch.object(settings, "admin_token", "secret"):
+            assert client.post("/api/v1/admin/storage/evict").status_code == 401
+            wrong = client.post("/api/v1/admin/storage/evict", headers={"Authorization": "Bearer wrong"})
+            assert wrong.status_code == 401
+            assert mock_run_once.await_count == 0
+            
+            headers = {"Authorization": "Bearer secret"}
+            assert client.get("/api/v1/admin/storage", headers=headers).json()["files"] == 1
+            assert client.post("/api/v1/admin/storage/evict", headers=headers).status_code == 200
+        assert mock_run_once.await_count == 1
@@ -0,0 +1,85 @@
+import sqlite3
+import pytest
+from app.services.archive import ARCHIVE_SCHEMA, ArticleArchive, article_text, build_match_query, segment_text
+
+
+class TestArticleArchive:
+    """文章归档测试类"""
+    
+    def make_archive(self, tmp_path):
+        return ArticleArchive(tmp_path / "articles.sqlite3")
+    
+    def test_segment_and_query(self):
+        """测试中文按二元分词，检索词中的FTS5语法字符被忽略"""
+        assert segment_text("公众号Python").split() == ["公众", "众号", "Python"]
+        assert build_match_query('公众号 "Python" OR 文') == '"公众 众号" "python" "or" "文" *'
+        assert build_match_query('"*()') is None
+    
+    def test_article_text_strips_markup(self):
+        """测试正文纯文本去掉图片地址、链接地址和标签"""
+        markdown = "# 标题\n\n![图](https://example.com/a.png) 见[链接](https://example.com)"
+        assert article_text(markdown=markdown) == "标题 图 见 链接"
+        assert article_text(html="<p>一&amp;二</p>") == "一&二"
+    
+    @pytest.mark.asyncio
+    async def test_search_ranks_title_matches_first(self, tmp_path):
+        """测试中文全文检索：标题命中排在正文命中之前，不相关的文章不返回"""
+        archive = self.make_archive(tmp_path)
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "每周杂谈", markdown="# 每周杂谈\n\n顺便聊聊公众号运营")
+        await archive.save("s/b", "https://mp.weixin.qq.com/s/b", "公众号运营指南", markdown="# 公众号运营指南\n\n正文")
+        await archive.save("s/c", "https://mp.weixin.qq.com/s/c", "菜谱", html="<p>红烧肉</p>")
+        
+        total, items = await archive.search("运营")
+        
+        assert total == 2
+        assert [item["url"] for item in items] == ["https://mp.weixin.qq.com/s/b", "https://mp.weixin.qq.com/s/a"]
+        assert "运营" in items[1]["snippet"]
+        assert (await archive.search("红烧"))[0] == 1
+        assert (await archive.search("营运"))[0] == 0
+    
+    @pytest.mark.asyncio
+    async def test_save_keeps_other_format(self, tmp_path):
+        """测试分别写入HTML和Markdown结果时互不覆盖，重新写入后索引随之更新"""
+        archive = self.make_archive(tmp_path)
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "旧标题", html="<p>旧内容</p>")
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "新标题", markdown="# 新标题\n\n新内容")
+        
+        article = await archive.get("s/a")
+        
+        assert article["title"] == "新标题"
+        assert article["html"] == "<p>旧内容</p>"
+        assert article["markdown"] == "# 新标题\n\n新内容"
+        assert (await archive.search("旧标题"))[0] == 0
+        assert (await archive.search("新内容"))[0] == 1
+        assert await archive.get("s/unknown") is None
+    
+    @pytest.mark.asyncio
+    async def test_fingerprint_recorded_per_format(self, tmp_path):
+        """测试内容指纹随对应格式的结果写入，只写入一种格式时不影响另一种的指纹"""
+        archive = self.make_archive(tmp_path)
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "标题", html="<p>正文</p>", fingerprint="f1")
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "标题", markdown="# 标题\n\n正文")
+        
+        article = await archive.get("s/a")
+        assert (article["html_fingerprint"], article["markdown_fingerprint"]) == ("f1", None)
+        
+        await archive.save("s/a", "https://mp.weixin.qq.com/s/a", "标题", markdown="# 标题\n\n新正文", fingerprint="f2")
+        article = await archive.get("s/a")
+        assert (article["html_fingerprint"], article["markdown_fingerprint"]) == ("f1", "f2")
+    
+    @pytest.mark.asyncio
+    async def test_existing_archive_migrated(self, tmp_path):
+        """测试旧版本的归档数据库打开时补充指纹列，已有文章保留"""
+        path = tmp_path / "articles.sqlite3"
+        conn = sqlite3.connect(path)
+        conn.executescript(ARCHIVE_SCHEMA)
+        conn.execute(
+            "INSERT INTO articles (key, url, title, html, fetched_at) VALUES ('s/a', 'https://mp.weixin.qq.com/s/a', '旧文章', '<p>旧</p>', 0)"
+        )
+        conn.commit()
+        conn.close()
+        
+        article = await ArticleArchive(path).get("s/a")
+        
+        assert article["html"] == "<p>旧</p>"
+        assert article["html_fingerprint"] is None
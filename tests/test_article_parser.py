@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import patch
+from app.services.article_parser import (
+    MarkdownSectionRenderer,
+    MetadataParser,
+    collect_image_sources,
+    extract_article,
+    render_markdown,
+    resolve_html_parser
+)
+
+PAGE = """
+<html>
+    <head><meta property="og:title" content="标题"></head>
+    <body>
+        <div id="js_content">
+            <h2>小节</h2>
+            <p>段落<img data-src="https://mmbiz.qpic.cn/a.png"></p>
+            <p><img src="https://mmbiz.qpic.cn/b.png"><img data-src="https://mmbiz.qpic.cn/a.png"></p>
+        </div>
+    </body>
+</html>
+"""
+
+
+class TestArticleParser:
+    """文章解析与转换测试类"""
+    
+    @pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+    def test_tree_conversion_matches_string_conversion(self, parser):
+        """测试直接转换节点树与转换序列化后的HTML结果一致"""
+        if resolve_html_parser(parser) != parser:
+            pytest.skip(f"{parser} 未安装")
+        _, content, _ = extract_article(PAGE, parser)
+        assert render_markdown(content) == render_markdown(str(content))
+    
+    def test_image_map_applied_without_mutating_tree(self):
+        """测试转换时替换图片地址，但不修改共享的节点树"""
+        _, content, _ = extract_article(PAGE)
+        before = str(content)
+        
+        markdown = render_markdown(content, {"https://mmbiz.qpic.cn/a.png": "/static/images/a.png"})
+        
+        assert markdown.count("](/static/images/a.png)") == 2
+        assert "](https://mmbiz.qpic.cn/b.png)" in markdown
+        assert str(content) == before
+    
+    @pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+    def test_section_rendering_matches_full_conversion(self, parser):
+        """测试逐段转换拼接后与整体转换结果完全一致"""
+        if resolve_html_parser(parser) != parser:
+            pytest.skip(f"{parser} 未安装")
+        _, content, _ = extract_article(PAGE, parser)
+        image_map = {"https://mmbiz.qpic.cn/a.png": "/static/images/a.png"}
+        renderer = MarkdownSectionRenderer(content, dict(image_map))
+        
+        assert [renderer.image_sources(i) for i in range(len(renderer))] == [
+            [], ["https://mmbiz.qpic.cn/a.png"], ["https://mmbiz.qpic.cn/b.png", "https://mmbiz.qpic.cn/a.png"]
+        ]
+        streamed = "".join(renderer.render(i) for i in range(len(renderer)))
+        assert streamed == render_markdown(content, image_map)
+    
+    def test_collect_image_sources_dedup_in_order(self):
+        """测试按文档顺序收集并去重图片地址"""
+        _, content, _ = extract_article(PAGE)
+        assert collect_image_sources(content) == [
+            "https://mmbiz.qpic.cn/a.png",
+            "https://mmbiz.qpic.cn/b.png"
+        ]
+    
+    def test_resolve_html_parser_fallback(self):
+        """测试 lxml 不可用时回退到 html.parser"""
+        with patch.dict("sys.modules", {"lxml": None}):
+            assert resolve_html_parser("lxml") == "html.parser"
+        assert resolve_html_parser("html.parser") == "html.parser"
+    
+    def test_metadata_parser_incremental(self):
+        """测试分块解析头部元数据：标签跨块时也能识别，头部结束后标记完成"""
+        page = (
+            '<html><head><title>页面 &amp; 标题</title>'
+            '<meta property="og:image" content="https://example.com/cover.jpg">'
+            '</head><body><p>正文</p></body></html>'
+        )
+        parser = MetadataParser()
+        for i in range(0, len(page), 7):
+            parser.feed(page[i:i + 7])
+            if parser.done:
+                break
+        
+        assert parser.done
+        assert i < page.index("正文")
+        assert parser.result() == {"title": "页面 & 标题", "cover": "https://example.com/cover.jpg", "description": None}
@@ -0,0 +1,36 @@
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.http_client import AsyncHTTPClient
+from app.services.image_store import ImageStore
+from app.services.wechat_service import AsyncWeChatService
+from benchmarks.fake_upstream import UpstreamRedirectTransport, create_app
+from benchmarks.fixtures import ARTICLE_SIZES
+from benchmarks.results import compare, percentile
+
+
+class TestFakeUpstream:
+    """基准测试用模拟上游测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_service_against_fake_upstream(self, tmp_path):
+        """测试服务经重定向传输层访问模拟上游，文章和图片均可正常获取"""
+        transport = UpstreamRedirectTransport("http://upstream", httpx.ASGITransport(app=create_app()))
+        service = AsyncWeChatService(client=AsyncHTTPClient(transport=transport), cache=None, archive=None)
+        service.image_store = ImageStore(tmp_path / "images", settings.base_image_url, tmp_path / "index.sqlite3")
+        
+        markdown = await service.get_article_markdown("https://mp.weixin.qq.com/s/small-1")
+        
+        assert markdown.startswith("# 基准测试文章标题")
+        assert markdown.count(settings.base_image_url) == ARTICLE_SIZES["small"][1]
+        assert "mmbiz.qpic.cn" not in markdown
+    
+    def test_compare_detects_regression(self):
+        """测试结果对比：延迟升高和吞吐下降超过阈值时判定为退化"""
+        def document(rps, p95):
+            return {"results": [{"name": "markdown[medium]", "metrics": {"rps": rps, "p95_ms": p95, "requests": 100}}]}
+        
+        assert compare(document(100, 50), document(95, 52), 0.1) == []
+        regressions = compare(document(100, 50), document(80, 70), 0.1)
+        assert {r["metric"] for r in regressions} == {"rps", "p95_ms"}
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
@@ -0,0 +1,71 @@
+import pytest
+from app.services.cache import DiskCache, MemoryCache
+from app.utils.url import normalize_article_url
+
+
+class TestMemoryCache:
+    """进程内缓存测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_hit_and_miss_counters(self):
+        """测试命中/未命中统计"""
+        cache = MemoryCache(ttl=60, max_entries=10, max_bytes=1024)
+        assert await cache.get("k") is None
+        await cache.set("k", {"title": "标题"})
+        assert await cache.get("k") == {"title": "标题"}
+        
+        stats = await cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+    
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        """测试过期条目不再返回"""
+        cache = MemoryCache(ttl=60, max_entries=10, max_bytes=1024)
+        await cache.set("k", "v", ttl=0)
+        assert await cache.get("k") is None
+    
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """测试超出条目数时淘汰最近最少使用的条目"""
+        cache = MemoryCache(ttl=60, max_entries=2, max_bytes=1024)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")
+        await cache.set("c", "3")
+        
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1"
+        assert await cache.get("c") == "3"
+
+
+class TestDiskCache:
+    """磁盘缓存测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_persists_across_instances(self, tmp_path):
+        """测试缓存在新实例（模拟重启/其他worker）中仍可读取"""
+        path = tmp_path / "cache.sqlite3"
+        await DiskCache(str(path), ttl=60, max_entries=10, max_bytes=1024).set("k", "# 标题")
+        
+        cache = DiskCache(str(path), ttl=60, max_entries=10, max_bytes=1024)
+        assert await cache.get("k") == "# 标题"
+    
+    @pytest.mark.asyncio
+    async def test_size_bounded_eviction(self, tmp_path):
+        """测试超出字节上限时按访问时间淘汰"""
+        cache = DiskCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10, max_bytes=25)
+        await cache.set("a", "x" * 10)
+        await cache.set("b", "y" * 10)
+        await cache.set("c", "z" * 10)
+        
+        assert await cache.get("a") is None
+        assert await cache.size() == (2, 24)
+
+
+def test_normalize_article_url():
+    """测试URL规范化去除跟踪参数并排序查询参数"""
+    a = normalize_article_url("https://MP.weixin.qq.com/s?mid=1&__biz=abc&scene=21#wechat_redirect")
+    b = normalize_article_url("https://mp.weixin.qq.com/s?__biz=abc&mid=1&chksm=xyz")
+    assert a == b == "https://mp.weixin.qq.com/s?__biz=abc&mid=1"
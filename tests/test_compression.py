@@ -0,0 +1,174 @@
+import gzip
+import zlib
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.utils.compression import CompressionMiddleware, negotiate_encoding
+from app.utils.static_files import IMMUTABLE_CACHE_CONTROL, ImageStaticFiles
+
+
+@pytest.fixture
+def compressed_app():
+    """包装了压缩中间件的测试应用"""
+    app = FastAPI()
+    
+    @app.get("/markdown")
+    async def markdown():
+        return JSONResponse("# 标题\n\n" + "正文内容" * 200, headers={"ETag": '"abc"'})
+    
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("短文本")
+    
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 100, media_type="image/png")
+    
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(3):
+                yield f'{{"index": {i}}}\n'
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    return CompressionMiddleware(app, minimum_size=100)
+
+
+class TestCompressionMiddleware:
+    """响应压缩中间件测试类"""
+    
+    def test_negotiate_encoding(self):
+        """测试按 q 值选择编码，拒绝或缺失时不压缩"""
+        assert negotiate_encoding("gzip, deflate") == "gzip"
+        assert negotiate_encoding("gzip;q=0") is None
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("") is None
+        assert negotiate_encoding("*") in ("br", "gzip")
+    
+    def test_large_text_response_gzipped(self, compressed_app):
+        """测试大文本响应被压缩，ETag 变为弱 ETag"""
+        client = TestClient(compressed_app)
+        response = client.get("/markdown", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"abc"'
+        assert response.json().startswith("# 标题")
+        assert int(response.headers["content-length"]) < len(response.content)
+    
+    def test_compressed_body_reused_by_etag(self, compressed_app):
+        """测试相同 ETag 的响应复用已压缩的内容"""
+        client = TestClient(compressed_app)
+        first = client.get("/markdown", headers={"Accept-Encoding": "gzip"})
+        assert compressed_app.cache.get('"abc"', "gzip") is not None
+        second = client.get("/markdown", headers={"Accept-Encoding": "gzip"})
+        assert first.content == second.content
+    
+    def test_small_image_and_identity_not_compressed(self, compressed_app):
+        """测试过小、图片和不接受压缩的请求原样返回"""
+        client = TestClient(compressed_app)
+        assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/markdown", headers={"Accept-Encoding": "identity"}).headers
+    
+    def test_streaming_response_compressed_incrementally(self, compressed_app):
+        """测试流式响应逐块压缩，解压后内容完整"""
+        client = TestClient(compressed_app)
+        with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert gzip.decompress(raw).decode().splitlines() == ['{"index": 0}', '{"index": 1}', '{"index": 2}']
+        # 第一块数据可单独解压，客户端无需等待整个响应
+        first_chunk = raw[:len(raw) // 2]
+        assert zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(first_chunk).startswith(b'{"index": 0}')
+
+
+class TestImageStaticFiles:
+    """静态图片服务测试类"""
+    
+    def make_client(self, tmp_path, **kwargs):
+        digest = "ab" * 32
+        image_dir = tmp_path / "images" / "ab" / "ab"
+        image_dir.mkdir(parents=True)
+        (image_dir / f"{digest}.png").write_bytes(b"\x89PNG")
+        (tmp_path / "images" / "legacy.jpg").write_bytes(b"\xff\xd8\xff")
+        app = FastAPI()
+        app.mount("/static", ImageStaticFiles(directory=tmp_path, **kwargs))
+        return TestClient(app), f"/static/images/ab/ab/{digest}.png"
+    
+    def test_content_addressed_images_immutable(self, tmp_path):
+        """测试内容寻址的图片带长期不可变缓存头，其他文件保持默认"""
+        client, path = self.make_client(tmp_path)
+        
+        response = client.get(path)
+        assert response.content == b"\x89PNG"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert "cache-control" not in client.get("/static/images/legacy.jpg").headers
+    
+    def test_accel_redirect(self, tmp_path):
+        """测试配置内部路径后由反向代理发送文件"""
+        client, path = self.make_client(tmp_path, accel_redirect="/internal/static/")
+        
+        response = client.get(path)
+        assert response.content == b""
+        assert response.headers["x-accel-redirect"] == "/internal/static/" + path.removeprefix("/static/")
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    
+    def test_lazy_image_loaded_on_first_access(self, tmp_path):
+        """测试延迟下载的图片由加载函数下载后返回，未登记的标识返回 404"""
+        requested = []
+        
+        async def loader(key):
+            requested.append(key)
+            if key != "cd" * 32:
+                return None
+            return tmp_path / "images" / "ab" / "ab" / f"{'ab' * 32}.png"
+        
+        client, _ = self.make_client(tmp_path, lazy_loader=loader)
+        
+        response = client.get(f"/static/images/lazy/{'cd' * 32}")
+        assert response.content == b"\x89PNG"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert client.get(f"/static/images/lazy/{'ef' * 32}").status_code == 404
+        assert requested == ["cd" * 32, "ef" * 32]
+    
+    def test_variant_selected_by_accept(self, tmp_path):
+        """测试按 Accept 头返回已生成的 WebP 版本，并声明 Vary: Accept"""
+        client, path = self.make_client(tmp_path, variants=["avif", "webp"])
+        variant = tmp_path / path.removeprefix("/static/")
+        variant.with_name(variant.name + ".webp").write_bytes(b"RIFF-webp")
+        
+        response = client.get(path, headers={"Accept": "image/avif;q=0,image/webp,*/*"})
+        assert response.content == b"RIFF-webp"
+        assert response.headers["content-type"] == "image/webp"
+        assert "Accept" in response.headers["vary"]
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        
+        response = client.get(path, headers={"Accept": "*/*"})
+        assert response.content == b"\x89PNG"
+        assert "Accept" in response.headers["vary"]
+    
+    def test_evicted_image_restored_on_access(self, tmp_path):
+        """测试被淘汰的内容寻址图片在访问时重新下载，访问记录以存储路径回调"""
+        restored, accessed = [], []
+        digest = "cd" * 32
+        
+        async def restore(relative_path):
+            restored.append(relative_path)
+            target = tmp_path / "images" / relative_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(b"\x89PNG-restored")
+            return target
+        
+        client, path = self.make_client(tmp_path, restore_loader=restore, on_access=accessed.append)
+        
+        assert client.get(path).status_code == 200
+        response = client.get(f"/static/images/cd/cd/{digest}.png")
+        assert response.content == b"\x89PNG-restored"
+        assert restored == [f"cd/cd/{digest}.png"]
+        assert accessed == [f"ab/ab/{'ab' * 32}.png", f"cd/cd/{digest}.png"]
+        assert client.get("/static/images/missing.png").status_code == 404
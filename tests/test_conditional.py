@@ -0,0 +1,38 @@
+from app.utils.conditional import (
+    compute_etag,
+    conditional_request_headers,
+    format_http_date,
+    is_not_modified,
+    validators_from_headers
+)
+
+
+class TestConditional:
+    """条件请求工具测试类"""
+    
+    def test_etag_stable_for_same_content(self):
+        """测试字典键顺序不影响ETag"""
+        assert compute_etag({"a": 1, "b": "中文"}) == compute_etag({"b": "中文", "a": 1})
+        assert compute_etag("# 标题") != compute_etag("# 标题2")
+    
+    def test_if_none_match_takes_precedence(self):
+        """测试同时携带两个条件头时以 If-None-Match 为准"""
+        headers = {"if-none-match": '"other"', "if-modified-since": format_http_date(2000)}
+        assert not is_not_modified(headers, '"abc"', 1000)
+        assert is_not_modified({"if-none-match": '"x", W/"abc"'}, '"abc"', 1000)
+        assert is_not_modified({"if-none-match": "*"}, '"abc"', 1000)
+    
+    def test_if_modified_since(self):
+        """测试 Last-Modified 按秒比较，无效日期不返回 304"""
+        assert is_not_modified({"if-modified-since": format_http_date(1000)}, '"abc"', 1000.5)
+        assert not is_not_modified({"if-modified-since": format_http_date(999)}, '"abc"', 1000)
+        assert not is_not_modified({"if-modified-since": "invalid"}, '"abc"', 1000)
+        assert not is_not_modified({}, '"abc"', 1000)
+    
+    def test_upstream_validators_round_trip(self):
+        """测试上游验证头转换为条件请求头"""
+        validators = validators_from_headers({"etag": '"v1"', "last-modified": "Tue, 14 Nov 2023 22:13:20 GMT"})
+        assert conditional_request_headers(validators) == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Tue, 14 Nov 2023 22:13:20 GMT"
+        }
@@ -0,0 +1,57 @@
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.executor import CPUExecutor
+from app.core.http_client import AsyncHTTPClient
+from app.services.image_store import ImageStore
+from app.services.wechat_service import AsyncWeChatService
+
+PAGE = """
+<html>
+    <head><meta property="og:title" content="执行器测试"></head>
+    <body>
+        <div id="js_content"><h2>小节</h2><p>正文<img data-src="https://mmbiz.qpic.cn/a.png"></p></div>
+    </body>
+</html>
+"""
+
+
+def handler(request):
+    if request.url.host == "mmbiz.qpic.cn":
+        return httpx.Response(200, content=b"png", headers={"content-type": "image/png"})
+    return httpx.Response(200, text=PAGE)
+
+
+class TestCPUExecutor:
+    """CPU执行器测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_inline_when_not_started(self):
+        """测试未启动时在当前线程直接执行"""
+        executor = CPUExecutor()
+        assert executor.kind == "inline"
+        assert await executor.run(sum, [1, 2, 3]) == 6
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+    async def test_markdown_pipeline_same_result_for_every_kind(self, kind, tmp_path):
+        """测试各执行器模式下Markdown转换结果一致"""
+        executor = CPUExecutor()
+        executor.start(kind, workers=1)
+        try:
+            service = AsyncWeChatService(
+                client=AsyncHTTPClient(transport=httpx.MockTransport(handler)),
+                executor=executor,
+                archive=None
+            )
+            service.image_store = ImageStore(tmp_path / "images", settings.base_image_url, tmp_path / "index.sqlite3")
+            
+            markdown = await service.get_article_markdown("https://mp.weixin.qq.com/s/example")
+            title, content, _ = await service.fetch_article_html("https://mp.weixin.qq.com/s/other")
+        finally:
+            executor.shutdown()
+        
+        assert markdown.startswith("# 执行器测试\n\n## 小节")
+        assert f"]({settings.base_image_url}" in markdown
+        assert title == "执行器测试"
+        assert content.startswith('<div id="js_content">')
@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+import pytest
+from app.core.exceptions import ImageDownloadException
+from app.services.image_store import ImageStore, guess_extension
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+class TestImageStore:
+    """内容寻址图片存储测试类"""
+    
+    def setup_method(self):
+        """每个测试方法前的设置"""
+        self.base_url = "https://example.com/static/images/"
+    
+    def make_store(self, tmp_path):
+        return ImageStore(tmp_path / "images", self.base_url, tmp_path / "index.sqlite3")
+    
+    def test_identical_content_stored_once(self, tmp_path):
+        """测试不同源地址的相同内容只存储一份"""
+        store = self.make_store(tmp_path)
+        url_a = store.save_bytes("https://mmbiz.qpic.cn/a.png?tp=webp", PNG)
+        url_b = store.save_bytes("https://mmbiz.qpic.cn/a.png?tp=jpg", PNG)
+        
+        assert url_a == url_b
+        files = [p for p in (tmp_path / "images").rglob("*.png")]
+        assert len(files) == 1
+        assert files[0].read_bytes() == PNG
+    
+    def test_sharded_path(self, tmp_path):
+        """测试按摘要前缀分级存放"""
+        store = self.make_store(tmp_path)
+        url = store.save_bytes("https://mmbiz.qpic.cn/a", PNG)
+        
+        relative = url[len(self.base_url):]
+        digest = relative.rsplit("/", 1)[-1][:-4]
+        assert relative == f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+        assert (tmp_path / "images" / relative).exists()
+    
+    def test_lookup_uses_index(self, tmp_path):
+        """测试已存储的源地址可通过索引直接命中并回调访问记录（不写索引），未知地址返回None"""
+        store = self.make_store(tmp_path)
+        url = store.save_bytes("https://mmbiz.qpic.cn/a", PNG)
+        
+        accessed = []
+        reopened = ImageStore(tmp_path / "images", self.base_url, tmp_path / "index.sqlite3", on_access=accessed.append)
+        before = reopened.index.fetchone("SELECT accessed_at FROM image_files")
+        assert reopened.lookup("https://mmbiz.qpic.cn/a") == url
+        assert reopened.lookup("https://mmbiz.qpic.cn/unknown") is None
+        assert accessed == [url.removeprefix(self.base_url)]
+        assert reopened.index.fetchone("SELECT accessed_at FROM image_files") == before
+    
+    def test_failed_write_leaves_no_file(self, tmp_path, monkeypatch):
+        """测试写入中途失败时不会留下残缺文件或索引"""
+        store = self.make_store(tmp_path)
+        
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+        
+        monkeypatch.setattr("app.services.image_store.os.replace", fail)
+        with pytest.raises(OSError):
+            store.save_bytes("https://mmbiz.qpic.cn/a", PNG)
+        
+        assert not [p for p in (tmp_path / "images").rglob("*") if p.is_file()]
+        assert store.lookup("https://mmbiz.qpic.cn/a") is None
+    
+    def test_writer_enforces_max_bytes(self, tmp_path):
+        """测试流式写入超过大小上限时抛出异常，放弃后不留临时文件"""
+        store = self.make_store(tmp_path)
+        writer = store.open_writer(max_bytes=40)
+        writer.write(PNG)
+        with pytest.raises(ImageDownloadException):
+            writer.write(b"\x00" * 10)
+        writer.abort()
+        
+        assert not [p for p in (tmp_path / "images").rglob("*") if p.is_file()]
+    
+    def test_evict_least_recently_accessed(self, tmp_path):
+        """测试超出预算时淘汰最久未访问的文件，淘汰后不再视为已存储，但保留源地址"""
+        store = self.make_store(tmp_path)
+        urls = [store.save_bytes(f"https://mmbiz.qpic.cn/{i}.png", PNG + bytes([i])) for i in range(4)]
+        paths = [url.removeprefix(self.base_url) for url in urls]
+        store.touch({paths[0]: 2e9, paths[1]: 2e9 + 1})
+        store.lookup("https://mmbiz.qpic.cn/2.png")
+        
+        assert store.evict(max_files=3, target_ratio=0.75) == (2, 2 * len(PNG + b"x"))
+        
+        assert store.usage() == (2, 2 * len(PNG + b"x"))
+        assert not (tmp_path / "images" / paths[2]).exists()
+        assert not (tmp_path / "images" / paths[3]).exists()
+        assert (tmp_path / "images" / paths[0]).exists()
+        assert store.lookup("https://mmbiz.qpic.cn/3.png") is None
+        assert store.source_for_path(paths[3]) == "https://mmbiz.qpic.cn/3.png"
+        assert store.evict(max_files=3) == (0, 0)
+    
+    def test_commit_during_eviction_keeps_file(self, tmp_path, monkeypatch):
+        """测试淘汰正在删除文件时提交相同内容，提交等待淘汰结束后重新写入，索引与文件一致"""
+        store = self.make_store(tmp_path)
+        url = store.save_bytes("https://mmbiz.qpic.cn/a.png", PNG)
+        store.save_bytes("https://mmbiz.qpic.cn/c.png", PNG + b"c")
+        path = url.removeprefix(self.base_url)
+        removing = threading.Event()
+        proceed = threading.Event()
+        remove_file = store.remove_file
+        
+        def slow_remove(relative_path):
+            removing.set()
+            proceed.wait(5)
+            remove_file(relative_path)
+        
+        monkeypatch.setattr(store, "remove_file", slow_remove)
+        evicting = threading.Thread(target=store.evict, kwargs={"max_files": 1, "target_ratio": 0})
+        evicting.start()
+        assert removing.wait(5)
+        committing = threading.Thread(target=store.save_bytes, args=("https://mmbiz.qpic.cn/b.png", PNG))
+        committing.start()
+        committing.join(0.2)
+        proceed.set()
+        evicting.join()
+        committing.join()
+        
+        assert (tmp_path / "images" / path).exists()
+        assert store.lookup("https://mmbiz.qpic.cn/b.png") == url
+    
+    def test_backfill_file_index(self, tmp_path):
+        """测试旧版索引中已下载的图片迁移到文件索引，只迁移一次，淘汰后不会被新连接恢复"""
+        index_path = tmp_path / "index.sqlite3"
+        with sqlite3.connect(index_path) as conn:
+            conn.execute(
+                "CREATE TABLE images (source_url TEXT PRIMARY KEY, digest TEXT NOT NULL, "
+                "path TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("INSERT INTO images VALUES ('https://mmbiz.qpic.cn/a', 'd', 'ab/cd/d.png', 40, 1.0)")
+        
+        assert self.make_store(tmp_path).usage() == (1, 40)
+        self.make_store(tmp_path).evict(max_files=0, max_bytes=1)
+        assert self.make_store(tmp_path).usage() == (0, 0)
+
+
+@pytest.mark.parametrize("head, content_type, src, expected", [
+    (PNG, None, "https://mmbiz.qpic.cn/x", ".png"),
+    (b"\xff\xd8\xff\xe0", "image/png", "", ".jpg"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", None, "", ".webp"),
+    (b"unknown", "image/gif", "", ".gif"),
+    (b"unknown", None, "https://mmbiz.qpic.cn/mmbiz_png/x/640?wx_fmt=jpeg", ".jpg"),
+    (b"unknown", None, "https://example.com/a.bmp", ".bmp"),
+    (b"unknown", "image/svg+xml", "https://example.com/a.svg", ".jpg"),
+    (b"unknown", "image/x-evil", "https://mmbiz.qpic.cn/x?wx_fmt=png/../../../../../pwned.txt", ".jpg"),
+    (b"unknown", None, "https://example.com/a.html", ".jpg"),
+])
+def test_guess_extension(head, content_type, src, expected):
+    """测试图片扩展名推断"""
+    assert guess_extension(head, content_type, src) == expected
+
+
+class TestImageOptimizer:
+    """图片优化测试类"""
+    
+    def test_create_webp_variant(self, tmp_path):
+        """测试生成缩小后的 WebP 版本，原图保留"""
+        Image = pytest.importorskip("PIL.Image")
+        from app.services.image_optimizer import create_variants, supported_formats, variant_path
+        if "webp" not in supported_formats():
+            pytest.skip("Pillow 未编译 WebP 支持")
+        
+        path = tmp_path / "image.png"
+        Image.new("RGB", (800, 400), (200, 30, 30)).save(path, format="PNG", compress_level=0)
+        
+        variants = create_variants(path, ["webp"], quality=80, max_dimension=200)
+        
+        assert set(variants) == {"webp"}
+        with Image.open(variant_path(path, "webp")) as img:
+            assert img.format == "WEBP"
+            assert img.size == (200, 100)
+        assert path.exists()
+    
+    def test_unsupported_source_skipped(self, tmp_path):
+        """测试矢量图等不可转码的格式不生成版本"""
+        from app.services.image_optimizer import create_variants
+        path = tmp_path / "image.svg"
+        path.write_text("<svg/>")
+        assert create_variants(path, ["webp"], quality=80) == {}
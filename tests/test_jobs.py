@@ -0,0 +1,170 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.core.exceptions import NetworkRequestException
+from app.services.cache import ArticleEntry
+from app.services.jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobQueue, JobStore
+from app.services.wechat_service import AsyncWeChatService
+
+URL = "https://mp.weixin.qq.com/s/example"
+CALLBACK_URL = "https://93.184.216.34/webhook"
+
+
+class FakeService(AsyncWeChatService):
+    """只返回固定结果的文章服务"""
+    
+    def __init__(self, error=None):
+        super().__init__()
+        self.error = error
+        self.calls = 0
+    
+    async def get_article(self, url, fmt):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return ArticleEntry(body=f"# {url}", etag='"e"', last_modified=0, fresh_until=0)
+
+
+class TestJobStore:
+    """持久化任务队列测试类"""
+    
+    def test_jobs_survive_restart(self, tmp_path):
+        """测试排队中的任务在重新打开数据库后仍可领取"""
+        job = JobStore(tmp_path / "jobs.sqlite3").submit(URL, "markdown")
+        
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        claimed = store.claim(lease=60, max_attempts=3)
+        assert claimed["id"] == job["id"]
+        assert claimed["status"] == JOB_RUNNING
+        assert store.claim(lease=60, max_attempts=3) is None
+    
+    def test_expired_lease_reclaimed_until_max_attempts(self, tmp_path):
+        """测试租约过期（进程崩溃）的任务被重新领取，超过重试次数后标记失败"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        job = store.submit(URL, "markdown")
+        
+        assert store.claim(lease=-1, max_attempts=2)["attempts"] == 1
+        assert store.claim(lease=-1, max_attempts=2)["attempts"] == 2
+        assert store.claim(lease=-1, max_attempts=2) is None
+        assert store.get(job["id"])["status"] == JOB_FAILED
+    
+    def test_release_returns_job_to_queue(self, tmp_path):
+        """测试关闭时中断的任务放回队列且不计入执行次数"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        job = store.submit(URL, "html")
+        store.claim(lease=60, max_attempts=3)
+        store.release(job["id"])
+        
+        job = store.get(job["id"])
+        assert job["status"] == JOB_QUEUED
+        assert job["attempts"] == 0
+
+
+class TestJobQueue:
+    """后台任务执行测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_worker_runs_submitted_job(self, tmp_path):
+        """测试提交后由工作协程执行并保存结果"""
+        service = FakeService()
+        queue = JobQueue(store=JobStore(tmp_path / "jobs.sqlite3"), service=service)
+        queue.start(workers=1)
+        try:
+            job = await queue.submit(URL, "markdown")
+            assert job["status"] == JOB_QUEUED
+            for _ in range(100):
+                job = await queue.get(job["id"])
+                if job["status"] == JOB_SUCCEEDED:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        
+        assert job["status"] == JOB_SUCCEEDED
+        assert job["status_code"] == 200
+        assert job["data"] == f"# {URL}"
+        assert service.calls == 1
+    
+    @pytest.mark.asyncio
+    async def test_failed_job_posts_callback(self, tmp_path):
+        """测试任务失败时记录错误并回调通知"""
+        received = []
+        
+        def handler(request):
+            received.append(json.loads(request.content))
+            return httpx.Response(204)
+        
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        queue = JobQueue(
+            store=store,
+            service=FakeService(error=NetworkRequestException("网络请求失败: timeout")),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        store.submit(URL, "markdown", CALLBACK_URL)
+        
+        job = await queue.run_job(store.claim(lease=60, max_attempts=3))
+        
+        assert job["status"] == JOB_FAILED
+        assert job["status_code"] == 502
+        assert received[0]["id"] == job["id"]
+        assert received[0]["status"] == JOB_FAILED
+        assert "timeout" in received[0]["error"]
+    
+    @pytest.mark.asyncio
+    async def test_submit_rejects_invalid_url(self, tmp_path):
+        """测试无效URL不进入队列"""
+        from app.core.exceptions import InvalidURLException
+        queue = JobQueue(store=JobStore(tmp_path / "jobs.sqlite3"), service=FakeService())
+        with pytest.raises(InvalidURLException):
+            await queue.submit("https://example.com/article", "markdown")
+    
+    @pytest.mark.asyncio
+    async def test_internal_callback_rejected(self, tmp_path):
+        """测试回调地址为回环、内网或元数据地址时拒绝提交；提交后地址变为不允许时不发送回调"""
+        from app.core.exceptions import InvalidURLException
+        received = []
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        queue = JobQueue(
+            store=store,
+            service=FakeService(),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(lambda request: received.append(request)))
+        )
+        for callback_url in (
+            "http://127.0.0.1:8000/hook",
+            "http://169.254.169.254/latest/meta-data",
+            "http://10.0.0.5/hook",
+            "http://[::1]/hook",
+            "file:///etc/passwd"
+        ):
+            with pytest.raises(InvalidURLException):
+                await queue.submit(URL, "markdown", callback_url)
+        
+        store.submit(URL, "markdown", "http://192.168.1.1/hook")
+        job = await queue.run_job(store.claim(lease=60, max_attempts=3))
+        
+        assert job["status"] == JOB_SUCCEEDED
+        assert received == []
+
+
+class TestJobAPI:
+    """后台任务接口测试类"""
+    
+    def test_submit_and_poll(self, client: TestClient, tmp_path):
+        """测试提交返回202和任务地址，查询返回任务状态"""
+        queue = JobQueue(store=JobStore(tmp_path / "jobs.sqlite3"), service=FakeService())
+        with patch("app.api.v1.endpoints.jobs.job_queue", queue):
+            response = client.post("/api/v1/wechat/jobs", json={"url": URL})
+            assert response.status_code == 202
+            job = response.json()
+            assert job["status"] == JOB_QUEUED
+            assert response.headers["location"].endswith(f"/api/v1/wechat/jobs/{job['id']}")
+            
+            response = client.get(f"/api/v1/wechat/jobs/{job['id']}")
+            assert response.status_code == 200
+            assert response.json()["id"] == job["id"]
+            
+            assert client.get("/api/v1/wechat/jobs/missing").status_code == 404
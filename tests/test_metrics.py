@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """指标注册表测试类"""
+    
+    def test_render_prometheus_text_format(self):
+        """测试计数器、仪表和直方图的文本输出格式"""
+        registry = MetricsRegistry()
+        counter = registry.counter("test_requests_total", "请求数", ["status"])
+        gauge = registry.gauge("test_in_flight", "进行中")
+        histogram = registry.histogram("test_duration_seconds", "耗时", buckets=[0.1, 1])
+        
+        counter.inc(status="200")
+        counter.inc(2, status="200")
+        gauge.inc()
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        
+        text = registry.render()
+        assert "# TYPE test_requests_total counter" in text
+        assert 'test_requests_total{status="200"} 3' in text
+        assert "test_in_flight 1" in text
+        assert 'test_duration_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_duration_seconds_bucket{le="1"} 2' in text
+        assert 'test_duration_seconds_bucket{le="+Inf"} 3' in text
+        assert "test_duration_seconds_count 3" in text
+        assert "test_duration_seconds_sum 5.55" in text
+    
+    def test_label_mismatch_rejected(self):
+        """测试标签不匹配时报错"""
+        counter = MetricsRegistry().counter("test_total", "计数", ["status"])
+        with pytest.raises(ValueError):
+            counter.inc(code="200")
+
+
+class TestMetricsEndpoint:
+    """指标接口测试类"""
+    
+    def test_request_latency_recorded_by_route(self, client: TestClient):
+        """测试接口耗时按路由模板记录"""
+        client.get("/api/v1/wechat", params={"url": "https://example.com/article"})
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'myapi_http_request_duration_seconds_count{method="GET",route="/api/v1/wechat",status="400"}' in response.text
+        assert "myapi_http_requests_in_flight" in response.text
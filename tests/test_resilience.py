@@ -0,0 +1,131 @@
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.exceptions import UpstreamUnavailableException
+from app.core.http_client import AsyncHTTPClient
+from app.core.resilience import CircuitBreaker, CircuitOpenError, TokenBucket, retry_delay
+from app.services.wechat_service import AsyncWeChatService
+from app.utils.metrics import UPSTREAM_RETRIES
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """重试不等待，加快测试"""
+    monkeypatch.setattr(settings, "upstream_retry_backoff", 0)
+
+
+class TestTokenBucket:
+    """令牌桶测试类"""
+    
+    def test_burst_then_rate(self):
+        """测试突发额度用完后按速率排队等待"""
+        bucket = TokenBucket(rate=10, burst=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+        assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+class TestCircuitBreaker:
+    """熔断器测试类"""
+    
+    def test_opens_after_threshold_and_half_opens(self, monkeypatch):
+        """测试连续失败后熔断，期满后只放行一个试探请求"""
+        now = [100.0]
+        monkeypatch.setattr("app.core.resilience.time.monotonic", lambda: now[0])
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+        assert breaker.retry_after == 30
+        
+        now[0] += 30
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.allow()
+        assert not breaker.is_open
+    
+    def test_retry_delay_honors_retry_after(self):
+        """测试退避时间遵循 Retry-After 且不超过上限"""
+        assert retry_delay(0, 0.5, 10, httpx.Response(429, headers={"Retry-After": "3"})) == 3
+        assert retry_delay(0, 0.5, 10, httpx.Response(503, headers={"Retry-After": "60"})) == 10
+        assert 0 <= retry_delay(3, 0.5, 10) <= 4
+
+
+class TestResilientClient:
+    """上游访问保护测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_get_retried_on_retryable_status(self, no_backoff):
+        """测试幂等请求遇到 503 后重试成功"""
+        responses = iter([httpx.Response(503), httpx.Response(200, text="ok")])
+        client = AsyncHTTPClient(transport=httpx.MockTransport(lambda request: next(responses)))
+        before = UPSTREAM_RETRIES.value(host="retry.example.com")
+        
+        response = await client.get("https://retry.example.com/")
+        
+        assert response.status_code == 200
+        assert UPSTREAM_RETRIES.value(host="retry.example.com") == before + 1
+    
+    @pytest.mark.asyncio
+    async def test_post_not_retried(self, no_backoff):
+        """测试非幂等请求不重试"""
+        calls = 0
+        
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return httpx.Response(503)
+        
+        client = AsyncHTTPClient(transport=httpx.MockTransport(handler))
+        response = await client.post("https://post.example.com/hook")
+        
+        assert response.status_code == 503
+        assert calls == 1
+    
+    @pytest.mark.asyncio
+    async def test_stream_retried_on_connect_error(self, no_backoff):
+        """测试流式请求在拿到响应前的网络错误会重试"""
+        calls = 0
+        
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise httpx.ConnectError("refused")
+            return httpx.Response(200, content=b"image")
+        
+        client = AsyncHTTPClient(transport=httpx.MockTransport(handler))
+        async with client.stream("GET", "https://stream.example.com/a.png") as response:
+            assert await response.aread() == b"image"
+        assert calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_circuit_fails_fast(self, no_backoff, monkeypatch, tmp_path):
+        """测试主机连续失败后熔断，后续请求不再访问上游并返回 503"""
+        monkeypatch.setattr(settings, "upstream_retries", 0)
+        monkeypatch.setattr(settings, "circuit_failure_threshold", 2)
+        calls = 0
+        
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            raise httpx.ConnectError("refused")
+        
+        client = AsyncHTTPClient(transport=httpx.MockTransport(handler))
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await client.get("https://mp.weixin.qq.com/s/a")
+        with pytest.raises(CircuitOpenError):
+            await client.get("https://mp.weixin.qq.com/s/b")
+        assert calls == 2
+        
+        service = AsyncWeChatService(client=client, archive=None)
+        with pytest.raises(UpstreamUnavailableException) as exc_info:
+            await service.fetch_page("https://mp.weixin.qq.com/s/c")
+        assert exc_info.value.status_code == 503
+        assert int(exc_info.value.headers["Retry-After"]) > 0
+        assert calls == 2
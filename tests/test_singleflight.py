@@ -0,0 +1,159 @@
+import asyncio
+import time
+import pytest
+from app.utils.singleflight import SharedFlight, SingleFlight
+
+
+class TestSingleFlight:
+    """并发调用合并测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """测试同一键的并发调用只执行一次"""
+        flights = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+        
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(10)))
+        
+        assert results == ["result"] * 10
+        assert calls == 1
+        assert len(flights) == 0
+    
+    @pytest.mark.asyncio
+    async def test_exception_shared_and_key_released(self):
+        """测试异常传递给所有调用者，且失败后可重新发起"""
+        flights = SingleFlight()
+        
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+        
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        
+        async def ok():
+            return 1
+        
+        assert await flights.do("k", ok) == 1
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """测试单个调用者取消不影响其他等待者"""
+        flights = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+        
+        first = asyncio.create_task(flights.do("k", work))
+        second = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        
+        assert await second == "done"
+    
+    @pytest.mark.asyncio
+    async def test_last_waiter_cancel_cancels_execution(self):
+        """测试所有等待者都取消时执行随之取消，之后的调用重新执行"""
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+        
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        waiters = [asyncio.create_task(flights.do("k", work)) for _ in range(2)]
+        await started.wait()
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+        
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert cancelled.is_set()
+        assert len(flights) == 0
+        
+        async def ok():
+            return 1
+        
+        assert await flights.do("k", ok) == 1
+
+
+class TestSharedFlight:
+    """跨进程调用合并测试类（同一数据库文件的两个实例模拟两个 worker 进程）"""
+    
+    @pytest.mark.asyncio
+    async def test_follower_uses_leader_result(self, tmp_path):
+        """测试其他进程正在执行时只等待其结果，不重复执行"""
+        leader = SharedFlight(tmp_path / "shared.sqlite3", lease=5, poll_interval=0.01)
+        follower = SharedFlight(tmp_path / "shared.sqlite3", lease=5, poll_interval=0.01)
+        store = {}
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            store["k"] = "result"
+            return "result"
+        
+        async def lookup():
+            return store.get("k")
+        
+        first = asyncio.create_task(leader.do("k", work, lookup))
+        await asyncio.sleep(0.01)
+        second = await follower.do("k", work, lookup)
+        
+        assert await first == second == "result"
+        assert calls == 1
+    
+    @pytest.mark.asyncio
+    async def test_takeover_after_leader_failure(self, tmp_path):
+        """测试执行者失败且没有结果时，由等待者接手执行"""
+        leader = SharedFlight(tmp_path / "shared.sqlite3", lease=5, poll_interval=0.01)
+        follower = SharedFlight(tmp_path / "shared.sqlite3", lease=5, poll_interval=0.01)
+        
+        async def fail():
+            await asyncio.sleep(0.03)
+            raise ValueError("boom")
+        
+        async def ok():
+            return "recovered"
+        
+        async def lookup():
+            return None
+        
+        first = asyncio.create_task(leader.do("k", fail, lookup))
+        await asyncio.sleep(0.01)
+        
+        assert await follower.do("k", ok, lookup) == "recovered"
+        with pytest.raises(ValueError):
+            await first
+    
+    @pytest.mark.asyncio
+    async def test_takeover_after_lease_expired(self, tmp_path):
+        """测试执行者进程退出未释放租约时，租约过期后可被接手"""
+        crashed = SharedFlight(tmp_path / "shared.sqlite3", lease=0.1)
+        survivor = SharedFlight(tmp_path / "shared.sqlite3", lease=5, poll_interval=0.01)
+        assert crashed._acquire("k")
+        
+        async def ok():
+            return "recovered"
+        
+        async def lookup():
+            return None
+        
+        started = time.monotonic()
+        assert await survivor.do("k", ok, lookup) == "recovered"
+        assert time.monotonic() - started >= 0.05
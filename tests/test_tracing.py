@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.exceptions import InvalidURLException
+from app.utils.logger import JSONFormatter, RequestIdFilter, request_id_var
+from app.utils.profiling import SamplingProfiler
+from app.utils.tracing import current_trace, span, stage, traced
+
+URL = "https://mp.weixin.qq.com/s/example"
+
+
+class TestSpan:
+    """处理阶段追踪测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_nested_spans_and_tasks(self):
+        """测试嵌套的阶段记录父阶段，任务中创建的阶段归属于创建任务时所在的阶段"""
+        async def download(src):
+            with span("image", src=src) as item:
+                await asyncio.sleep(0.01)
+                item.set(bytes=3)
+        
+        with traced("req-1") as trace:
+            assert request_id_var.get() == "req-1"
+            with stage("image_download"):
+                await asyncio.gather(*(asyncio.create_task(download(src)) for src in ("a", "b")))
+            with stage("markdown"):
+                pass
+        
+        spans = trace.to_list()
+        assert [item["name"] for item in spans] == ["image_download", "image", "image", "markdown"]
+        assert [item["parent"] for item in spans] == [None, 0, 0, None]
+        assert spans[1]["src"] == "a" and spans[1]["bytes"] == 3
+        assert spans[0]["duration_ms"] >= 10
+        assert request_id_var.get() is None
+    
+    def test_errors_recorded_and_spans_capped(self):
+        """测试阶段中的异常记录到阶段，超过上限的阶段只计数；不在追踪中时不记录"""
+        with span("fetch") as item:
+            assert item is None and current_trace.get() is None
+        
+        with traced("req-2", max_spans=2) as trace:
+            with pytest.raises(InvalidURLException):
+                with span("fetch"):
+                    raise InvalidURLException()
+            with span("parse"), span("image") as item:
+                assert item is None
+        
+        assert trace.spans[0].error.startswith("InvalidURLException")
+        assert [item.name for item in trace.spans] == ["fetch", "parse"]
+        assert trace.dropped == 1
+
+
+class TestStructuredLogging:
+    """结构化日志测试类"""
+    
+    def test_json_formatter_includes_request_id_and_fields(self):
+        """测试JSON格式日志包含请求ID，结构化字段合并到顶层"""
+        record = logging.LogRecord("wechat_scraper", logging.WARNING, __file__, 1, "慢请求", None, None)
+        record.fields = {"event": "slow_request", "duration_ms": 12.5}
+        
+        token = request_id_var.set("req-3")
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            request_id_var.reset(token)
+        document = json.loads(JSONFormatter().format(record))
+        
+        assert document["request_id"] == "req-3"
+        assert (document["level"], document["message"]) == ("WARNING", "慢请求")
+        assert (document["event"], document["duration_ms"]) == ("slow_request", 12.5)
+
+
+class TestSamplingProfiler:
+    """采样分析器测试类"""
+    
+    def test_samples_busy_thread(self):
+        """测试采样到繁忙线程的调用栈，结束后采样线程退出"""
+        def busy_loop():
+            deadline = time.perf_counter() + 0.2
+            while time.perf_counter() < deadline:
+                pass
+        
+        profiler = SamplingProfiler(interval=0.002)
+        session = profiler.start()
+        worker = threading.Thread(target=busy_loop, name="busy")
+        worker.start()
+        worker.join()
+        result = profiler.stop(session, top=5)
+        
+        assert result["samples"] > 0
+        assert any(item["stack"].startswith("busy;") and "busy_loop" in item["stack"] for item in result["stacks"])
+        time.sleep(0.05)
+        assert profiler._thread is None
+
+
+class TestTracingMiddleware:
+    """请求追踪中间件测试类"""
+    
+    def test_request_id_echoed_or_generated(self, client: TestClient):
+        """测试沿用客户端传入的请求ID，未传入或格式无效时生成新的请求ID"""
+        response = client.get("/metrics", headers={"X-Request-ID": "client-id.1"})
+        assert response.headers["X-Request-ID"] == "client-id.1"
+        
+        generated = client.get("/metrics").headers["X-Request-ID"]
+        assert len(generated) == 32
+        
+        response = client.get("/metrics", headers={"X-Request-ID": "bad id\ninjected"})
+        assert response.headers["X-Request-ID"] not in ("bad id\ninjected", generated)
+    
+    def test_slow_request_logged_with_spans(self, client: TestClient, caplog):
+        """测试超过阈值的请求以结构化日志输出追踪和采样结果"""
+        async def render_article(url, fmt):
+            with span("fetch"):
+                await asyncio.sleep(0.05)
+            return "# 文章"
+        
+        with patch.object(settings, "slow_request_threshold", 0.01), \
+                patch.object(settings, "slow_request_profile", True), \
+                patch.object(settings, "debug", True), \
+                patch("app.api.v1.endpoints.debug.async_wechat_service.render_article", render_article), \
+                caplog.at_level(logging.WARNING, logger="wechat_scraper"):
+            response = client.get("/api/v1/debug/profile", params={"url": URL})
+        
+        assert response.status_code == 200
+        records = [r for r in caplog.records if getattr(r, "fields", {}).get("event") == "slow_request"]
+        assert len(records) == 1
+        fields = records[0].fields
+        assert records[0].request_id == response.headers["X-Request-ID"]
+        assert fields["route"] == "/api/v1/debug/profile"
+        assert fields["status"] == 200
+        assert "profile" in fields
+
+
+class TestDebugProfileAPI:
+    """调试分析接口测试类"""
+    
+    def test_hidden_unless_debug(self, client: TestClient):
+        """测试非调试模式下接口返回404"""
+        with patch.object(settings, "debug", False):
+            assert client.get("/api/v1/debug/profile", params={"url": URL}).status_code == 404
+    
+    def test_profile_returns_spans(self, client: TestClient):
+        """测试返回各阶段耗时和采样结果，请求ID与响应头一致；处理中的错误随结果返回"""
+        async def render_article(url, fmt):
+            with span("fetch"):
+                await asyncio.sleep(0.02)
+            with span("image", src="https://mmbiz.qpic.cn/a.png"):
+                raise InvalidURLException("图片地址无效")
+        
+        with patch.object(settings, "debug", True), \
+                patch("app.api.v1.endpoints.debug.async_wechat_service.render_article", render_article):
+            response = client.get("/api/v1/debug/profile", params={"url": URL, "format": "html"})
+        with patch.object(settings, "debug", True):
+            invalid = client.get("/api/v1/debug/profile", params={"url": "https://example.com/a"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["request_id"] == response.headers["X-Request-ID"]
+        assert data["format"] == "html"
+        assert data["error"] == "图片地址无效"
+        assert [item["name"] for item in data["spans"]] == ["fetch", "image"]
+        assert data["summary"]["fetch"]["count"] == 1
+        assert data["profile"]["samples"] >= 0
+        assert invalid.status_code == 400
+    
+    def test_profile_stopped_on_unexpected_error(self, client: TestClient):
+        """测试处理中出现意外异常时也结束采样"""
+        async def render_article(url, fmt):
+            raise RuntimeError("boom")
+        
+        with patch.object(settings, "debug", True), \
+                patch("app.api.v1.endpoints.debug.async_wechat_service.render_article", render_article), \
+                patch("app.api.v1.endpoints.debug.profiler", SamplingProfiler()) as profiler:
+            with pytest.raises(RuntimeError):
+                client.get("/api/v1/debug/profile", params={"url": URL})
+        
+        assert profiler._sessions == []
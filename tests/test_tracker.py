@@ -0,0 +1,153 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.exceptions import InvalidURLException, NetworkRequestException
+from app.services.cache import ArticleEntry
+from app.services.tracker import ArticleTracker, TrackerStore
+from app.services.wechat_service import AsyncWeChatService
+
+URL = "https://mp.weixin.qq.com/s/example"
+
+
+class FakeService(AsyncWeChatService):
+    """按预设内容指纹返回刷新结果的文章服务"""
+    
+    def __init__(self, fingerprint="f1", error=None):
+        super().__init__()
+        self.fingerprint = fingerprint
+        self.error = error
+        self.started = []
+    
+    async def refresh_article(self, url, fmt):
+        self.started.append(time.monotonic())
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return ArticleEntry(body=f"# {url}", etag='"e"', last_modified=0, fresh_until=0, fingerprint=self.fingerprint)
+
+
+class TestTrackerStore:
+    """已跟踪文章列表测试类"""
+    
+    def test_claimed_articles_not_claimed_again(self, tmp_path):
+        """测试新跟踪的文章立即到期，领取后在租约内不会被再次领取，记录结果后按间隔安排下一次"""
+        store = TrackerStore(tmp_path / "tracked.sqlite3")
+        store.track("s/a", URL, "markdown", 3600)
+        
+        claimed = store.claim_due(limit=10, lease=60)
+        assert [item["key"] for item in claimed] == ["s/a"]
+        assert store.claim_due(limit=10, lease=60) == []
+        
+        item = store.record("s/a", "f1")
+        assert item["checks"] == 1
+        assert item["next_check_at"] == pytest.approx(time.time() + 3600, abs=5)
+        assert store.claim_due(limit=10, lease=60) == []
+    
+    def test_record_counts_fingerprint_changes(self, tmp_path):
+        """测试内容指纹变化时计数；首次刷新和刷新失败不计为变化，失败时保留上次的指纹"""
+        store = TrackerStore(tmp_path / "tracked.sqlite3")
+        store.track("s/a", URL, "markdown", 3600)
+        
+        assert store.record("s/a", "f1")["changes"] == 0
+        assert store.record("s/a", "f1")["changes"] == 0
+        item = store.record("s/a", "f2")
+        assert (item["changes"], item["fingerprint"]) == (1, "f2")
+        assert item["last_changed_at"] is not None
+        
+        item = store.record("s/a", None, "网络请求失败")
+        assert (item["changes"], item["fingerprint"], item["last_error"]) == (1, "f2", "网络请求失败")
+        assert item["checks"] == 4
+        assert store.record("s/missing", "f1") is None
+    
+    def test_retrack_keeps_history(self, tmp_path):
+        """测试重复跟踪只更新格式和间隔，保留刷新记录"""
+        store = TrackerStore(tmp_path / "tracked.sqlite3")
+        store.track("s/a", URL, "markdown", 3600)
+        store.record("s/a", "f1")
+        
+        item = store.track("s/a", URL, "html", 120)
+        
+        assert (item["format"], item["interval"], item["checks"], item["fingerprint"]) == ("html", 120, 1, "f1")
+        assert item["next_check_at"] <= time.time() + 120
+
+
+class TestArticleTracker:
+    """已跟踪文章定期刷新测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_run_once_refreshes_due_articles(self, tmp_path):
+        """测试领取到期的文章刷新并记录内容指纹，不同形式的链接视为同一篇文章"""
+        service = FakeService()
+        tracker = ArticleTracker(store=TrackerStore(tmp_path / "tracked.sqlite3"), service=service)
+        await tracker.track(URL + "?scene=1", "markdown")
+        
+        assert await tracker.run_once() == 1
+        assert await tracker.run_once() == 0
+        
+        service.fingerprint = "f2"
+        item = await tracker.refresh_now("http://mp.weixin.qq.com/s/example#rd")
+        assert (item["checks"], item["changes"], item["fingerprint"]) == (2, 1, "f2")
+        assert (await tracker.list())[0] == 1
+    
+    @pytest.mark.asyncio
+    async def test_refresh_rate_bounded(self, tmp_path):
+        """测试刷新按 refresh_rate 限定的速率开始"""
+        with patch.object(settings, "refresh_rate", 20.0):
+            service = FakeService()
+            tracker = ArticleTracker(store=TrackerStore(tmp_path / "tracked.sqlite3"), service=service)
+            for index in range(3):
+                await tracker.track(f"https://mp.weixin.qq.com/s/article-{index}", "markdown")
+            
+            assert await tracker.run_once() == 3
+        
+        assert service.started[-1] - service.started[0] >= 0.09
+    
+    @pytest.mark.asyncio
+    async def test_zero_rate_means_unlimited(self, tmp_path):
+        """测试 refresh_rate 为 0 时不限速，不会因除零中断刷新调度"""
+        with patch.object(settings, "refresh_rate", 0.0):
+            tracker = ArticleTracker(store=TrackerStore(tmp_path / "tracked.sqlite3"), service=FakeService())
+            for index in range(3):
+                await tracker.track(f"https://mp.weixin.qq.com/s/article-{index}", "markdown")
+            
+            assert await tracker.run_once() == 3
+    
+    @pytest.mark.asyncio
+    async def test_failed_refresh_recorded(self, tmp_path):
+        """测试刷新失败时记录错误，仍按间隔安排下一次"""
+        service = FakeService(error=NetworkRequestException("网络请求失败: timeout"))
+        tracker = ArticleTracker(store=TrackerStore(tmp_path / "tracked.sqlite3"), service=service)
+        await tracker.track(URL, "markdown")
+        
+        item = await tracker.refresh_now(URL)
+        
+        assert "timeout" in item["last_error"]
+        assert item["fingerprint"] is None
+        with pytest.raises(InvalidURLException):
+            await tracker.track("https://example.com/article", "markdown")
+
+
+class TestTrackerAPI:
+    """文章跟踪接口测试类"""
+    
+    def test_track_list_and_untrack(self, client: TestClient, tmp_path):
+        """测试跟踪返回201，列表包含该文章，取消跟踪后再次取消返回404"""
+        tracker = ArticleTracker(store=TrackerStore(tmp_path / "tracked.sqlite3"), service=FakeService())
+        with patch("app.api.v1.endpoints.tracking.article_tracker", tracker):
+            response = client.post("/api/v1/wechat/tracked", json={"url": URL, "interval": 600})
+            assert response.status_code == 201
+            assert response.json()["interval"] == 600
+            
+            response = client.post("/api/v1/wechat/tracked/refresh", params={"url": URL})
+            assert response.status_code == 200
+            assert response.json()["fingerprint"] == "f1"
+            
+            response = client.get("/api/v1/wechat/tracked")
+            assert response.json()["total"] == 1
+            
+            assert client.delete("/api/v1/wechat/tracked", params={"url": URL}).status_code == 204
+            assert client.delete("/api/v1/wechat/tracked", params={"url": URL}).status_code == 404
+            assert client.post("/api/v1/wechat/tracked", json={"url": "https://example.com/a"}).status_code == 400
@@ -0,0 +1,53 @@
+from app.utils.url import is_allowed_host, parse_article_url
+
+DOMAINS = ("mp.weixin.qq.com",)
+
+
+class TestArticleURL:
+    """文章地址规范化测试类"""
+    
+    def test_host_suffix_match(self):
+        """测试主机按域名后缀精确匹配"""
+        assert is_allowed_host("mp.weixin.qq.com", DOMAINS)
+        assert is_allowed_host("MP.weixin.qq.com.", DOMAINS)
+        assert is_allowed_host("sub.mp.weixin.qq.com", DOMAINS)
+        assert not is_allowed_host("evilmp.weixin.qq.com", DOMAINS)
+        assert not is_allowed_host("mp.weixin.qq.com.attacker.com", DOMAINS)
+    
+    def test_rejects_invalid_urls(self):
+        """测试非文章地址返回 None"""
+        for url in [
+            "ftp://mp.weixin.qq.com/s/abc",
+            "https://mp.weixin.qq.com:8443/s/abc",
+            "https://user@mp.weixin.qq.com/s/abc",
+            "https://mp.weixin.qq.com.attacker.com/s/abc",
+            "not_a_url",
+        ]:
+            assert parse_article_url(url, DOMAINS) is None
+    
+    def test_short_form(self):
+        """测试短链接形式忽略协议、跟踪参数和片段"""
+        a = parse_article_url("http://MP.weixin.qq.com/s/AbC_-1?scene=1#rd", DOMAINS)
+        b = parse_article_url("https://mp.weixin.qq.com/s/AbC_-1/", DOMAINS)
+        assert a == b
+        assert a.key == "s/AbC_-1"
+        assert a.url == "https://mp.weixin.qq.com/s/AbC_-1"
+    
+    def test_param_form(self):
+        """测试参数形式按 __biz/mid/idx 识别同一文章，抓取地址保留 sn"""
+        a = parse_article_url(
+            "https://mp.weixin.qq.com/s?sn=abc&mid=100&idx=1&__biz=MzA%3D%3D&chksm=x&scene=21#wechat_redirect",
+            DOMAINS
+        )
+        b = parse_article_url("https://mp.weixin.qq.com/mp/appmsg/show?__biz=MzA==&appmsgid=100&itemidx=1", DOMAINS)
+        assert a.key == b.key == "biz/MzA==/100/1"
+        assert a.url == "https://mp.weixin.qq.com/s?__biz=MzA%3D%3D&mid=100&idx=1&sn=abc"
+        other = parse_article_url("https://mp.weixin.qq.com/s?__biz=MzA==&mid=100&idx=2", DOMAINS)
+        assert other.key != a.key
+    
+    def test_other_forms_normalized(self):
+        """测试无法识别标识的地址退回通用规范化"""
+        a = parse_article_url("https://mp.weixin.qq.com/s?src=11&timestamp=1&signature=x&scene=1", DOMAINS)
+        b = parse_article_url("https://mp.weixin.qq.com/s?timestamp=1&signature=x&src=11", DOMAINS)
+        assert a == b
+        assert a.url == "https://mp.weixin.qq.com/s?signature=x&src=11&timestamp=1"
@@ -1,7 +1,16 @@
+import asyncio
+import httpx
 import pytest
 from unittest.mock import Mock, patch
-from app.services.wechat_service import WeChatService
-from app.core.exceptions import InvalidURLException, NetworkRequestException
+from app.core.config import settings
+from app.core.http_client import AsyncHTTPClient
+from app.services.archive import ArticleArchive
+from app.services.article_parser import resolve_html_parser
+from app.services.cache import NullCache
+from app.services.image_store import ImageStore
+from app.utils.metrics import ARTICLE_REFRESHES, IMAGE_DOWNLOADS, STAGE_DURATION
+from app.services.wechat_service import AsyncWeChatService, WeChatService, check_image_response
+from app.core.exceptions import ImageDownloadException, InvalidURLException, NetworkRequestException
 
 
 class TestWeChatService:
@@ -21,11 +30,36 @@ class TestWeChatService:
         invalid_urls = [
             "https://example.com/article",
             "https://weibo.com/status/123",
+            "https://evilmp.weixin.qq.com.attacker.com/s/example",
+            "https://attacker.com/?next=mp.weixin.qq.com",
+            "https://mp.weixin.qq.com@attacker.com/s/example",
             "not_a_url"
         ]
         for url in invalid_urls:
             assert self.service.validate_url(url) is False
     
+    @pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+    def test_download_and_replace_images_uses_configured_parser(self, parser, monkeypatch):
+        """测试同步版本按配置的解析器替换图片，输出不带解析器补上的 html/body 外壳"""
+        if resolve_html_parser(parser) != parser:
+            pytest.skip(f"{parser} 未安装")
+        monkeypatch.setattr(settings, "html_parser", parser)
+        service = WeChatService()
+        monkeypatch.setattr(service, "download_images", lambda sources: {src: "/static/images/a.png" for src in sources})
+        src = "https://mmbiz.qpic.cn/a.png"
+        
+        result = service.download_and_replace_images(f'<div id="js_content"><img data-src="{src}"></div>')
+        
+        assert service.html_parser == parser
+        assert result == f'<div id="js_content"><img data-src="{src}" src="/static/images/a.png"/></div>'
+    
+    def test_check_image_response_rejects_scriptable_types(self):
+        """测试拒绝非图片和可包含脚本的SVG图片"""
+        check_image_response("image/png", "10")
+        for content_type in ("image/svg+xml", "IMAGE/SVG+XML; charset=utf-8", "text/html"):
+            with pytest.raises(ImageDownloadException):
+                check_image_response(content_type, None)
+    
     @patch('requests.get')
     def test_fetch_article_html_success(self, mock_get):
         """测试成功获取文章HTML"""
@@ -68,10 +102,531 @@ class TestWeChatService:
         with pytest.raises(NetworkRequestException):
             self.service.fetch_article_html("https://mp.weixin.qq.com/s/example")
     
+    def test_async_service_is_not_sync_service(self):
+        """测试异步版本不继承同步版本，同名方法的调用方式互不冲突"""
+        assert not issubclass(AsyncWeChatService, WeChatService)
+        service = AsyncWeChatService(archive=None)
+        assert service.validate_url("https://mp.weixin.qq.com/s/example")
+        assert service.canonicalize_url("https://mp.weixin.qq.com/s/example#rd").key == "s/example"
+    
+    def test_none_disables_cache_and_archive(self):
+        """测试显式传入None时不缓存、不归档，而不是按配置创建"""
+        service = AsyncWeChatService(cache=None, archive=None)
+        assert service.archive is None
+        assert isinstance(service.cache, NullCache)
+    
     def test_convert_to_markdown(self):
         """测试HTML转Markdown"""
         html = "<h1>标题</h1><p>段落内容</p>"
         markdown = self.service.convert_to_markdown(html)
         
         assert "# 标题" in markdown
-        assert "段落内容" in markdown 
\ No newline at end of file
+        assert "段落内容" in markdown 
+
+ARTICLE_PAGE = """
+<html>
+    <head>
+        <meta property="og:title" content="异步文章">
+        <meta property="og:image" content="https://example.com/cover.jpg">
+    </head>
+    <body>
+        <div id="js_content">
+            <p>正文</p>
+            <img data-src="https://mmbiz.qpic.cn/a.png">
+        </div>
+    </body>
+</html>
+"""
+
+
+def stored_images(tmp_path):
+    """列出测试图片存储目录中已落盘的图片"""
+    return [p for p in (tmp_path / "images").rglob("*") if p.is_file() and ".incoming" not in p.parts]
+
+IMAGE_HEADERS = {"content-type": "image/png"}
+
+
+class TestAsyncWeChatService:
+    """异步微信公众号服务测试类"""
+    
+    def make_service(self, handler, tmp_path):
+        """使用 MockTransport 构造不访问网络的服务实例"""
+        client = AsyncHTTPClient(transport=httpx.MockTransport(handler))
+        service = AsyncWeChatService(client=client, archive=ArticleArchive(tmp_path / "articles.sqlite3"))
+        service.image_store = ImageStore(tmp_path / "images", settings.base_image_url, tmp_path / "index.sqlite3")
+        return service
+    
+    @pytest.mark.asyncio
+    async def test_get_article_data(self, tmp_path):
+        """测试异步获取文章"""
+        service = self.make_service(lambda request: httpx.Response(200, text=ARTICLE_PAGE), tmp_path)
+        
+        data = await service.get_article_data("https://mp.weixin.qq.com/s/example")
+        
+        assert data["title"] == "异步文章"
+        assert data["cover"] == "https://example.com/cover.jpg"
+        assert "正文" in data["content"]
+    
+    @pytest.mark.asyncio
+    async def test_get_article_markdown_downloads_images(self, tmp_path):
+        """测试异步Markdown转换并下载图片"""
+        def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        downloaded = IMAGE_DOWNLOADS.value(result="downloaded")
+        rendered = STAGE_DURATION.count(stage="markdown")
+        markdown = await service.get_article_markdown("https://mp.weixin.qq.com/s/example")
+        
+        assert markdown.startswith("# 异步文章")
+        assert settings.base_image_url in markdown
+        assert IMAGE_DOWNLOADS.value(result="downloaded") == downloaded + 1
+        assert STAGE_DURATION.count(stage="markdown") == rendered + 1
+        assert [p.read_bytes() for p in stored_images(tmp_path)] == [b"png-bytes"]
+    
+    @pytest.mark.asyncio
+    async def test_fetch_article_html_network_error(self, tmp_path, monkeypatch):
+        """测试上游错误映射为网络请求异常"""
+        monkeypatch.setattr(settings, "upstream_retry_backoff", 0)
+        service = self.make_service(lambda request: httpx.Response(503), tmp_path)
+        
+        with pytest.raises(NetworkRequestException):
+            await service.fetch_article_html("https://mp.weixin.qq.com/s/example")
+    
+    @pytest.mark.asyncio
+    async def test_download_images_concurrently_with_partial_failure(self, tmp_path, monkeypatch):
+        """测试图片并发下载受并发上限约束，且单张失败不影响其他图片"""
+        monkeypatch.setattr(settings, "image_download_concurrency", 2)
+        active = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if request.url.path == "/bad.png":
+                return httpx.Response(404)
+            return httpx.Response(200, content=request.url.path.encode(), headers=IMAGE_HEADERS)
+        
+        service = self.make_service(handler, tmp_path)
+        srcs = [f"https://mmbiz.qpic.cn/{i}.png" for i in range(6)] + ["https://mmbiz.qpic.cn/bad.png"]
+        html = "".join(f'<img data-src="{src}">' for src in srcs)
+        
+        result = await service.download_and_replace_images(html)
+        
+        assert peak == 2
+        assert result.count(settings.base_image_url) == 6
+        assert len(stored_images(tmp_path)) == 6
+    
+    @pytest.mark.asyncio
+    async def test_download_images_deadline(self, tmp_path, monkeypatch):
+        """测试超过单篇文章时限的图片保留原地址"""
+        monkeypatch.setattr(settings, "image_download_deadline", 0.05)
+        
+        async def handler(request):
+            if request.url.path == "/slow.png":
+                await asyncio.sleep(1)
+            return httpx.Response(200, content=b"data", headers=IMAGE_HEADERS)
+        
+        service = self.make_service(handler, tmp_path)
+        html = '<img src="https://mmbiz.qpic.cn/fast.png"><img src="https://mmbiz.qpic.cn/slow.png">'
+        
+        result = await service.download_and_replace_images(html)
+        
+        assert result.count(settings.base_image_url) == 1
+        assert 'src="https://mmbiz.qpic.cn/slow.png"' in result
+    
+    @pytest.mark.asyncio
+    async def test_deadline_cancels_inflight_download(self, tmp_path, monkeypatch):
+        """测试超过时限时已开始的下载也被取消，不会在返回后继续占用上游"""
+        monkeypatch.setattr(settings, "image_download_deadline", 0.05)
+        cancelled = asyncio.Event()
+        
+        async def handler(request):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return httpx.Response(200, content=b"data", headers=IMAGE_HEADERS)
+        
+        service = self.make_service(handler, tmp_path)
+        
+        assert await service.download_images(["https://mmbiz.qpic.cn/slow.png"]) == {}
+        assert cancelled.is_set()
+        assert len(service.flights) == 0
+    
+    @pytest.mark.asyncio
+    async def test_stream_markdown_emits_title_before_images(self, tmp_path):
+        """测试流式Markdown先输出标题，图片下载完成后输出正文，拼接结果与非流式一致"""
+        release_image = asyncio.Event()
+        
+        async def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                await release_image.wait()
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        url = "https://mp.weixin.qq.com/s/example"
+        chunks = service.stream_article_markdown(url)
+        
+        assert await chunks.__anext__() == "# 异步文章\n\n"
+        release_image.set()
+        rest = [chunk async for chunk in chunks]
+        streamed = "# 异步文章\n\n" + "".join(rest)
+        
+        assert settings.base_image_url in rest[-1]
+        # 流式生成的结果写入缓存，与非流式接口返回相同内容
+        assert await service.get_article_markdown(url) == streamed
+        service.cache = type(service.cache)(60, 10, 1024 * 1024)
+        assert await service.get_article_markdown(url) == streamed
+    
+    @pytest.mark.asyncio
+    async def test_get_article_data_uses_cache(self, tmp_path):
+        """测试相同文章（含跟踪参数差异）第二次请求命中缓存"""
+        calls = 0
+        
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        first = await service.get_article_data("https://mp.weixin.qq.com/s/example?scene=1")
+        second = await service.get_article_data("https://mp.weixin.qq.com/s/example")
+        
+        assert first == second
+        assert calls == 1
+        assert service.cache.hits == 1
+    
+    @pytest.mark.asyncio
+    async def test_metadata_reads_only_page_head(self, tmp_path):
+        """测试元数据模式找到所需标签后即停止读取页面，结果写入缓存"""
+        sent = []
+        
+        async def body():
+            head = '<html><head><meta property="og:title" content="预览标题"><meta property="og:image" content="https://example.com/c.jpg"><meta property="og:description" content="摘要"></head>'
+            for chunk in [head.encode()] + [b"<p>" + b"x" * 4096 + b"</p>"] * 50:
+                sent.append(len(chunk))
+                yield chunk
+        
+        service = self.make_service(lambda request: httpx.Response(200, content=body()), tmp_path)
+        
+        metadata = await service.get_article_metadata("https://mp.weixin.qq.com/s/example")
+        
+        assert metadata == {"title": "预览标题", "cover": "https://example.com/c.jpg", "description": "摘要"}
+        assert len(sent) < 5
+        assert await service.get_article_metadata("https://mp.weixin.qq.com/s/example?scene=1") == metadata
+        assert len(sent) < 5
+    
+    @pytest.mark.asyncio
+    async def test_converted_article_archived(self, tmp_path):
+        """测试转换结果写入归档，可按其他形式的链接查询和全文检索，查询不访问上游"""
+        calls = 0
+        
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        data = await service.get_article_data("https://mp.weixin.qq.com/s/example?scene=1")
+        markdown = await service.get_article_markdown("https://mp.weixin.qq.com/s/example")
+        upstream_calls = calls
+        
+        article = await service.get_archived_article("http://mp.weixin.qq.com/s/example/#rd")
+        
+        assert calls == upstream_calls
+        assert article["url"] == "https://mp.weixin.qq.com/s/example"
+        assert article["html"] == data["content"]
+        assert article["markdown"] == markdown
+        total, items = await service.archive.search("异步")
+        assert total == 1 and items[0]["title"] == "异步文章"
+        assert await service.get_archived_article("https://mp.weixin.qq.com/s/other") is None
+    
+    @pytest.mark.asyncio
+    async def test_expired_entry_revalidated_with_conditional_request(self, tmp_path, monkeypatch):
+        """测试过期缓存项携带上游 ETag 重新验证，304 时沿用原结果"""
+        requests_seen = []
+        
+        def handler(request):
+            requests_seen.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text=ARTICLE_PAGE, headers={"ETag": '"v1"'})
+        
+        service = self.make_service(handler, tmp_path)
+        # 缓存项写入后立即过期，但在 cache_stale_ttl 内仍保留用于重新验证
+        monkeypatch.setattr(service.cache, "ttl", 0)
+        url = "https://mp.weixin.qq.com/s/example"
+        first = await service.get_article(url, "html")
+        second = await service.get_article(url, "html")
+        
+        assert requests_seen == [None, '"v1"']
+        assert second.etag == first.etag
+        assert second.last_modified == first.last_modified
+        assert second.body == first.body
+    
+    @pytest.mark.asyncio
+    async def test_refresh_unchanged_content_skips_rendering(self, tmp_path):
+        """测试主动刷新时内容指纹未变化，沿用上次的结果，不处理图片也不重新转换"""
+        hits = {"page": 0, "image": 0}
+        
+        def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                hits["image"] += 1
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            hits["page"] += 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        url = "https://mp.weixin.qq.com/s/example"
+        first = await service.get_article(url, "markdown")
+        rendered = STAGE_DURATION.count(stage="markdown")
+        unchanged = ARTICLE_REFRESHES.value(result="unchanged")
+        
+        refreshed = await service.refresh_article(url, "markdown")
+        
+        assert hits == {"page": 2, "image": 1}
+        assert STAGE_DURATION.count(stage="markdown") == rendered
+        assert ARTICLE_REFRESHES.value(result="unchanged") == unchanged + 1
+        assert refreshed.body == first.body
+        assert refreshed.fingerprint == first.fingerprint is not None
+        assert refreshed.last_modified == first.last_modified
+    
+    @pytest.mark.asyncio
+    async def test_refresh_changed_content_downloads_only_new_images(self, tmp_path):
+        """测试内容变化时重新转换，已下载过的图片不再下载"""
+        page = {"html": ARTICLE_PAGE}
+        image_hits = []
+        
+        def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                image_hits.append(request.url.path)
+                return httpx.Response(200, content=request.url.path.encode(), headers=IMAGE_HEADERS)
+            return httpx.Response(200, text=page["html"])
+        
+        service = self.make_service(handler, tmp_path)
+        url = "https://mp.weixin.qq.com/s/example"
+        first = await service.get_article(url, "markdown")
+        page["html"] = ARTICLE_PAGE.replace(
+            "<p>正文</p>", '<p>修改后的正文</p><img data-src="https://mmbiz.qpic.cn/b.png">'
+        )
+        
+        refreshed = await service.refresh_article(url, "markdown")
+        
+        assert image_hits == ["/a.png", "/b.png"]
+        assert "修改后的正文" in refreshed.body
+        assert refreshed.fingerprint != first.fingerprint
+        assert "mmbiz.qpic.cn" not in refreshed.body
+    
+    @pytest.mark.asyncio
+    async def test_unchanged_article_reused_from_archive(self, tmp_path):
+        """测试缓存已失效（如重启）但内容未变化时，沿用归档中的结果"""
+        hits = {"page": 0, "image": 0}
+        
+        def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                hits["image"] += 1
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            hits["page"] += 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        url = "https://mp.weixin.qq.com/s/example"
+        first = await self.make_service(handler, tmp_path).get_article_markdown(url)
+        rendered = STAGE_DURATION.count(stage="markdown")
+        
+        second = await self.make_service(handler, tmp_path).get_article_markdown(url)
+        
+        assert second == first
+        assert hits == {"page": 2, "image": 1}
+        assert STAGE_DURATION.count(stage="markdown") == rendered
+    
+    @pytest.mark.asyncio
+    async def test_incomplete_images_not_fingerprinted(self, tmp_path):
+        """测试有图片未能下载时不记录指纹，下次刷新重新处理图片"""
+        image_status = {"code": 500}
+        
+        def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                return httpx.Response(image_status["code"], content=b"png-bytes", headers=IMAGE_HEADERS)
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        url = "https://mp.weixin.qq.com/s/example"
+        with patch.object(settings, "upstream_retries", 0):
+            first = await service.get_article(url, "markdown")
+        image_status["code"] = 200
+        refreshed = await service.refresh_article(url, "markdown")
+        
+        assert first.fingerprint is None
+        assert settings.base_image_url not in first.body
+        assert settings.base_image_url in refreshed.body
+        assert refreshed.fingerprint is not None
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_markdown_requests_coalesced(self, tmp_path):
+        """测试同一文章的并发请求只访问上游一次"""
+        hits = {"page": 0, "image": 0}
+        
+        async def handler(request):
+            await asyncio.sleep(0.01)
+            if request.url.host == "mmbiz.qpic.cn":
+                hits["image"] += 1
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            hits["page"] += 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        url = "https://mp.weixin.qq.com/s/example"
+        results = await asyncio.gather(
+            *(service.get_article_markdown(url) for _ in range(20)),
+            service.get_article_data(url)
+        )
+        
+        assert len(set(results[:-1])) == 1
+        assert hits == {"page": 1, "image": 1}
+    
+    @pytest.mark.asyncio
+    async def test_lazy_image_mode(self, tmp_path, monkeypatch):
+        """测试延迟下载模式：转换时不下载图片，首次访问时下载且并发访问只下载一次"""
+        hits = {"image": 0}
+        
+        async def handler(request):
+            if request.url.host == "mmbiz.qpic.cn":
+                hits["image"] += 1
+                await asyncio.sleep(0.01)
+                return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        monkeypatch.setattr(settings, "image_mode", "lazy")
+        service = self.make_service(handler, tmp_path)
+        markdown = await service.get_article_markdown("https://mp.weixin.qq.com/s/example")
+        
+        key = ImageStore.lazy_key("https://mmbiz.qpic.cn/a.png")
+        assert f"({settings.base_image_url}lazy/{key})" in markdown
+        assert hits["image"] == 0
+        
+        paths = await asyncio.gather(*(service.load_lazy_image(key) for _ in range(5)))
+        assert hits["image"] == 1
+        assert len(set(paths)) == 1 and paths[0].read_bytes() == b"png-bytes"
+        assert await service.load_lazy_image("0" * 64) is None
+        
+        # 已下载的图片再次转换时直接使用实际地址
+        assert await service.lazy_image_map(["https://mmbiz.qpic.cn/a.png"]) == {
+            "https://mmbiz.qpic.cn/a.png": service.image_store.lookup("https://mmbiz.qpic.cn/a.png")
+        }
+    
+    @pytest.mark.asyncio
+    async def test_restore_evicted_image(self, tmp_path):
+        """测试被淘汰的图片按原存储路径重新下载"""
+        hits = {"image": 0}
+        
+        def handler(request):
+            hits["image"] += 1
+            return httpx.Response(200, content=b"png-bytes", headers=IMAGE_HEADERS)
+        
+        service = self.make_service(handler, tmp_path)
+        url = await service.download_image("https://mmbiz.qpic.cn/a.png")
+        relative_path = url.removeprefix(settings.base_image_url)
+        assert service.image_store.evict(max_bytes=1) == (1, len(b"png-bytes"))
+        
+        path = await service.restore_image(relative_path)
+        
+        assert hits["image"] == 2
+        assert path == tmp_path / "images" / relative_path and path.read_bytes() == b"png-bytes"
+        assert await service.restore_image("00/00/" + "0" * 64 + ".png") is None
+    
+    @pytest.mark.asyncio
+    async def test_image_size_and_type_limits(self, tmp_path, monkeypatch):
+        """测试超过大小上限或类型不符的图片被拒绝且不落盘"""
+        monkeypatch.setattr(settings, "image_max_bytes", 100)
+        monkeypatch.setattr(settings, "image_stream_chunk_size", 16)
+        
+        def handler(request):
+            if request.url.path == "/html.png":
+                return httpx.Response(200, content=b"<html>", headers={"content-type": "text/html"})
+            if request.url.path == "/huge.png":
+                # 不声明长度，只能在流式读取过程中发现超限
+                return httpx.Response(200, content=iter([b"x" * 16] * 20), headers=IMAGE_HEADERS)
+            return httpx.Response(200, content=b"ok", headers=IMAGE_HEADERS)
+        
+        service = self.make_service(handler, tmp_path)
+        image_map = await service.download_images([
+            "https://mmbiz.qpic.cn/html.png",
+            "https://mmbiz.qpic.cn/huge.png",
+            "https://mmbiz.qpic.cn/ok.png"
+        ])
+        
+        assert list(image_map) == ["https://mmbiz.qpic.cn/ok.png"]
+        assert [p.read_bytes() for p in stored_images(tmp_path)] == [b"ok"]
+        assert not list((tmp_path / "images" / ".incoming").iterdir())
+    
+    @pytest.mark.asyncio
+    async def test_convert_batch(self, tmp_path, monkeypatch):
+        """测试批量转换受并发上限约束，并将异常映射为单条错误结果"""
+        monkeypatch.setattr(settings, "batch_concurrency", 2)
+        active = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        urls = [f"https://mp.weixin.qq.com/s/{i}" for i in range(5)] + ["https://example.com/x"]
+        
+        items = [item async for item in service.convert_batch(urls, "html")]
+        
+        assert sorted(item["index"] for item in items) == list(range(6))
+        assert peak == 2
+        failed = [item for item in items if item["status"] != 200]
+        assert failed == [{"index": 5, "url": "https://example.com/x", "status": 400, "error": "只允许抓取微信公众号文章"}]
+    
+    @pytest.mark.asyncio
+    async def test_convert_batch_limit_shared_and_cancelled_awaited(self, tmp_path, monkeypatch):
+        """测试并发的批量请求共享并发上限；提前结束时取消的转换在返回前已结束"""
+        monkeypatch.setattr(settings, "batch_concurrency", 2)
+        active = 0
+        peak = 0
+        cancelled = 0
+        
+        async def handler(request):
+            nonlocal active, peak, cancelled
+            active += 1
+            peak = max(peak, active)
+            try:
+                await asyncio.sleep(0.02 if request.url.path.startswith("/s/a") else 1)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+            finally:
+                active -= 1
+            return httpx.Response(200, text=ARTICLE_PAGE)
+        
+        service = self.make_service(handler, tmp_path)
+        
+        async def drain(start):
+            urls = [f"https://mp.weixin.qq.com/s/a{i}" for i in range(start, start + 3)]
+            return [item async for item in service.convert_batch(urls, "html")]
+        
+        first, second = await asyncio.gather(drain(0), drain(3))
+        assert len(first) == len(second) == 3
+        assert peak == 2
+        
+        batch = service.convert_batch([f"https://mp.weixin.qq.com/s/slow{i}" for i in range(3)], "html")
+        task = asyncio.ensure_future(batch.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert active == 0
+        assert cancelled == 2